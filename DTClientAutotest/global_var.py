@@ -36,6 +36,41 @@ uuid_resolution_scale_dict = {}
 '''
 skip_aliding_uuids = []
 
+'''
+截图后端，可选值：
+'pyautogui' 默认值，兼容性最好但速度最慢
+'mss' 基于mss的快速截图，linux下走X11共享内存(XShm)
+'replay' 回放截图，从capture_replay_source指定的图片文件夹或视频文件中按顺序取帧，可在无显示器的CI环境中跑通轮询逻辑
+也可以直接赋值为自定义的CaptureBackend子类实例
+'''
+capture_backend = 'pyautogui'
+capture_replay_source = None # 回放截图后端的图片文件夹或视频文件的完整路径，仅对capture_backend为'replay'时生效
+
+'''
+轮询变化门控，对loop_exist_pic、loop_exist_pic_list、loop_exist_text、loop_clear_alert生效，默认关闭
+开启后每次轮询先将截图帧与上一帧做差分：
+屏幕完全没变化时，直接复用上一次未命中的结果、跳过本次模板匹配或OCR；
+屏幕有变化时，只对变化区域（脏矩形）及其周边重新匹配，而不是整屏重新匹配
+'''
+frame_change_gate = False
+frame_change_gate_tolerance = 0 # 像素差分的容差，像素值之差不超过该值视为没变化；回放有损压缩的视频时可适当调大
+frame_change_gate_text_margin = 48 # OCR轮询时脏矩形上下各扩展的像素数（左右会扩展到整个搜索区域的宽度），确保被截断的文本行能完整识别
+
+'''
+轮询等待策略，决定各loop_*接口未命中时等多久再重新匹配，可选值：
+'fixed' 默认值，每次固定等待interval秒，与旧版本的行为一致；interval为0时为忙轮询，会一直占满1个CPU核
+'backoff' 指数退避等待，从wait_backoff_initial秒开始、每次未命中后乘以wait_backoff_factor，不超过wait_backoff_max秒，并带随机抖动；interval作为等待秒数的下限
+'event' 事件驱动等待，在退避等待期间只有发生了UI事件（notify_ui_event()，交互接口完成后会自动通知）或画面发生变化时才提前醒来重新匹配
+也可以直接赋值为自定义的WaitPolicy子类实例；每次轮询的匹配次数和CPU耗时见exist_res.meta['wait']及get_wait_stats()
+'''
+wait_policy = 'fixed'
+wait_backoff_initial = 0.05 # 退避等待时第一次等待的秒数
+wait_backoff_factor = 2 # 退避等待时每次未命中后等待秒数的放大倍数
+wait_backoff_max = 1 # 退避等待时等待秒数的上限，事件驱动等待时即为没有任何事件时的兜底心跳间隔
+wait_backoff_jitter = 0.2 # 退避等待时随机抖动的比例，避免同一台机器上的多个执行器同时醒来
+wait_event_probe_interval = 0.1 # 事件驱动等待时画面变化检测的间隔秒数，为0或None时不检测画面变化、只响应UI事件
+wait_event_change_tolerance = 8 # 事件驱动等待时画面变化检测的容差，1/8缩略图的像素值之差超过该值才视为画面有变化
+
 # OpenCV模板匹配相关全局变量
 threshold = 0.7 # 图片模板匹配时的相似度阈值，范围为(0,1)，越接近1表示相似度要求越高
 cache_threshold = 0.91 # 全局默认的缓存图相似度阈值
@@ -43,12 +78,58 @@ loop_exist_pic_before = 0 # 第一次轮询前等待的秒数（仅对OpenCV模
 loop_exist_pic_timeout = 10 # 轮询的最大超时秒数（仅对OpenCV模板匹配生效）
 loop_exist_pic_interval = 0 # 在未轮询超时的情况下，且未轮询到目标区域时的轮询间隔秒数（仅对OpenCV模板匹配生效）
 loop_exist_pic_after = 0 # 在未轮询超时的情况下，且轮询到目标区域后等待的秒数（仅对OpenCV模板匹配生效）
+template_cache_max_bytes = 256 * 1024 * 1024 # 模板截图缓存的容量上限（按解码后的字节数LRU淘汰）
+template_pack = True # 是否优先从预编译模板包（build_template_pack()生成的{sub_path}/template_pack_系统_分辨率.dtpack）中mmap加载模板截图，模板包中没有的再查找模板截图文件
+template_pack_gray = True # 预编译模板包时是否同时打包灰度变体
+template_pack_scales = (0.5,) # 预编译模板包时同时打包的缩小变体的倍数，与exist_pic的match_scale对应
+pyramid_level = 0 # 金字塔粗匹配的层数，0表示不使用；为n时先在缩小2^n倍的截图上粗匹配，再只在候选点附近做全分辨率精匹配（n为2时粗匹配的像素量约为1/16）
+pyramid_threshold_margin = 0.1 # 金字塔粗匹配时相似度阈值的放宽量，缩小后的截图相似度会偏低
+pyramid_max_candidates = 50 # 金字塔粗匹配后最多保留的候选点个数
+template_scale_fallback = False # 缺失当前分辨率的模板截图时，是否缩放使用同系统下其他分辨率的模板截图（取分辨率最接近的那张），开启后同一元素只需维护一份模板截图
+template_scale_range = None # 模板截图的缩放倍数范围，形如(0.8, 1.25)，默认为None表示不做多尺度匹配；会在该范围内均匀取template_scale_steps个倍数进行匹配，取相似度最高的倍数
+template_scale_steps = 5 # 多尺度匹配时的缩放倍数个数
+batch_match_workers = 4 # 多素材批量匹配（exist_pic_list、loop_exist_pic_list、loop_clear_alert）时并行匹配的线程数，为1时按顺序匹配
+match_scale = 1.0 # 匹配时截图与模板截图的缩小倍数，范围为(0,1]，为0.5时在半分辨率上匹配、像素量约为1/4；模板截图有匹配精度提示（sidecar文件）时优先使用提示
+match_verify = True # 降精度（灰度或缩小）匹配时，是否在全分辨率、BGR三通道的截图上对候选点重新打分，使actual_threshold与全精度匹配的含义一致
+match_verify_threshold_margin = 0.1 # 降精度匹配时相似度阈值的放宽量，放宽后的候选点再经重新打分按原阈值过滤
+match_verify_max_candidates = 100 # 降精度匹配后最多重新打分的候选点个数
+match_verify_single_candidates = 5 # 单目标（MatchMode.SINGLE）降精度匹配时重新打分的候选点个数，取其中全精度相似度最高的
+match_calibration_modes = [(True, 0.5), (True, 0.75), (False, 0.5), (True, 1.0), (False, 0.75)] # calibrate_template_match_mode依次尝试的匹配模式(是否灰度, 缩小倍数)，都不准确时为全精度
+template_match_auto_calibrate = False # 模板截图全精度命中且还没有匹配精度提示时，是否自动用这一帧校准并写入sidecar文件
 
 # OCR文字识别相关全局变量
 loop_exist_text_before = 0 # 第一次轮询前等待的秒数（仅对OCR文字识别生效）
 loop_exist_text_timeout = 35 # 轮询的最大超时秒数（仅对OCR文字识别生效）
 loop_exist_text_interval = 0 # 在未轮询超时的情况下，且未轮询到目标区域时的轮询间隔秒数（仅对OCR文字识别生效）
 loop_exist_text_after = 0 # 在未轮询超时的情况下，且轮询到目标区域后等待的秒数（仅对OCR文字识别生效）
+ocr_lang = 'ch' # OCR引擎的识别语言
+ocr_use_angle_cls = True # OCR引擎是否启用文字方向分类器
+ocr_use_gpu = True # OCR引擎是否使用GPU推理（无GPU时paddle会自动回退到CPU）
+ocr_drop_score = 0.5 # OCR识别结果的置信度下限，低于该值的文字框会被丢弃，每次OCR时读取，可随时修改
+ocr_cache_ttl = 5 # OCR识别结果缓存的存活秒数，内容完全相同的截图（或搜索区域）在该时间内只OCR一次，为0时关闭缓存
+ocr_cache_max_entries = 32 # OCR识别结果缓存最多保留的条数，超出时淘汰最久未用的
+ocr_warm_up = False # setup_module中是否预热本进程内的OCR引擎，开启后每个用例模块都要先付出导入paddle、加载模型的耗时；配置了OCR工作进程池时不生效
+ocr_staged = False # 是否默认走分阶段OCR：先只做文字检测，按文字框与目标文字的吻合程度排序后分批识别，详见staged_ocr_lines接口
+ocr_staged_batch_size = 8 # 分阶段OCR时每批识别的文字框个数
+ocr_pool_workers = 0 # OCR工作进程数，大于0时所有OCR都交给常驻的工作进程（各自预热好模型，截图帧经共享内存传递），paddle崩溃不会带崩测试进程；为0时在本进程内OCR。工作进程以spawn方式启动，脚本入口需要有 if __name__ == '__main__' 保护
+ocr_pool_address = None # 本机OCR服务的地址，形如('127.0.0.1', 50077)，设置后OCR都交给该服务（python -m DTClientAutotest.pc.ocr_server 启动），多显示器/多执行器可共用一个模型池，优先于ocr_pool_workers
+ocr_pool_authkey = b'DTClientAutotest' # 本机OCR服务的认证密钥
+ocr_pool_max_retries = 1 # OCR工作进程崩溃时，其进行中的任务最多重新分配给其他工作进程的次数
+pic_cache_max_entries = 5000 # OCR文字缓存图最多保留的张数，超出时淘汰最久未命中的，为None时不限制
+pic_cache_max_age = 30 * 24 * 3600 # OCR文字缓存图最近一次命中后最多保留的秒数，为None时不限制
+pic_cache_max_consecutive_misses = 1 # OCR文字缓存图连续未命中几次后失效删除；缓存图未命中但OCR命中时会直接用新的命中区域刷新缓存图
+pic_cache_neighbourhood_margin = 100 # 匹配OCR文字缓存图时，优先只在生成缓存图时的命中区域上下左右各扩展该像素数的范围内搜索
+pic_cache_speculative = False # 有OCR文字缓存图时是否走竞速模式：每帧都匹配缓存图，同时在宽限期后用同一帧在后台进行OCR，谁先命中用谁；关闭时要等缓存图轮询超时后才会OCR
+pic_cache_speculative_grace = 1 # 竞速模式下，缓存图匹配多少秒仍未命中才开始后台OCR
+
+# CEF页面CDP（Chrome DevTools Protocol）定位相关全局变量
+cdp_host = '127.0.0.1' # CEF远程调试地址
+cdp_port = None # CEF远程调试端口，默认为None表示与launch_dingtalk(open_cef_port=True)一致：win为16888、mac为16889
+cdp_timeout = 5 # 连接CEF远程调试端口及等待CDP命令结果的超时秒数
+cdp_device_pixel_ratio = None # 页面坐标换算成截图分辨率坐标的倍数，默认为None取页面的window.devicePixelRatio（页面有缩放时需手动指定）
+cdp_viewport_offset = None # 页面视口左上角相对窗口左上角的偏移(x, y)，单位为页面坐标，默认为None按窗口内外尺寸之差估算（钉钉的CEF窗口无边框，一般为0）
+cdp_fixture = None # 录制好的CDP数据（RecordingCdpTransport.save()生成的json文件的完整路径或dict），设置后所有CDP接口都回放该数据，用于无钉钉客户端的CI环境
+cdp_ocr_fallback = True # CDP按文字定位时，CDP不可用或页面中查不到是否回退到OCR
 
 ######################################################################################################
 
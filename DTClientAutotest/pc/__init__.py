@@ -1,2 +1,10 @@
 from .core import *
+from .capture import *
+from .host_profile import *
+from .template_pack import *
+from .wait_policy import *
+from .ocr_pool import *
+from .pic_cache import *
+from .match_set import *
+from .cdp import *
 from .dingtalk import *
\ No newline at end of file
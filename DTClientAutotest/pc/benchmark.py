@@ -0,0 +1,104 @@
+'''
+DTClientAutotest性能基准测试，用于对比优化前后的耗时，不参与正常的脚本运行
+
+用法：python -m DTClientAutotest.pc.benchmark
+import DTClientAutotest.pc的导入耗时预算见tests/test_import_time.py，随pytest一起运行
+'''
+
+import time
+import cv2
+import numpy as np
+from .core import find_match_peaks
+
+def filter_same_legacy(res, threshold):
+    '''
+    旧版exist_pic中filter_same=True的去重实现（逐点Python循环 + 外扩边界合并），仅作为基准对照
+    :param res: cv2.matchTemplate的结果矩阵
+    :param threshold: 相似度阈值
+    :return: [((x, y), actual_threshold), ……]，按相似度倒序
+    '''
+
+    matched_points = []
+    indices = np.argwhere(res > threshold)
+    for idx in indices:
+        matched_points.append(((idx[1], idx[0]), res[idx[0]][idx[1]]))
+    sorted_points = sorted(matched_points, key=lambda z: z[1], reverse=True)
+
+    filter_points = []
+    side_points = []
+    for point in sorted_points:
+        x = point[0][0]
+        y = point[0][1]
+        new_point = True
+        for side in side_points:
+            if x > side['x_max'] + 1 or x < side['x_min'] - 1 or y > side['y_max'] + 1 or y < side['y_min'] - 1:
+                pass
+            else:
+                new_point = False
+                side['x_max'] = max(side['x_max'], x)
+                side['x_min'] = min(side['x_min'], x)
+                side['y_max'] = max(side['y_max'], y)
+                side['y_min'] = min(side['y_min'], y)
+        if new_point:
+            filter_points.append(point)
+            side_points.append({'x_max': x, 'x_min': x, 'y_max': y, 'y_min': y})
+    return filter_points
+
+def make_dense_match_res(height=540, width=960, peak_count=200, peak_radius=6, seed=0):
+    '''
+    构造一张稠密命中的合成matchTemplate结果矩阵：peak_count个随机分布的峰，每个峰周围一圈像素的相似度都偏高
+    :param height: 结果矩阵的高
+    :param width: 结果矩阵的宽
+    :param peak_count: 峰的个数
+    :param peak_radius: 峰的半径（像素），越大则高于阈值的候选点越多
+    :param seed: 随机种子
+    :return: float32的结果矩阵，值域[0, 1)
+    '''
+
+    rng = np.random.default_rng(seed)
+    res = rng.uniform(0, 0.3, (height, width)).astype(np.float32)
+    # 以每个峰为中心画一个锥形，越靠近中心相似度越高
+    offsets = np.arange(-peak_radius, peak_radius + 1)
+    cone = 1 - np.hypot(offsets[:, None], offsets[None, :]) / (peak_radius + 1)
+    for i in range(peak_count):
+        y = rng.integers(peak_radius, height - peak_radius)
+        x = rng.integers(peak_radius, width - peak_radius)
+        patch = res[y - peak_radius:y + peak_radius + 1, x - peak_radius:x + peak_radius + 1]
+        np.maximum(patch, (rng.uniform(0.8, 1.0) * cone).astype(np.float32), out=patch)
+    return res
+
+def benchmark_filter_same(height=540, width=960, peak_count=200, peak_radius=6, template_size=24, threshold=0.5, repeat=3):
+    '''
+    对比filter_same新旧两种去重实现在稠密命中合成数据上的耗时
+    :param height: 结果矩阵的高
+    :param width: 结果矩阵的宽
+    :param peak_count: 峰的个数
+    :param peak_radius: 峰的半径（像素）
+    :param template_size: 假设的模板截图边长，决定新实现的邻域大小
+    :param threshold: 相似度阈值
+    :param repeat: 重复次数，取平均耗时
+    :return: {'candidates': 高于阈值的候选点数, 'legacy_seconds': 旧实现平均耗时, 'legacy_peaks': 旧实现命中区域数, 'vectorized_seconds': 新实现平均耗时, 'vectorized_peaks': 新实现命中区域数}
+    '''
+
+    res = make_dense_match_res(height=height, width=width, peak_count=peak_count, peak_radius=peak_radius)
+
+    start_time = time.time()
+    for i in range(repeat):
+        legacy_points = filter_same_legacy(res, threshold)
+    legacy_seconds = (time.time() - start_time) / repeat
+
+    start_time = time.time()
+    for i in range(repeat):
+        xs, ys, scores = find_match_peaks(res, threshold, width=template_size, height=template_size)
+    vectorized_seconds = (time.time() - start_time) / repeat
+
+    return {
+        'candidates': int((res > threshold).sum()),
+        'legacy_seconds': legacy_seconds,
+        'legacy_peaks': len(legacy_points),
+        'vectorized_seconds': vectorized_seconds,
+        'vectorized_peaks': len(xs)
+    }
+
+if __name__ == '__main__':
+    print(f"filter_same: {benchmark_filter_same()}")
@@ -0,0 +1,226 @@
+import os
+import sys
+import threading
+from .lazy_module import cv2, np
+from .. import global_var
+
+class CaptureBackend():
+    '''
+    截图后端基类，所有截图后端都需要实现grab()，返回BGR格式的numpy数组
+
+    DTClientAutotest内所有截图（screenshot/screenshot_frame/get_screenshot_resolution及各loop_*接口）都经由global_var.capture_backend选中的截图后端完成，
+    自定义截图后端时继承CaptureBackend并实现grab()即可，再通过set_capture_backend()或global_var.capture_backend设置
+    '''
+
+    name = ''
+
+    def grab(self):
+        '''
+        截取一帧屏幕
+        :return: 截图帧，BGR格式的numpy数组，形如 shape=(1800, 2880, 3)
+        '''
+
+        raise NotImplementedError
+
+    def resolution(self):
+        '''
+        查询截图的分辨率，子类可重写为不截图的快速查询
+        :return: 分辨率，形如 (2880, 1800)
+        '''
+
+        frame = self.grab()
+        return (frame.shape[1], frame.shape[0])
+
+    def close(self):
+        '''
+        释放截图后端占用的资源
+        :return:
+        '''
+
+        pass
+
+class PyAutoGUICaptureBackend(CaptureBackend):
+    '''
+    基于pyautogui的截图后端，兼容性最好但速度最慢，为默认截图后端
+    '''
+
+    name = 'pyautogui'
+
+    def grab(self):
+        import pyautogui
+        img = pyautogui.screenshot()
+        return cv2.cvtColor(np.asarray(img.convert('RGB')), cv2.COLOR_RGB2BGR)
+
+class MssCaptureBackend(CaptureBackend):
+    '''
+    基于mss的截图后端，linux下走X11共享内存(XShm)、win下走GDI BitBlt、mac下走CoreGraphics，比pyautogui快一个数量级
+    '''
+
+    name = 'mss'
+
+    def __init__(self, monitor=1):
+        '''
+        :param monitor: 要截取的显示器下标，0表示所有显示器拼接成的虚拟屏，1表示主显示器，默认为1
+        '''
+
+        self.monitor = monitor
+        # mss实例不能跨线程使用，每个线程各自持有一个
+        self.local = threading.local()
+
+    def get_sct(self):
+        sct = getattr(self.local, 'sct', None)
+        if sct is None:
+            import mss
+            sct = mss.mss()
+            self.local.sct = sct
+        return sct
+
+    def grab(self):
+        sct = self.get_sct()
+        shot = sct.grab(sct.monitors[self.monitor])
+        return cv2.cvtColor(np.asarray(shot), cv2.COLOR_BGRA2BGR)
+
+    def resolution(self):
+        if sys.platform == 'darwin': # mac的monitors尺寸是逻辑尺寸，Retina屏下与截图的像素尺寸不一致
+            return super().resolution()
+        monitor = self.get_sct().monitors[self.monitor]
+        return (monitor['width'], monitor['height'])
+
+    def close(self):
+        sct = getattr(self.local, 'sct', None)
+        if sct is not None:
+            sct.close()
+            self.local.sct = None
+
+class ReplayCaptureBackend(CaptureBackend):
+    '''
+    回放截图后端，按顺序从图片文件夹或视频文件中取帧来代替真实屏幕，用于无显示器的CI环境跑通轮询逻辑，以及对匹配吞吐量做基准测试
+    '''
+
+    name = 'replay'
+
+    def __init__(self, source, repeat=1, loop=True):
+        '''
+        :param source: 图片文件夹（按文件名排序，支持.png/.jpg/.jpeg/.bmp）或视频文件的完整路径
+        :param repeat: 每一帧连续返回的次数，默认为1，可用于模拟静止不变的屏幕
+        :param loop: 所有帧回放完后是否从头循环，默认为True；为False时会一直返回最后一帧
+        '''
+
+        assert os.path.exists(source), f"回放源不存在：{source}"
+        self.source = source
+        self.repeat = max(1, repeat)
+        self.loop = loop
+        self.lock = threading.Lock()
+        self.grab_count = 0 # 已经取过的帧数（含repeat）
+        self.last_frame = None
+        self.frame_dict = {} # 已解码的图片帧，key为下标
+        self.video = None
+        self.pic_paths = []
+        if os.path.isdir(source):
+            for file_name in sorted(os.listdir(source)):
+                if os.path.splitext(file_name)[1].lower() in ['.png', '.jpg', '.jpeg', '.bmp']:
+                    self.pic_paths.append(os.path.join(source, file_name))
+            assert len(self.pic_paths) > 0, f"回放文件夹内没有图片：{source}"
+
+    def read_pic_frame(self, index):
+        frame = self.frame_dict.get(index)
+        if frame is None:
+            frame = cv2.imread(self.pic_paths[index])
+            self.frame_dict[index] = frame
+        return frame
+
+    def read_video_frame(self):
+        if self.video is None:
+            self.video = cv2.VideoCapture(self.source)
+        ok, frame = self.video.read()
+        if not ok and self.loop: # 回放完了，从头循环
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.video.read()
+        if not ok: # 不循环则一直返回最后一帧
+            assert self.last_frame is not None, f"视频无法解码：{self.source}"
+            return self.last_frame
+        return frame
+
+    def grab(self):
+        with self.lock:
+            if self.grab_count % self.repeat == 0 or self.last_frame is None:
+                frame_index = self.grab_count // self.repeat
+                if len(self.pic_paths) > 0:
+                    if self.loop:
+                        frame_index = frame_index % len(self.pic_paths)
+                    else:
+                        frame_index = min(frame_index, len(self.pic_paths) - 1)
+                    self.last_frame = self.read_pic_frame(frame_index)
+                else:
+                    self.last_frame = self.read_video_frame()
+            self.grab_count += 1
+            return self.last_frame
+
+    def resolution(self):
+        with self.lock:
+            if self.last_frame is not None:
+                frame = self.last_frame
+            elif len(self.pic_paths) > 0:
+                frame = self.read_pic_frame(0)
+            else:
+                video = cv2.VideoCapture(self.source)
+                size = (int(video.get(cv2.CAP_PROP_FRAME_WIDTH)), int(video.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+                video.release()
+                return size
+            return (frame.shape[1], frame.shape[0])
+
+    def close(self):
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+
+# 当前使用的截图后端，及创建它时对应的global_var配置
+capture_backend = None
+capture_backend_config = None
+capture_backend_lock = threading.Lock()
+
+def create_capture_backend(backend, replay_source=None):
+    '''
+    按名称创建截图后端
+    :param backend: 截图后端名称，'pyautogui' / 'mss' / 'replay'
+    :param replay_source: 回放截图后端的图片文件夹或视频文件，仅对'replay'生效
+    :return: 截图后端实例
+    '''
+
+    if backend == 'pyautogui':
+        return PyAutoGUICaptureBackend()
+    elif backend == 'mss':
+        return MssCaptureBackend()
+    elif backend == 'replay':
+        assert replay_source is not None, "回放截图后端需要设置global_var.capture_replay_source"
+        return ReplayCaptureBackend(replay_source)
+    assert False, f"未知的截图后端：{backend}"
+
+def get_capture_backend():
+    '''
+    获取当前的截图后端，由global_var.capture_backend选择，global_var配置变化后会自动重建
+    :return: 截图后端实例
+    '''
+
+    global capture_backend, capture_backend_config
+    backend = global_var.capture_backend
+    if isinstance(backend, CaptureBackend):
+        return backend
+    config = (backend, global_var.capture_replay_source)
+    if capture_backend is None or capture_backend_config != config:
+        with capture_backend_lock:
+            if capture_backend is None or capture_backend_config != config:
+                if capture_backend is not None:
+                    capture_backend.close()
+                capture_backend = create_capture_backend(backend, replay_source=global_var.capture_replay_source)
+                capture_backend_config = config
+    return capture_backend
+
+def set_capture_backend(backend):
+    '''
+    设置截图后端
+    :param backend: 截图后端名称（'pyautogui' / 'mss' / 'replay'）或CaptureBackend实例
+    :return:
+    '''
+
+    global_var.capture_backend = backend
@@ -0,0 +1,490 @@
+'''
+经由CEF远程调试端口（launch_dingtalk(open_cef_port=True)时开启，即Chrome DevTools Protocol，简称CDP）定位CEF页面内的元素：
+直接从DOM中查出文字/CSS选择器/XPath对应节点的外接矩形，换算成截图分辨率下的屏幕坐标，返回与exist_text相同格式的结果，act_point可直接交互；
+比整屏OCR快得多且不受字体渲染影响，CDP不可用（端口未开启、找不到页面）或页面中查不到时再回退到OCR
+'''
+
+import json
+import time
+import threading
+from enum import Enum
+from .lazy_module import np
+from .. import global_var
+from .core import ExistRes, Position, ActMode, system, resolve_region, match_ocr_lines, exist_text, loop_exist_text, act_point
+from .capture import get_capture_backend
+from .match_set import MatchSet
+from .wait_policy import begin_wait
+
+class CdpBy(Enum):
+    '''
+    CDP元素定位方式，枚举类型
+    '''
+
+    TEXT = 'text'   # 按文字定位，匹配规则与exist_text一致（包含/完全相等/正则）
+    CSS = 'css'     # 按CSS选择器定位，如 'div.session-item > span.title'
+    XPATH = 'xpath' # 按XPath定位，如 '//button[contains(., "发送")]'
+
+class CdpTransport():
+    '''
+    CDP传输层基类，负责发送1条CDP命令并取回结果
+    '''
+
+    def send(self, method, params=None):
+        '''
+        发送CDP命令
+        :param method: CDP命令，如'Runtime.evaluate'
+        :param params: 命令参数dict
+        :return: 命令结果dict
+        '''
+
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class WebSocketCdpTransport(CdpTransport):
+    '''
+    经由WebSocket连接CEF页面的调试地址（webSocketDebuggerUrl），依赖websocket-client，只有用到CDP时才需要安装
+    '''
+
+    def __init__(self, ws_url, timeout=None):
+        '''
+        :param ws_url: 页面的webSocketDebuggerUrl，形如 ws://127.0.0.1:16888/devtools/page/{id}
+        :param timeout: 连接和等待命令结果的超时秒数，默认为global_var.cdp_timeout
+        '''
+
+        import websocket # websocket-client
+
+        if timeout is None:
+            timeout = global_var.cdp_timeout
+        self.ws_url = ws_url
+        self.websocket = websocket
+        self.ws = websocket.create_connection(ws_url, timeout=timeout, suppress_origin=True) # 不带Origin头，新版本内核无需--remote-allow-origins
+        self.lock = threading.Lock()
+        self.next_id = 0
+
+    def send(self, method, params=None):
+        with self.lock:
+            self.next_id += 1
+            message_id = self.next_id
+            try:
+                self.ws.send(json.dumps({'id': message_id, 'method': method, 'params': params or {}}))
+                while True:
+                    message = json.loads(self.ws.recv())
+                    if message.get('id') == message_id: # 跳过事件通知及其他命令的结果
+                        break
+            except self.websocket.WebSocketException as e: # 页面被关闭、钉钉重启等，统一按连接异常抛出
+                raise ConnectionError(f"CDP连接异常：{self.ws_url}, {e}") from e
+            assert 'error' not in message, f"CDP命令执行失败：{method}, {message['error']}"
+            return message.get('result', {})
+
+    def close(self):
+        self.ws.close()
+
+class FixtureCdpTransport(CdpTransport):
+    '''
+    回放录制好的CDP数据（见RecordingCdpTransport），用于在没有钉钉客户端的CI环境中跑通CDP定位逻辑，由global_var.cdp_fixture开启
+    fixture形如 {'targets': [list_cdp_targets()的结果], 'calls': [{'method': ..., 'params': ..., 'result': ...}, ……]}，
+    同一命令（method与params都相同）录制了多次时按顺序回放、回放完后一直返回最后1次的结果；params对不上时按method回放
+    '''
+
+    def __init__(self, fixture):
+        '''
+        :param fixture: fixture的dict，或fixture json文件的完整路径
+        '''
+
+        if isinstance(fixture, str):
+            with open(fixture, 'r', encoding='utf-8') as f:
+                fixture = json.load(f)
+        self.targets = fixture.get('targets', [])
+        self.lock = threading.Lock()
+        self.results_dict = {} # (method, params) -> [result, ……]，params为None的key用于按method回放
+        for call in fixture.get('calls', []):
+            for key in [(call['method'], self.params_key(call.get('params'))), (call['method'], None)]:
+                self.results_dict.setdefault(key, []).append(call['result'])
+        self.played_dict = {}
+
+    @staticmethod
+    def params_key(params):
+        return json.dumps(params or {}, sort_keys=True, ensure_ascii=False)
+
+    def send(self, method, params=None):
+        with self.lock:
+            key = (method, self.params_key(params))
+            if key not in self.results_dict:
+                key = (method, None)
+            assert key in self.results_dict, f"CDP fixture中没有录制该命令：{method}"
+            results = self.results_dict[key]
+            played = self.played_dict.get(key, 0)
+            self.played_dict[key] = played + 1
+            return results[min(played, len(results) - 1)]
+
+class RecordingCdpTransport(CdpTransport):
+    '''
+    录制CDP数据：包装真实的传输层，记录每条命令及其结果，save()后即可作为FixtureCdpTransport的fixture
+    '''
+
+    def __init__(self, transport, targets=None):
+        '''
+        :param transport: 被录制的传输层，如WebSocketCdpTransport实例
+        :param targets: list_cdp_targets()的结果，一起写入fixture
+        '''
+
+        self.transport = transport
+        self.targets = targets or []
+        self.calls = []
+
+    def send(self, method, params=None):
+        result = self.transport.send(method, params)
+        self.calls.append({'method': method, 'params': params or {}, 'result': result})
+        return result
+
+    def save(self, fixture_full_path):
+        '''
+        :param fixture_full_path: fixture json文件的完整路径
+        :return:
+        '''
+
+        with open(fixture_full_path, 'w', encoding='utf-8') as f:
+            json.dump({'targets': self.targets, 'calls': self.calls}, f, ensure_ascii=False, indent=4)
+
+    def close(self):
+        self.transport.close()
+
+# 在页面内执行的定位脚本：查出可见节点相对视口的外接矩形，并带上把视口坐标换算成屏幕坐标所需的窗口信息
+locate_script = '''
+(function (by, query, exact, prefilter) {
+    var hits = [];
+    var viewport = {
+        screenX: window.screenX, screenY: window.screenY,
+        outerWidth: window.outerWidth, outerHeight: window.outerHeight,
+        innerWidth: window.innerWidth, innerHeight: window.innerHeight,
+        devicePixelRatio: window.devicePixelRatio
+    };
+    if (document.visibilityState === 'hidden' || !document.body) {
+        return {hits: hits, viewport: viewport};
+    }
+    var visible = function (element, rect) {
+        if (!element || rect.width <= 0 || rect.height <= 0) return false;
+        if (rect.right < 0 || rect.bottom < 0 || rect.left > window.innerWidth || rect.top > window.innerHeight) return false;
+        var style = window.getComputedStyle(element);
+        return style.visibility !== 'hidden' && style.display !== 'none' && parseFloat(style.opacity) !== 0;
+    };
+    var push = function (element, rect, text) {
+        if (visible(element, rect)) hits.push([rect.left, rect.top, rect.right, rect.bottom, text]);
+    };
+    if (by === 'text') {
+        var walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        var range = document.createRange();
+        for (var node = walker.nextNode(); node; node = walker.nextNode()) {
+            var text = node.nodeValue.trim();
+            if (!text) continue;
+            if (prefilter && (exact ? text !== query : text.indexOf(query) < 0)) continue;
+            range.selectNodeContents(node);
+            push(node.parentElement, range.getBoundingClientRect(), text);
+        }
+    } else {
+        var elements = [];
+        if (by === 'css') {
+            elements = Array.prototype.slice.call(document.querySelectorAll(query));
+        } else {
+            var snapshot = document.evaluate(query, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            for (var i = 0; i < snapshot.snapshotLength; i++) elements.push(snapshot.snapshotItem(i));
+        }
+        elements.forEach(function (element) {
+            if (element.nodeType !== 1) element = element.parentElement; // XPath选中的文本节点取其父元素
+            if (element) push(element, element.getBoundingClientRect(), (element.innerText || element.textContent || '').trim().slice(0, 200));
+        });
+    }
+    return {hits: hits, viewport: viewport};
+})
+'''
+
+class CdpSession():
+    '''
+    与1个CEF页面的CDP会话
+    '''
+
+    def __init__(self, transport, target=None):
+        '''
+        :param transport: CdpTransport实例
+        :param target: 页面信息，list_cdp_targets()结果中的1项
+        '''
+
+        self.transport = transport
+        self.target = target or {}
+
+    def send(self, method, params=None):
+        '''
+        发送CDP命令
+        :param method: CDP命令，如'Page.reload'
+        :param params: 命令参数dict
+        :return: 命令结果dict
+        '''
+
+        return self.transport.send(method, params)
+
+    def evaluate(self, expression):
+        '''
+        在页面内执行JavaScript表达式
+        :param expression: JavaScript表达式
+        :return: 表达式的值（需可JSON序列化）
+        '''
+
+        result = self.send('Runtime.evaluate', {'expression': expression, 'returnByValue': True})
+        assert 'exceptionDetails' not in result, f"页面内执行脚本失败：{result['exceptionDetails'].get('exception', {}).get('description', result['exceptionDetails'].get('text'))}"
+        return result.get('result', {}).get('value')
+
+    def locate(self, query, by=CdpBy.TEXT, equal_filter=False, prefilter=True):
+        '''
+        查出页面内目标元素的外接矩形，并换算成截图分辨率下的屏幕坐标
+        :param query: 目标文字、CSS选择器或XPath
+        :param by: 定位方式，详见CdpBy枚举
+        :param equal_filter: 按文字定位时是否要求完全相等
+        :param prefilter: 按文字定位时是否在页面内先按包含/完全相等过滤，为False时返回页面内所有可见文字、由调用方过滤
+        :return: (hits, viewport)，hits为[[left, top, right, bottom, text], ……]，坐标为截图分辨率下的屏幕坐标；viewport为页面的窗口信息
+        '''
+
+        expression = locate_script + '(' + ', '.join([json.dumps(by.value), json.dumps(query, ensure_ascii=False), json.dumps(equal_filter), json.dumps(prefilter)]) + ')'
+        value = self.evaluate(expression)
+        viewport = value['viewport']
+        # 窗口左右边框等宽，剩余的高度差为标题栏加下边框；钉钉的CEF窗口一般无边框，偏移为0
+        if global_var.cdp_viewport_offset is not None:
+            offset_x, offset_y = global_var.cdp_viewport_offset
+        else:
+            offset_x = max(0, (viewport['outerWidth'] - viewport['innerWidth']) / 2)
+            offset_y = max(0, viewport['outerHeight'] - viewport['innerHeight'] - offset_x)
+        ratio = global_var.cdp_device_pixel_ratio or viewport['devicePixelRatio'] or 1
+        origin_x, origin_y = viewport['screenX'] + offset_x, viewport['screenY'] + offset_y
+        hits = [[(origin_x + left) * ratio, (origin_y + top) * ratio, (origin_x + right) * ratio, (origin_y + bottom) * ratio, text] for left, top, right, bottom, text in value['hits']]
+        return hits, viewport
+
+    def close(self):
+        self.transport.close()
+
+# 已建立的CDP会话，key为页面的webSocketDebuggerUrl（回放fixture时为页面id）
+cdp_session_dict = {}
+cdp_session_lock = threading.Lock()
+# 回放用的FixtureCdpTransport，key为global_var.cdp_fixture
+cdp_fixture_dict = {}
+
+def get_cdp_fixture():
+    '''
+    SDK内部接口，外部不要使用
+    :return: global_var.cdp_fixture对应的FixtureCdpTransport实例，未设置时为None
+    '''
+
+    fixture = global_var.cdp_fixture
+    if fixture is None:
+        return None
+    key = fixture if isinstance(fixture, str) else id(fixture)
+    if key not in cdp_fixture_dict:
+        cdp_fixture_dict[key] = FixtureCdpTransport(fixture)
+    return cdp_fixture_dict[key]
+
+def get_cdp_port():
+    '''
+    获取CEF远程调试端口，默认与launch_dingtalk(open_cef_port=True)一致：win为16888、mac为16889
+    :return: 端口
+    '''
+
+    if global_var.cdp_port is not None:
+        return global_var.cdp_port
+    return 16888 if 'win' == system() else 16889
+
+def list_cdp_targets(port=None, host=None):
+    '''
+    列出CEF远程调试端口上的所有调试目标（页面）
+    :param port: 远程调试端口，默认为get_cdp_port()
+    :param host: 远程调试地址，默认为global_var.cdp_host
+    :return: 列表，每个元素为 {'id', 'type', 'title', 'url', 'webSocketDebuggerUrl', ……}
+    '''
+
+    import urllib.request
+
+    fixture = get_cdp_fixture()
+    if fixture is not None:
+        return fixture.targets
+    if port is None:
+        port = get_cdp_port()
+    if host is None:
+        host = global_var.cdp_host
+    with urllib.request.urlopen(f"http://{host}:{port}/json/list", timeout=global_var.cdp_timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+def get_cdp_session(target=None, port=None, host=None):
+    '''
+    获取与CEF页面的CDP会话，同一页面在进程内只连接1次
+    :param target: 要连接的页面，默认为None取第一个page类型的页面；可传字符串，匹配页面的id或title/url中包含该字符串的页面；也可传函数，入参为页面信息dict、返回是否匹配
+    :param port: 远程调试端口，默认为get_cdp_port()
+    :param host: 远程调试地址，默认为global_var.cdp_host
+    :return: CdpSession实例，找不到匹配的页面时返回None；远程调试端口未开启时抛出OSError
+    '''
+
+    matched = None
+    for item in list_cdp_targets(port=port, host=host):
+        if item.get('type') != 'page':
+            continue
+        if target is None or (callable(target) and target(item)) or (isinstance(target, str) and (target == item.get('id') or target in item.get('title', '') or target in item.get('url', ''))):
+            matched = item
+            break
+    if matched is None:
+        return None
+
+    fixture = get_cdp_fixture()
+    key = matched.get('id') if fixture is not None else matched.get('webSocketDebuggerUrl')
+    with cdp_session_lock:
+        session = cdp_session_dict.get(key)
+        if session is None:
+            transport = fixture if fixture is not None else WebSocketCdpTransport(matched['webSocketDebuggerUrl'])
+            session = CdpSession(transport, target=matched)
+            cdp_session_dict[key] = session
+        return session
+
+def close_cdp_sessions():
+    '''
+    断开所有CDP会话（如重启钉钉后调用）
+    :return:
+    '''
+
+    with cdp_session_lock:
+        sessions = list(cdp_session_dict.values())
+        cdp_session_dict.clear()
+    for session in sessions:
+        try:
+            session.close()
+        except Exception:
+            pass
+
+def exist_cdp(query, by=CdpBy.TEXT, target=None, equal_filter=False, filter_special_chars=False, regex=False, region=None, session=None):
+    '''
+    经由CDP查出CEF页面内目标元素的所有命中区域，结果格式与exist_text一致、可直接传给act_point交互
+    :param query: 目标文字、CSS选择器或XPath，由by决定
+    :param by: 定位方式，默认为按文字定位，详见CdpBy枚举
+    :param target: 要查找的页面，详见get_cdp_session接口的target参数
+    :param equal_filter: 按文字定位时是否过滤出与目标文字完全相等的命中区域，详见exist_text接口的equal_filter参数
+    :param filter_special_chars: 按文字定位时是否干掉 除了 "字母（大小写）、数字（阿拉伯）、汉字" 之外 的字符
+    :param regex: 按文字定位时目标文字是否为正则表达式，详见exist_text接口的regex参数
+    :param region: 搜索区域，默认为None表示全屏，可传矩形(left, top, right, bottom)或锚点dict，详见exist_pic接口的region参数；只保留中心点在搜索区域内的命中区域
+    :param session: 已建立的CdpSession，默认为None按target获取
+    :return: ExistRes，同exist_text接口的结果，命中区域集合中的ocr_text为节点的文字；meta中记录了source为'cdp'、页面信息target及窗口信息viewport。找不到页面时meta['target']为None
+    '''
+
+    if session is None:
+        session = get_cdp_session(target=target)
+    if session is None:
+        return ExistRes([False, MatchSet(boxes=np.zeros((0, 4), dtype=np.float64), texts=[])], meta={'source': 'cdp', 'by': by, 'target': None})
+
+    start_time = time.time()
+    prefilter = by == CdpBy.TEXT and not regex and not filter_special_chars # 其余情况要取回所有可见文字，按与OCR一致的规则过滤
+    hits, viewport = session.locate(query, by=by, equal_filter=equal_filter, prefilter=prefilter)
+    if region is not None:
+        left, top, right, bottom = resolve_region(region, get_capture_backend().grab()) if isinstance(region, dict) else region
+        hits = [hit for hit in hits if left <= (hit[0] + hit[2]) / 2 <= right and top <= (hit[1] + hit[3]) / 2 <= bottom]
+    if by == CdpBy.TEXT:
+        # 转成OCR原始识别结果的格式，复用exist_text的文字匹配规则
+        all_lines = [[[[left, top], [right, top], [right, bottom], [left, bottom]], (text, 1.0)] for left, top, right, bottom, text in hits]
+        final_lines = match_ocr_lines(query, all_lines, equal_filter=equal_filter, filter_special_chars=filter_special_chars, regex=regex)
+    else:
+        final_lines = MatchSet(boxes=np.array([hit[:4] for hit in hits], dtype=np.float64).reshape(-1, 4), texts=[hit[4] for hit in hits])
+
+    meta = {
+        'source': 'cdp',
+        'by': by,
+        'region': region,
+        'target': {'id': session.target.get('id'), 'title': session.target.get('title'), 'url': session.target.get('url')},
+        'viewport': viewport,
+        'locate_seconds': time.time() - start_time
+    }
+    return ExistRes([len(final_lines) > 0, final_lines], meta=meta)
+
+def loop_exist_cdp(query, by=CdpBy.TEXT, target=None, equal_filter=False, before=None, timeout=None, interval=None, after=None, filter_special_chars=False, regex=False, region=None, ocr_fallback=None):
+    '''
+    轮询经由CDP查出CEF页面内目标元素的所有命中区域，无需截图和OCR；CDP不可用时回退到loop_exist_text，页面中一直查不到时再用OCR识别1次当前屏幕（仅对按文字定位生效）
+    :param query: 目标文字、CSS选择器或XPath，由by决定
+    :param by: 定位方式，默认为按文字定位，详见CdpBy枚举
+    :param target: 要查找的页面，详见get_cdp_session接口的target参数
+    :param equal_filter: 按文字定位时是否过滤出与目标文字完全相等的命中区域，详见exist_text接口的equal_filter参数
+    :param before: 第一次轮询前等待的秒数，默认为{global_var.loop_exist_text_before}
+    :param timeout: 轮询的最大超时秒数，默认为{global_var.loop_exist_text_timeout}
+    :param interval: 在未轮询超时的情况下，且未轮询到目标区域时的轮询间隔秒数，默认为{global_var.loop_exist_text_interval}
+    :param after: 在未轮询超时的情况下，且轮询到目标区域后等待的秒数，默认为{global_var.loop_exist_text_after}
+    :param filter_special_chars: 按文字定位时是否干掉 除了 "字母（大小写）、数字（阿拉伯）、汉字" 之外 的字符
+    :param regex: 按文字定位时目标文字是否为正则表达式，详见exist_text接口的regex参数
+    :param region: 搜索区域，详见exist_cdp接口的region参数
+    :param ocr_fallback: 按文字定位时是否允许回退到OCR，默认为global_var.cdp_ocr_fallback
+    :return: exist_res，来自exist_cdp的接口结果；回退到OCR时来自exist_text的接口结果，meta['source']为'ocr'
+    '''
+
+    if before is None:
+        before = global_var.loop_exist_text_before
+    if timeout is None:
+        timeout = global_var.loop_exist_text_timeout
+    if interval is None:
+        interval = global_var.loop_exist_text_interval
+    if after is None:
+        after = global_var.loop_exist_text_after
+    if ocr_fallback is None:
+        ocr_fallback = global_var.cdp_ocr_fallback
+    ocr_fallback = ocr_fallback and by == CdpBy.TEXT
+
+    time.sleep(before)  # 在轮询开始前等待before秒
+
+    start_time = time.time()  # 开始轮询的时间戳
+    session = None
+    try:
+        session = get_cdp_session(target=target)
+    except (OSError, ImportError): # 远程调试端口未开启，或未安装websocket-client
+        pass
+    if session is None:
+        assert ocr_fallback, f"CDP不可用，找不到CEF页面：port={get_cdp_port()}, target={target}"
+        exist_res = loop_exist_text(text=query, equal_filter=equal_filter, before=0, timeout=timeout, interval=interval, after=after, filter_special_chars=filter_special_chars, region=region)
+        exist_res.meta['source'] = 'ocr'
+        return exist_res
+
+    wait = begin_wait(interval=interval, timeout=timeout)
+    try:
+        while True:
+            wait.poll()
+            try:
+                exist_res = exist_cdp(query, by=by, equal_filter=equal_filter, filter_special_chars=filter_special_chars, regex=regex, region=region, session=session)
+            except OSError: # 轮询中途连接断开，剩余时间回退到OCR
+                wait.finish(False)
+                close_cdp_sessions()
+                if not ocr_fallback:
+                    raise
+                exist_res = loop_exist_text(text=query, equal_filter=equal_filter, before=0, timeout=max(0, timeout - (time.time() - start_time)), interval=interval, after=after, filter_special_chars=filter_special_chars, region=region)
+                exist_res.meta['source'] = 'ocr'
+                return exist_res
+            duration = time.time() - start_time # 耗时
+            if exist_res[0]: # 已轮询到目标元素
+                exist_res.meta['wait'] = wait.finish(True)
+                if duration <= timeout:
+                    time.sleep(after)  # 在轮询到目标元素后等待after秒
+                return exist_res
+            if duration > timeout: # 已超时
+                exist_res.meta['wait'] = wait.finish(False)
+                if ocr_fallback: # 页面中查不到（如文字画在canvas上），用OCR兜底识别1次
+                    ocr_res = exist_text(text=query, pic_full_path=get_capture_backend().grab(), equal_filter=equal_filter, filter_special_chars=filter_special_chars, region=region, regex=regex)
+                    if ocr_res[0]:
+                        ocr_res.meta['source'] = 'ocr'
+                        return ocr_res
+                return exist_res
+            wait.sleep() # 按等待策略等到下一次轮询
+    finally:
+        wait.finish(False) # 异常退出时也要结束本次等待，已结束的等待不会重复计入统计
+
+def loop_act_cdp(query, by=CdpBy.TEXT, target=None, equal_filter=False, before=None, timeout=None, interval=None, after=None, act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK, filter_special_chars=False, regex=False, region=None, ocr_fallback=None):
+    '''
+    在loop_exist_cdp接口轮询结果的基础上，增加act_point进行交互，内部会断言存在命中区域
+    :param act_position: 与命中区域进行交互的点位，默认为中心点，其他点位详见Position枚举
+    :param priority_index: 在命中区域集合中选择要交互的那个命中区域下标，默认为0、表示默认交互第1个命中区域
+    :param act_mode: 与命中区域进行交互的交互模式，默认为左单击，其他交互模式详见ActMode枚举
+    其余参数同loop_exist_cdp
+    :return: [exist_res, act_res]，其中exist_res来自loop_exist_cdp的接口结果，act_res来自act_point的接口结果
+    '''
+
+    exist_res = loop_exist_cdp(query, by=by, target=target, equal_filter=equal_filter, before=before, timeout=timeout, interval=interval, after=after, filter_special_chars=filter_special_chars, regex=regex, region=region, ocr_fallback=ocr_fallback)
+    assert exist_res[0], f"轮询CDP定位不到目标元素, query={query}, by={by}, target={target}, equal_filter={equal_filter}, timeout={timeout}"
+    act_res = act_point(exist_res=exist_res, act_position=act_position, priority_index=priority_index, act_mode=act_mode)
+    return [exist_res, act_res]
@@ -1,21 +1,27 @@
-import pyautogui
 import time
 from .. import global_var
 import os
-import platform
+import sys
 import uuid
-from paddleocr import PaddleOCR
-import cv2
-import pyperclip
+from .lazy_module import cv2, np
 from enum import Enum
-from pynput import mouse
 import copy
 import inspect
 import hashlib
-import socket
 import re
 from typing import List, Dict
-import numpy as np
+import threading
+import math
+import json
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from collections import OrderedDict
+from .capture import get_capture_backend
+from .host_profile import get_host_profile
+from .template_pack import get_template_pack, get_template_variant, clear_template_packs
+from .pic_cache import get_pic_cache_index
+from .match_set import MatchSet
+from .wait_policy import begin_wait, notify_ui_event
+from .ocr_pool import get_ocr_pool
 
 class Position(Enum):
     '''
@@ -68,6 +74,34 @@ class SortRule(Enum):
     THRESHOLD_REVERSE = 0 # 相似度倒序
     Y_X = 1               # 优先按左上点坐标的Y值进行正序排列，Y一样的情况下，再按X值进行正序排列
 
+class MatchMode(Enum):
+    '''
+    模板匹配策略，枚举类型
+    '''
+
+    ALL = 0    # 多目标匹配，取出所有高于阈值的命中点
+    SINGLE = 1 # 单目标匹配，用cv2.minMaxLoc只取相似度最高的1个命中点，性能最好
+    TOP_K = 2  # 多目标匹配，用np.argpartition只取相似度最高的max_results个命中点，无需对所有高于阈值的点排序
+
+class Direction(Enum):
+    '''
+    命中区域相对于锚点的方位，枚举类型
+    '''
+
+    LEFT = 0  # 左侧
+    RIGHT = 1 # 右侧
+    ABOVE = 2 # 上方
+    BELOW = 3 # 下方
+
+class ExistRes(list):
+    '''
+    exist_pic/exist_text的接口结果，本质仍是 [bool, 命中区域集合] 这个list、用法不变，额外携带本次识别过程的元数据meta（如匹配策略、搜索区域、耗时）
+    '''
+
+    def __init__(self, iterable=(), meta=None):
+        super().__init__(iterable)
+        self.meta = {} if meta is None else meta
+
 def get_path_by_dirname(path, times=1):
     '''
     对path循环times进行os.path.dirname操作
@@ -86,16 +120,8 @@ def get_uuid():
     :return: uuid
     '''
 
-    user_root_path = os.path.expanduser('~')
-    pc_uuid_path = os.path.join(user_root_path, 'pc_uuid.txt')
-    if os.path.exists(pc_uuid_path):
-        with open(pc_uuid_path, 'r', encoding='utf-8') as file:
-            pc_uuid_str = file.read()
-    else:
-        pc_uuid_str = str(uuid.uuid4())
-        with open(pc_uuid_path, 'w', encoding='utf-8') as file:
-            file.write(pc_uuid_str)
-    return pc_uuid_str
+    return get_host_profile().uuid
+
 
 def get_local_ip():
     '''
@@ -103,28 +129,17 @@ def get_local_ip():
     :return: 本机ip
     '''
 
-    try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(('8.8.8.8', 80))
-        ip = s.getsockname()[0]
-    except:
-        ip = '127.0.0.1'
-    finally:
-        s.close()
-    return ip
+    return get_host_profile().local_ip
+
 
 def system():
     '''
     获取PC设备的系统简称
-    :return: win / mac
+    :return: win / mac / linux
     '''
 
-    system = platform.platform().lower()
-    if 'win' in system:
-        return 'win'
-    elif 'mac' in system:
-        return 'mac'
-    assert 0, '新系统'
+    return get_host_profile().system
+
 
 def architecture():
     '''
@@ -132,13 +147,8 @@ def architecture():
     :return: arm64 / x86
     '''
 
-    system = platform.platform().lower()
-    if 'mac' in system:
-        if 'arm64' in system:
-            return 'arm64'
-        elif 'x86' in system:
-            return 'x86'
-    assert False, 'architecture()只适用于mac'
+    return get_host_profile().architecture
+
 
 def move_mouse_to_edge():
     '''
@@ -146,6 +156,7 @@ def move_mouse_to_edge():
     :return:
     '''
 
+    import pyautogui
     pyautogui.FAILSAFE = False
     pyautogui.moveTo(0, 0)
 
@@ -156,6 +167,8 @@ def input_text(text):
     :return:
     '''
 
+    import pyautogui
+    import pyperclip
     pyperclip.copy(text)
     if 'mac' == system():
         pyautogui.hotkey('command', 'v', interval=0.25)
@@ -189,10 +202,59 @@ def screenshot(name=None, sub_path=None):
     #         assert False, 'pyautogui截图失败'
 
     # 貌似上面这段检测截图是否存在的代码会受到录屏的影响
-    pyautogui.screenshot(full_path)
+    cv2.imwrite(full_path, screenshot_frame())
 
     return full_path
 
+def screenshot_frame():
+    '''
+    对PC设备屏幕截图，截图帧只保留在内存中、不落盘，供exist_pic/exist_text及各loop_*接口直接使用。截图由global_var.capture_backend选中的截图后端完成
+    :return: 截图帧，BGR格式的numpy数组，形如 shape=(1800, 2880, 3)
+    '''
+
+    return get_capture_backend().grab()
+
+def save_frame(frame, name=None, sub_path=None):
+    '''
+    将内存中的截图帧落盘保存为png，仅在需要持久化截图时显式调用
+    :param frame: 截图帧，来自screenshot_frame()
+    :param name: 截图文件名称，默认使用了时间戳避免重名，同screenshot()
+    :param sub_path: 截图文件存放路径，默认为 {global_var.root_path}/screenshot
+    :return: 截图文件完整路径
+    '''
+
+    if name is None:
+        name = str(time.time()) + '_' + str(uuid.uuid4())
+    if sub_path is None:
+        sub_path = os.path.join(global_var.root_path, 'screenshot')
+    os.makedirs(sub_path, exist_ok=True)
+
+    full_path = os.path.join(sub_path, name + '.png')
+    cv2.imwrite(full_path, frame)
+    return full_path
+
+def read_pic(pic_full_path):
+    '''
+    统一读取图片，兼容 图片的完整路径 与 内存中的截图帧 两种入参
+    :param pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧
+    :return: BGR格式的numpy数组
+    '''
+
+    if isinstance(pic_full_path, np.ndarray):
+        return pic_full_path
+    return cv2.imread(pic_full_path)
+
+def pic_desc(pic_full_path):
+    '''
+    生成图片入参的描述，用于断言信息
+    :param pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧
+    :return: 图片的完整路径，或形如 frame(1800x2880x3) 的截图帧描述
+    '''
+
+    if isinstance(pic_full_path, np.ndarray):
+        return 'frame(' + 'x'.join([str(i) for i in pic_full_path.shape]) + ')'
+    return str(pic_full_path)
+
 def filter_letters_numbers_chinese_characters(origin_str):
     '''
     过滤出字母（大小写）、数字（阿拉伯）、汉字
@@ -202,15 +264,166 @@ def filter_letters_numbers_chinese_characters(origin_str):
 
     return re.sub(r"[^A-Za-z0-9一-龥]", "", origin_str)
 
-def exist_text(text, pic_full_path, equal_filter=False, preview=False, filter_special_chars=False):
+# OCR引擎池，key为(lang, use_angle_cls, use_gpu)，同一配置的PaddleOCR在进程内只初始化1次
+ocr_engine_dict = {}
+# OCR引擎的加载耗时与推理耗时统计，key同ocr_engine_dict
+ocr_engine_stats = {}
+# 创建引擎时用的锁
+ocr_engine_lock = threading.Lock()
+# 每个引擎各自的推理锁，paddle推理不保证线程安全
+ocr_infer_lock_dict = {}
+
+def get_ocr_engine_key(lang=None, use_angle_cls=None, use_gpu=None):
+    '''
+    将OCR引擎配置补全为默认值，拼接成OCR引擎池的key
+    :param lang: OCR引擎的识别语言，默认为global_var.ocr_lang
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
+    :param use_gpu: 是否使用GPU推理，默认为global_var.ocr_use_gpu
+    :return: (lang, use_angle_cls, use_gpu)
+    '''
+
+    if lang is None:
+        lang = global_var.ocr_lang
+    if use_angle_cls is None:
+        use_angle_cls = global_var.ocr_use_angle_cls
+    if use_gpu is None:
+        use_gpu = global_var.ocr_use_gpu
+    return (lang, use_angle_cls, use_gpu)
+
+def get_ocr_engine(lang=None, use_angle_cls=None, use_gpu=None):
+    '''
+    懒加载获取OCR引擎，同一配置的引擎在进程内只会加载1次模型、之后所有OCR接口全局复用
+    :param lang: OCR引擎的识别语言，默认为global_var.ocr_lang
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
+    :param use_gpu: 是否使用GPU推理，默认为global_var.ocr_use_gpu
+    :return: PaddleOCR实例
+    '''
+
+    key = get_ocr_engine_key(lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu)
+    engine = ocr_engine_dict.get(key)
+    if engine is None:
+        with ocr_engine_lock:
+            engine = ocr_engine_dict.get(key)
+            if engine is None: # 双重检查，避免多线程重复加载模型
+                from paddleocr import PaddleOCR # paddle很重，只在第一次OCR时才导入
+                start_time = time.time()
+                # 引擎返回所有识别结果，置信度统一在ocr_lines/staged_ocr_lines中按当时的global_var.ocr_drop_score过滤
+                engine = PaddleOCR(lang=key[0], use_angle_cls=key[1], use_gpu=key[2], drop_score=0)
+                ocr_engine_stats[key] = {
+                    'lang': key[0],
+                    'use_angle_cls': key[1],
+                    'use_gpu': key[2],
+                    'load_seconds': time.time() - start_time, # 模型加载耗时
+                    'infer_count': 0,                         # 推理次数
+                    'infer_seconds': 0.0,                     # 推理总耗时
+                    'last_infer_seconds': 0.0                 # 最近一次推理耗时
+                }
+                ocr_infer_lock_dict[key] = threading.Lock()
+                ocr_engine_dict[key] = engine
+    return engine
+
+def warm_up_ocr_engine(lang=None, use_angle_cls=None, use_gpu=None):
+    '''
+    预热OCR引擎，提前加载模型，建议在setup_module中调用，避免第一次exist_text时才加载模型而占用轮询的超时时间；
+    配置了OCR工作进程池时不在本进程加载模型，改为等待工作进程池预热完成（本机OCR服务则提交一帧小图确认已连通）
+    :param lang: OCR引擎的识别语言，默认为global_var.ocr_lang
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
+    :param use_gpu: 是否使用GPU推理，默认为global_var.ocr_use_gpu
+    :return: 模型加载耗时（秒），配置了OCR工作进程池时为等待其预热完成的耗时
+    '''
+
+    pool = get_ocr_pool()
+    if pool is not None:
+        start_time = time.time()
+        pool.warm_up()
+        return time.time() - start_time
+
+    key = get_ocr_engine_key(lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu)
+    get_ocr_engine(lang=key[0], use_angle_cls=key[1], use_gpu=key[2])
+    return ocr_engine_stats[key]['load_seconds']
+
+def run_ocr(img, lang=None, use_angle_cls=None, use_gpu=None, det=True, rec=True):
+    '''
+    使用OCR引擎池中的引擎进行文字识别，并统计推理耗时；配置了OCR工作进程池（global_var.ocr_pool_workers / global_var.ocr_pool_address）时改由工作进程识别，本线程只等待结果
+    :param img: 图片的完整路径，或BGR格式的numpy数组；det为False时可传多张小图组成的list
+    :param lang: OCR引擎的识别语言，默认为global_var.ocr_lang
+    :param use_angle_cls: 本次推理是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls；桌面端UI文字不会旋转，传False可省掉方向分类的耗时，且不会因此额外加载一个引擎
+    :param use_gpu: 是否使用GPU推理，默认为global_var.ocr_use_gpu
+    :param det: 是否进行文字检测，为False时只对传入的小图进行识别
+    :param rec: 是否进行文字识别，为False时只进行文字检测
+    :return: det和rec都为True时为PaddleOCR的原始识别结果 [[[左上,右上,右下,左下], (ocr_text, 置信度)], ……]，未按global_var.ocr_drop_score过滤；只检测时为 [[左上,右上,右下,左下], ……]；只识别时为 [(ocr_text, 置信度), ……]
+    '''
+
+    pool = get_ocr_pool()
+    if pool is not None:
+        return pool.submit(img, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu, det=det, rec=rec).result()
+
+    key = get_ocr_engine_key(lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu)
+    cls = key[1]
+    # 默认配置的引擎已加载了方向分类器时，不需要分类的推理直接复用它
+    key = (key[0], cls or global_var.ocr_use_angle_cls, key[2])
+    engine = get_ocr_engine(lang=key[0], use_angle_cls=key[1], use_gpu=key[2])
+    with ocr_infer_lock_dict[key]:
+        start_time = time.time()
+        all_lines = engine.ocr(img, det=det, rec=rec, cls=cls)
+        duration = time.time() - start_time
+        stats = ocr_engine_stats[key]
+        stats['infer_count'] += 1
+        stats['infer_seconds'] += duration
+        stats['last_infer_seconds'] = duration
+    return all_lines
+
+def get_ocr_engine_stats():
+    '''
+    获取OCR引擎池中各引擎的加载耗时与推理耗时统计
+    :return: [{'lang', 'use_angle_cls', 'use_gpu', 'load_seconds', 'infer_count', 'infer_seconds', 'last_infer_seconds'}, ……]
+    '''
+
+    return [dict(stats) for stats in ocr_engine_stats.values()]
+
+def resolve_region(region, img):
+    '''
+    将region入参解析为截图中的矩形搜索区域
+    :param region: None / 矩形(left, top, right, bottom) / 锚点dict，详见exist_pic接口的region参数
+    :param img: 截图，BGR格式的numpy数组
+    :return: 已裁剪到截图范围内的整数矩形(left, top, right, bottom)，region为None时为全屏；锚点没命中时为空矩形
+    '''
+
+    img_height, img_width = img.shape[0], img.shape[1]
+    if region is None:
+        return (0, 0, img_width, img_height)
+
+    if isinstance(region, dict): # 以锚点模板截图的命中区域来推导搜索区域
+        assert 'anchor' in region, 'anchor是region中必传的key'
+        anchor_res = exist_pic(name=region['anchor'], pic_full_path=img, threshold=region.get('threshold'), sub_path=region.get('sub_path'), subfolder=region.get('subfolder', ''), region=region.get('region'))
+        if not anchor_res[0]:
+            return (0, 0, 0, 0)
+        expand = region.get('expand', (0, 0, 0, 0))
+        left_top = anchor_res[1][0][Position.LEFT_TOP.value]
+        right_bottom = anchor_res[1][0][Position.RIGHT_BOTTOM.value]
+        region = (left_top[0] - expand[0], left_top[1] - expand[1], right_bottom[0] + expand[2], right_bottom[1] + expand[3])
+
+    left, top, right, bottom = [int(round(i)) for i in region]
+    left = min(max(left, 0), img_width)
+    right = min(max(right, left), img_width)
+    top = min(max(top, 0), img_height)
+    bottom = min(max(bottom, top), img_height)
+    return (left, top, right, bottom)
+
+def exist_text(text, pic_full_path, equal_filter=False, preview=False, filter_special_chars=False, region=None, staged=None, use_angle_cls=None, stop_at_first=False, regex=False):
     '''
     OCR识别一张图片中目标文字命中的所有区域
     :param text: 目标文字
-    :param pic_full_path: 图片的完整路径
+    :param pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧
     :param equal_filter: 是否过滤出与目标文字完全相等的命中区域。比如当OCR识别出的ocr_text集合为['12abc34','2abc3','abc34']，目标文字text为'2abc3': 当equal_filter为False时，可以命中['12abc34','2abc3']；当equal_filter为True时，只能命中['2abc3']
     :param preview: 是否对目标文字的所有命中区域进行红色描边预览（用于开发脚本时的调试，实际脚本运行测试时要将preview改成False）
     :param filter_special_chars: 是否干掉 除了 "字母（大小写）、数字（阿拉伯）、汉字" 之外 的字符
-    :return:
+    :param region: 搜索区域，默认为None表示全屏搜索，可传矩形(left, top, right, bottom)或锚点dict，详见exist_pic接口的region参数
+    :param staged: 是否走分阶段OCR，默认为global_var.ocr_staged。为True时先只做文字检测，按文字框与目标文字的长宽比吻合程度排序后再分批识别，详见staged_ocr_lines接口
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
+    :param stop_at_first: 分阶段OCR时是否在识别出第一个命中区域后就停止识别剩余的文字框，只关心第1个命中区域（priority_index为0）时可传True；非分阶段OCR时不生效
+    :param regex: 目标文字是否为正则表达式，为True时equal_filter为False表示re.search、为True表示re.fullmatch
+    :return: ExistRes，用法同list；命中区域集合为MatchSet，只存外接矩形、点位按需计算，兼容以下list格式的下标访问（文字框按左上角和右下角还原为矩形）；点位为MatchPoint，原地改写如exist_res[1][0][Position.CENTER.value][0] += dx 会记录到该命中区域上、对之后的访问和点击生效；MatchSet支持list的增删改及拼接，但不是list的子类，isinstance(exist_res[1], list)为False，json序列化前需改为exist_res[1].tolist()，如json.dumps([exist_res[0], exist_res[1].tolist()])
     [bool, # 目标文字是否有命中区域
         [ # 命中区域集合
             [ # 命中区域1
@@ -256,61 +469,310 @@ def exist_text(text, pic_full_path, equal_filter=False, preview=False, filter_sp
     [left_bottomX,left_bottomY]**********[mid_bottomX,mid_bottomY]**********[right_bottomX,right_bottomY]
     '''
 
-    ocr = PaddleOCR(use_angle_cls=True, use_gpu=True)
-    all_lines = ocr.ocr(pic_full_path)
-    matched_lines = []
-    for line in all_lines:
-        if filter_special_chars:
-            line[1] = (filter_letters_numbers_chinese_characters(line[1][0]), line[1][1])
-        if equal_filter and text == line[1][0]:
-            matched_lines.append(line)
-        elif not equal_filter and text in line[1][0]:
-            matched_lines.append(line)
-
-    img = None
-    if preview:
-        img = cv2.imread(pic_full_path)
-
-    final_lines = [] # [[[中心点X,中心点Y],[左上X,左上Y],[中上X,中上Y],……顺时针,ocr_text],[]]
-    for line in matched_lines:
-        final_line = [
-            [(line[0][0][0] + line[0][2][0]) / 2, (line[0][0][1] + line[0][2][1]) / 2], # [中心点X,中心点Y]
-            [line[0][0][0], line[0][0][1]],                                             # [左上X,左上Y]
-            [(line[0][0][0] + line[0][2][0]) / 2, line[0][0][1]],                       # [中上X,中上Y]
-            [line[0][1][0], line[0][1][1]],                                             # [右上X,右上Y]
-            [line[0][1][0], (line[0][0][1] + line[0][2][1]) / 2],                       # [右中X,右中Y]
-            [line[0][2][0], line[0][2][1]],                                             # [右下X,右下Y]
-            [(line[0][0][0] + line[0][2][0]) / 2, line[0][2][1]],                       # [中下X,中下Y]
-            [line[0][0][0], line[0][2][1]],                                             # [左下X,左下Y]
-            [line[0][0][0], (line[0][0][1] + line[0][2][1]) / 2],                       # [左中X,左中Y]
-            line[1][0] # ocr_text
-        ]
-        final_lines.append(final_line)
+    if staged is None:
+        staged = global_var.ocr_staged
 
-        if preview:
-            cv2.rectangle(img, (int(final_line[1][0]), int(final_line[1][1])), (int(final_line[5][0]), int(final_line[5][1])), (0, 0, 255), 2)
+    img = read_pic(pic_full_path)
+    region_left, region_top, region_right, region_bottom = resolve_region(region, img)
+    if staged:
+        all_lines = staged_ocr_lines(img, text, region=(region_left, region_top, region_right, region_bottom), equal_filter=equal_filter, filter_special_chars=filter_special_chars, stop_at_first=stop_at_first, use_angle_cls=use_angle_cls, regex=regex)
+    else:
+        all_lines = ocr_lines(img, region=(region_left, region_top, region_right, region_bottom), use_angle_cls=use_angle_cls)
+    final_lines = match_ocr_lines(text, all_lines, equal_filter=equal_filter, filter_special_chars=filter_special_chars, offset_x=region_left, offset_y=region_top, regex=regex)
 
     if preview:
+        img = img.copy() # 拷贝一份再描边，避免污染外部传入的截图帧
+        for final_line in final_lines:
+            cv2.rectangle(img, (int(final_line[1][0]), int(final_line[1][1])), (int(final_line[5][0]), int(final_line[5][1])), (0, 0, 255), 2)
         cv2.imshow('img', img)
         cv2.waitKey()
         cv2.destroyAllWindows()
 
-    return [len(final_lines) > 0, final_lines]
+    return ExistRes([len(final_lines) > 0, final_lines], meta={'region': region, 'staged': staged})
+
+def match_ocr_lines(text, all_lines, equal_filter=False, filter_special_chars=False, offset_x=0, offset_y=0, regex=False):
+    '''
+    从OCR的原始识别结果中筛选出目标文字的命中区域，不会修改all_lines，同一份识别结果可以反复用于不同的目标文字
+    :param text: 目标文字
+    :param all_lines: PaddleOCR的原始识别结果 [[[左上,右上,右下,左下], (ocr_text, 置信度)], ……]
+    :param equal_filter: 是否过滤出与目标文字完全相等的命中区域，详见exist_text接口的equal_filter参数
+    :param filter_special_chars: 是否干掉 除了 "字母（大小写）、数字（阿拉伯）、汉字" 之外 的字符
+    :param offset_x: 坐标的X偏移量，OCR只识别了搜索区域时为搜索区域的left
+    :param offset_y: 坐标的Y偏移量，OCR只识别了搜索区域时为搜索区域的top
+    :param regex: 目标文字是否为正则表达式，详见exist_text接口的regex参数
+    :return: 命中区域集合MatchSet，同exist_text接口结果的exist_res[1]
+    '''
+
+    boxes = []
+    texts = []
+    for line in all_lines:
+        ocr_text = line[1][0]
+        if filter_special_chars:
+            ocr_text = filter_letters_numbers_chinese_characters(ocr_text)
+        if regex:
+            matcher = re.fullmatch if equal_filter else re.search
+            if matcher(text, ocr_text) is None:
+                continue
+        elif equal_filter and text != ocr_text:
+            continue
+        elif not equal_filter and text not in ocr_text:
+            continue
+
+        # 文字框只保留左上角和右下角，从搜索区域坐标还原为全屏坐标
+        boxes.append([line[0][0][0] + offset_x, line[0][0][1] + offset_y, line[0][2][0] + offset_x, line[0][2][1] + offset_y])
+        texts.append(ocr_text)
+    return MatchSet(boxes=np.array(boxes, dtype=np.float64).reshape(-1, 4), texts=texts)
+
+class OcrResultCache():
+    '''
+    OCR识别结果缓存，key为截图（或搜索区域）内容的哈希、OCR引擎配置及置信度下限，value为按置信度下限过滤后的PaddleOCR识别结果，
+    同一屏幕上反复查找不同的目标文字时只需OCR一次；按存活时间（global_var.ocr_cache_ttl）过期、按条数（global_var.ocr_cache_max_entries）LRU淘汰
+    '''
+
+    def __init__(self):
+        self.lines_dict = OrderedDict() # key -> (写入时间戳, all_lines)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        ttl = global_var.ocr_cache_ttl
+        with self.lock:
+            item = self.lines_dict.get(key)
+            if item is not None and time.time() - item[0] <= ttl:
+                self.lines_dict.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None: # 已过期
+                del self.lines_dict[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, all_lines):
+        with self.lock:
+            self.lines_dict[key] = (time.time(), all_lines)
+            self.lines_dict.move_to_end(key)
+            while len(self.lines_dict) > global_var.ocr_cache_max_entries:
+                self.lines_dict.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.lines_dict.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.lines_dict), 'ttl': global_var.ocr_cache_ttl, 'max_entries': global_var.ocr_cache_max_entries}
+
+ocr_result_cache = OcrResultCache()
+
+def ocr_lines(img, region=None, lang=None, use_angle_cls=None, use_gpu=None):
+    '''
+    对截图（的搜索区域）进行OCR，丢弃置信度低于global_var.ocr_drop_score的识别结果，内容完全相同的截图在global_var.ocr_cache_ttl秒内只会OCR一次
+    :param img: 截图，BGR格式的numpy数组
+    :param region: 已解析好的矩形搜索区域(left, top, right, bottom)，默认为None表示全屏
+    :param lang: OCR引擎的识别语言，默认为global_var.ocr_lang
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
+    :param use_gpu: 是否使用GPU推理，默认为global_var.ocr_use_gpu
+    :return: PaddleOCR的原始识别结果 [[[左上,右上,右下,左下], (ocr_text, 置信度)], ……]，坐标相对于搜索区域，调用方不要修改
+    '''
+
+    if region is not None:
+        left, top, right, bottom = region
+        if right - left <= 0 or bottom - top <= 0:
+            return []
+        img = img[top:bottom, left:right]
+
+    drop_score = global_var.ocr_drop_score
+    if global_var.ocr_cache_ttl <= 0: # 关闭了OCR识别结果缓存
+        return [line for line in run_ocr(img, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu) or [] if line[1][1] >= drop_score]
+
+    key = get_ocr_cache_key(img, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu)
+    all_lines = ocr_result_cache.get(key)
+    if all_lines is None:
+        all_lines = [line for line in run_ocr(img, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu) or [] if line[1][1] >= drop_score]
+        ocr_result_cache.put(key, all_lines)
+    return all_lines
+
+def get_ocr_cache_key(img, lang=None, use_angle_cls=None, use_gpu=None):
+    '''
+    SDK内部接口，外部不要使用，OCR识别结果缓存的key
+    :return: (截图内容的哈希, 截图尺寸, (lang, use_angle_cls, use_gpu), global_var.ocr_drop_score)，缓存的识别结果已按置信度下限过滤，修改ocr_drop_score后不会复用
+    '''
+
+    img = np.ascontiguousarray(img)
+    return (hashlib.blake2b(img.data, digest_size=16).hexdigest(), img.shape, get_ocr_engine_key(lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu), global_var.ocr_drop_score)
+
+def sort_ocr_boxes(boxes):
+    '''
+    SDK内部接口，外部不要使用，同PaddleOCR的sorted_boxes，将文字框按从上到下、从左到右排序，使分阶段OCR的结果顺序与完整OCR一致
+    :param boxes: 文字框列表 [[左上,右上,右下,左下], ……]
+    :return: 排序后的文字框列表
+    '''
+
+    boxes = sorted(boxes, key=lambda box: (box[0][1], box[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, 0, -1):
+            if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+def rank_ocr_boxes(boxes, text, equal_filter=False):
+    '''
+    SDK内部接口，外部不要使用，按文字框可能包含目标文字的程度对文字框排序：根据目标文字的字符数预估文字框的长宽比（汉字约为1、其余字符约为0.55），
+    equal_filter为True时长宽比越接近越靠前，为False时只要文字框不比预估的短就都排在前面；同分时保持从上到下、从左到右的顺序
+    :param boxes: 已排序的文字框列表 [[左上,右上,右下,左下], ……]
+    :param text: 目标文字
+    :param equal_filter: 是否要求与目标文字完全相等
+    :return: 文字框下标的排序结果
+    '''
+
+    expected_ratio = max(sum([1.0 if ord(char) > 0x2e80 else 0.55 for char in text]), 0.55)
+    scores = []
+    for box in boxes:
+        width = max(abs(box[1][0] - box[0][0]), 1)
+        height = max(abs(box[3][1] - box[0][1]), 1)
+        log_ratio = math.log(width / height / expected_ratio)
+        scores.append(abs(log_ratio) if equal_filter else max(-log_ratio, 0))
+    # 0.3约为长宽比相差35%以内，视为同样可能，保持原顺序
+    return sorted(range(len(boxes)), key=lambda i: int(scores[i] / 0.3))
+
+def staged_ocr_lines(img, text, region=None, equal_filter=False, filter_special_chars=False, stop_at_first=False, use_angle_cls=None, lang=None, use_gpu=None, regex=False):
+    '''
+    分阶段OCR：先只做1次文字检测，再按文字框可能包含目标文字的程度排序、按global_var.ocr_staged_batch_size个一批进行识别，
+    stop_at_first为True时识别出第一个命中的文字框后就不再识别剩余的文字框；文字密集的页面（如聊天窗口）上识别是主要耗时，可以省掉大部分识别
+    文字框按外接矩形裁剪后识别（桌面端UI文字都是水平的），识别完所有文字框时结果会写入OCR识别结果缓存，与完整OCR共用
+    :param img: 截图，BGR格式的numpy数组
+    :param text: 目标文字
+    :param region: 已解析好的矩形搜索区域(left, top, right, bottom)，默认为None表示全屏
+    :param equal_filter: 是否过滤出与目标文字完全相等的命中区域
+    :param filter_special_chars: 是否干掉 除了 "字母（大小写）、数字（阿拉伯）、汉字" 之外 的字符
+    :param stop_at_first: 是否在识别出第一个命中的文字框后停止
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
+    :param lang: OCR引擎的识别语言，默认为global_var.ocr_lang
+    :param use_gpu: 是否使用GPU推理，默认为global_var.ocr_use_gpu
+    :param regex: 目标文字是否为正则表达式，为True时不按长宽比排序
+    :return: 同ocr_lines，stop_at_first为True时只包含已识别的文字框
+    '''
+
+    if region is not None:
+        left, top, right, bottom = region
+        if right - left <= 0 or bottom - top <= 0:
+            return []
+        img = img[top:bottom, left:right]
+
+    use_cache = global_var.ocr_cache_ttl > 0
+    if use_cache:
+        key = get_ocr_cache_key(img, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu)
+        all_lines = ocr_result_cache.get(key) # 已有完整的识别结果
+        if all_lines is not None:
+            return all_lines
+        det_key = key + ('det',)
+        boxes = ocr_result_cache.get(det_key)
+    if not use_cache or boxes is None:
+        boxes = sort_ocr_boxes(run_ocr(img, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu, rec=False) or [])
+        if use_cache:
+            ocr_result_cache.put(det_key, boxes)
+
+    drop_score = global_var.ocr_drop_score # 同完整OCR，丢弃置信度过低的识别结果
+    img_height, img_width = img.shape[:2]
+    order = list(range(len(boxes))) if regex else rank_ocr_boxes(boxes, text, equal_filter=equal_filter)
+    rec_dict = {} # 文字框下标 -> (ocr_text, 置信度)
+    batch_size = max(1, global_var.ocr_staged_batch_size)
+    for batch_start in range(0, len(order), batch_size):
+        batch = order[batch_start:batch_start + batch_size]
+        crops = []
+        for i in batch:
+            xs = [point[0] for point in boxes[i]]
+            ys = [point[1] for point in boxes[i]]
+            crop_left, crop_right = max(int(min(xs)), 0), min(int(math.ceil(max(xs))), img_width)
+            crop_top, crop_bottom = max(int(min(ys)), 0), min(int(math.ceil(max(ys))), img_height)
+            crops.append(img[crop_top:max(crop_bottom, crop_top + 1), crop_left:max(crop_right, crop_left + 1)])
+        rec_res = run_ocr(crops, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu, det=False)
+        matched = False
+        for i, res in zip(batch, rec_res):
+            rec_dict[i] = res
+            if stop_at_first and res[1] >= drop_score and match_ocr_lines(text, [[boxes[i], res]], equal_filter=equal_filter, filter_special_chars=filter_special_chars, regex=regex):
+                matched = True
+        if matched:
+            break
+
+    all_lines = [[boxes[i], rec_dict[i]] for i in range(len(boxes)) if i in rec_dict and rec_dict[i][1] >= drop_score]
+    if use_cache and len(rec_dict) == len(boxes):
+        ocr_result_cache.put(key, all_lines)
+    return all_lines
+
+def get_ocr_cache_stats():
+    '''
+    获取OCR识别结果缓存的命中统计
+    :return: {'hits': 命中次数, 'misses': 未命中次数, 'entries': 缓存的识别结果条数, 'ttl': 存活秒数, 'max_entries': 条数上限}
+    '''
+
+    return ocr_result_cache.stats()
+
+def clear_ocr_cache():
+    '''
+    清空OCR识别结果缓存及命中统计，比如明确知道屏幕内容已经变化时
+    :return:
+    '''
+
+    ocr_result_cache.clear()
+
+class OcrSnapshot():
+    '''
+    OCR快照：对一帧截图只OCR一次，之后可以反复查找任意多个目标文字，适合在同一个静态页面上校验多个文字
+
+    snapshot = ocr_snapshot()
+    assert snapshot.exist_text('通用设置')[0]
+    assert snapshot.exist_text('消息通知', equal_filter=True)[0]
+    '''
+
+    def __init__(self, pic_full_path=None, region=None):
+        '''
+        :param pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧，默认为None表示当场截图
+        :param region: 搜索区域，默认为None表示全屏，可传矩形(left, top, right, bottom)或锚点dict，详见exist_pic接口的region参数
+        '''
+
+        self.frame = screenshot_frame() if pic_full_path is None else read_pic(pic_full_path)
+        self.region = resolve_region(region, self.frame)
+        self.all_lines = ocr_lines(self.frame, region=self.region)
+
+    def texts(self):
+        '''
+        :return: 快照中识别出的所有文字
+        '''
+
+        return [line[1][0] for line in self.all_lines]
+
+    def exist_text(self, text, equal_filter=False, filter_special_chars=False):
+        '''
+        在快照中查找目标文字，参数同exist_text接口
+        :return: exist_res，同exist_text接口结果
+        '''
+
+        final_lines = match_ocr_lines(text, self.all_lines, equal_filter=equal_filter, filter_special_chars=filter_special_chars, offset_x=self.region[0], offset_y=self.region[1])
+        return ExistRes([len(final_lines) > 0, final_lines], meta={'region': self.region})
+
+def ocr_snapshot(pic_full_path=None, region=None):
+    '''
+    对截图OCR一次并生成OCR快照，之后可以用快照的exist_text反复查找不同的目标文字而无需再次OCR
+    :param pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧，默认为None表示当场截图
+    :param region: 搜索区域，默认为None表示全屏，详见exist_pic接口的region参数
+    :return: OcrSnapshot实例
+    '''
+
+    return OcrSnapshot(pic_full_path=pic_full_path, region=region)
 
-screenshot_resolution = (0, 0)
 def get_screenshot_resolution():
     '''
-    获取PC设备屏幕截图的分辨率
+    获取PC设备屏幕截图的分辨率，由截图后端查询后缓存在HostProfile中，切换显示器或修改分辨率后可调用refresh_host_profile('resolution')
     :return: 分辨率，形如 (2880, 1800)
     '''
 
-    global screenshot_resolution
-    if screenshot_resolution[0] == 0:
-        pic_path = screenshot()
-        img = cv2.imread(pic_path)
-        screenshot_resolution = (img.shape[1], img.shape[0])
-        os.remove(pic_path)
-    return screenshot_resolution
+    return get_host_profile().resolution
 
 def template_pic_full_name(name):
     '''
@@ -319,7 +781,354 @@ def template_pic_full_name(name):
     :return: 模板截图全称（不含扩展类型），模板截图全称 = 模板截图简称_system()_屏幕截图分辨率宽x屏幕截图分辨率高，形如 name => {name}_mac_2880x1800
     '''
 
-    return name + '_' + system() + '_' + str(get_screenshot_resolution()[0]) + 'x' + str(get_screenshot_resolution()[1])
+    width, height = get_screenshot_resolution()
+    return name + '_' + system() + '_' + str(width) + 'x' + str(height)
+
+class TemplateCache():
+    '''
+    模板截图缓存，缓存模板截图的完整路径与解码后的图片，按解码后图片的字节数做LRU淘汰，并在模板截图文件的mtime变化后自动失效
+    '''
+
+    def __init__(self, max_bytes=None):
+        '''
+        :param max_bytes: 容量上限（字节），默认为global_var.template_cache_max_bytes
+        '''
+
+        self.max_bytes = max_bytes
+        self.entry_dict = OrderedDict() # key -> {'path', 'mtime', 'img', 'nbytes'}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_max_bytes(self):
+        return global_var.template_cache_max_bytes if self.max_bytes is None else self.max_bytes
+
+    def get(self, key):
+        '''
+        读缓存，命中时会校验模板截图文件的mtime
+        :param key: (sub_path, subfolder, name, system, resolution)
+        :return: {'path', 'mtime', 'img', 'nbytes'}，未命中时返回None
+        '''
+
+        with self.lock:
+            entry = self.entry_dict.get(key)
+            if entry is not None:
+                try:
+                    mtime = os.stat(entry['path']).st_mtime_ns
+                except OSError:
+                    mtime = None
+                if mtime != entry['mtime']: # 模板截图被修改或删除了，缓存失效
+                    self.pop(key)
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entry_dict.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, path, mtime, img):
+        '''
+        写缓存，超出容量上限时淘汰最久未使用的模板截图
+        :param key: (sub_path, subfolder, name, system, resolution)
+        :param path: 模板截图的完整路径
+        :param mtime: 模板截图文件的mtime（纳秒）
+        :param img: 解码后的模板截图
+        :return:
+        '''
+
+        nbytes = img.nbytes
+        max_bytes = self.get_max_bytes()
+        if nbytes > max_bytes: # 单张就超出上限的不缓存
+            return
+        with self.lock:
+            self.pop(key)
+            self.entry_dict[key] = {'path': path, 'mtime': mtime, 'img': img, 'nbytes': nbytes}
+            self.total_bytes += nbytes
+            while self.total_bytes > max_bytes:
+                self.pop(next(iter(self.entry_dict)))
+
+    def pop(self, key):
+        entry = self.entry_dict.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry['nbytes']
+
+    def clear(self):
+        with self.lock:
+            self.entry_dict.clear()
+            self.total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self.entry_dict),
+                'bytes': self.total_bytes,
+                'max_bytes': self.get_max_bytes()
+            }
+
+# 进程内全局共享的模板截图缓存，exist_pic、loop_exist_pic_list、loop_clear_alert等接口共用
+template_cache = TemplateCache()
+
+def load_template_pic(name, sub_path=None, subfolder=''):
+    '''
+    查找并解码模板截图，优先从预编译模板包（见build_template_pack）中mmap加载，模板包中没有的、或打包后模板截图文件被修改过的再查找模板截图文件，结果会缓存在template_cache中，同一模板截图在文件未修改前只会查找和解码1次
+    :param name: 模板截图简称
+    :param sub_path: 模板截图存放路径，默认为{global_var.root_path}/template_pic
+    :param subfolder: 模板截图存放的子文件夹路径，默认为空串''
+    :return: (模板截图的完整路径, 解码后的模板截图)，解码后的模板截图为缓存中的共享数据、只读不可修改；当不存在与当前测试机匹配的模板截图时返回 (不含扩展类型的模板截图完整路径, None)
+    '''
+
+    if sub_path is None:
+        sub_path = os.path.join(global_var.root_path, 'template_pic')
+
+    # 优先从预编译模板包中查找（mmap零拷贝，无需查找和解码文件），模板包中没有的再查找散落的模板截图文件
+    template_pack = get_template_pack(sub_path)
+    if template_pack is not None:
+        packed = template_pack.get(subfolder, name)
+        if packed is not None:
+            if packed['hint'] is not None:
+                with template_match_hint_lock: # 模板包中的匹配精度提示，有同名sidecar文件时以sidecar文件为准
+                    template_match_hint_dict.setdefault(get_template_match_hint_path(packed['path']), (None, packed['hint']))
+            return packed['path'], packed['img']
+
+    key = (sub_path, subfolder, name, system(), get_screenshot_resolution())
+    entry = template_cache.get(key)
+    if entry is not None:
+        return entry['path'], entry['img']
+
+    # 创建template_pic文件夹
+    os.makedirs(sub_path, exist_ok=True)
+    template_pic_dir = sub_path
+    if len(subfolder) > 0:
+        template_pic_dir = os.path.join(sub_path, subfolder)
+        # 创建subfolder文件夹
+        os.makedirs(template_pic_dir, exist_ok=True)
+
+    full_name = template_pic_full_name(name)
+    for suffix in ['.png', '.jpg', '.jpeg']:
+        # 拼接模板截图的完整路径
+        temp_path = os.path.join(template_pic_dir, full_name + suffix)
+        if os.path.exists(temp_path):
+            mtime = os.stat(temp_path).st_mtime_ns
+            template_img = cv2.imread(temp_path)
+            if template_img is not None:
+                template_cache.put(key, temp_path, mtime, template_img)
+            return temp_path, template_img
+    return os.path.join(template_pic_dir, full_name), None
+
+def load_nearest_template_pic(name, sub_path=None, subfolder=''):
+    '''
+    查找同系统下分辨率与当前截图最接近的模板截图（带缓存），用于缺失当前分辨率模板截图时的缩放兜底，见global_var.template_scale_fallback
+    :param name: 模板截图简称
+    :param sub_path: 模板截图存放路径，默认为{global_var.root_path}/template_pic
+    :param subfolder: 模板截图存放的子文件夹路径，默认为空串''
+    :return: (模板截图的完整路径, 解码后的模板截图, 模板截图对应的分辨率(宽, 高))，找不到时返回 (None, None, None)
+    '''
+
+    if sub_path is None:
+        sub_path = os.path.join(global_var.root_path, 'template_pic')
+    pattern = re.compile('^' + re.escape(name + '_' + system() + '_') + r'(\d+)x(\d+)\.(png|jpg|jpeg)$')
+
+    key = (sub_path, subfolder, name, system(), get_screenshot_resolution(), 'nearest')
+    entry = template_cache.get(key)
+    if entry is not None:
+        match = pattern.match(os.path.basename(entry['path']))
+        return entry['path'], entry['img'], (int(match.group(1)), int(match.group(2)))
+
+    template_pic_dir = os.path.join(sub_path, subfolder) if len(subfolder) > 0 else sub_path
+    if not os.path.isdir(template_pic_dir):
+        return None, None, None
+    current_width = get_screenshot_resolution()[0]
+    candidates = []
+    for file_name in os.listdir(template_pic_dir):
+        match = pattern.match(file_name)
+        if match:
+            # 按缩放倍数的对数距离取最接近的分辨率，放大和缩小同等对待
+            candidates.append((abs(math.log(current_width / int(match.group(1)))), file_name, (int(match.group(1)), int(match.group(2)))))
+    if len(candidates) == 0:
+        return None, None, None
+    candidates.sort()
+    temp_path = os.path.join(template_pic_dir, candidates[0][1])
+    mtime = os.stat(temp_path).st_mtime_ns
+    template_img = cv2.imread(temp_path)
+    if template_img is not None:
+        template_cache.put(key, temp_path, mtime, template_img)
+    return temp_path, template_img, candidates[0][2]
+
+def get_template_scales(base_scale=1.0, scale_range=None):
+    '''
+    计算多尺度匹配时模板截图的缩放倍数
+    :param base_scale: 基础缩放倍数，使用其他分辨率的模板截图时为 当前截图宽/模板截图对应的分辨率宽
+    :param scale_range: 在基础缩放倍数上再缩放的倍数范围，形如(0.8, 1.25)，为None时只用基础缩放倍数
+    :return: 缩放倍数列表
+    '''
+
+    if scale_range is None:
+        return [base_scale]
+    multipliers = np.linspace(scale_range[0], scale_range[1], max(1, global_var.template_scale_steps)).tolist()
+    if scale_range[0] <= 1 <= scale_range[1]:
+        multipliers.append(1.0) # 原尺寸一定要匹配
+    return sorted(set([round(base_scale * multiplier, 4) for multiplier in multipliers]))
+
+def scale_template_pic(template_img, scale):
+    '''
+    缩放模板截图
+    :param template_img: 模板截图
+    :param scale: 缩放倍数
+    :return: 缩放后的模板截图，scale为1时直接返回原模板截图
+    '''
+
+    if abs(scale - 1) < 1e-4:
+        return template_img
+    height, width = template_img.shape[:2]
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(template_img, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+
+def get_template_cache_stats():
+    '''
+    获取模板截图缓存的命中统计
+    :return: {'hits': 命中次数, 'misses': 未命中次数, 'entries': 缓存的模板截图数, 'bytes': 已占用字节数, 'max_bytes': 容量上限}
+    '''
+
+    return template_cache.stats()
+
+def clear_template_cache():
+    '''
+    清空模板截图缓存及命中统计，并关闭已打开的模板包
+    :return:
+    '''
+
+    template_cache.clear()
+    with template_match_hint_lock:
+        template_match_hint_dict.clear()
+    clear_template_packs()
+
+# 模板截图的匹配精度提示（sidecar文件）的内存缓存，key为sidecar文件的完整路径，value为(sidecar文件的mtime, 精度提示)
+template_match_hint_dict = {}
+template_match_hint_lock = threading.Lock()
+
+def get_template_match_hint_path(template_pic_full_path):
+    '''
+    获取模板截图的匹配精度提示（sidecar文件）的完整路径，与模板截图同目录同名，扩展类型为.match.json
+    :param template_pic_full_path: 模板截图的完整路径，形如 {global_var.root_path}/template_pic/{name}_mac_2880x1800.png
+    :return: sidecar文件的完整路径，形如 {global_var.root_path}/template_pic/{name}_mac_2880x1800.match.json
+    '''
+
+    return os.path.splitext(template_pic_full_path)[0] + '.match.json'
+
+def get_template_match_hint(template_pic_full_path):
+    '''
+    读取模板截图的匹配精度提示，即该模板截图仍能准确命中的最省的匹配模式，由calibrate_template_match_mode()校准生成，也可以手工编写
+    sidecar文件内容形如 {"gray": true, "match_scale": 0.5}，读取结果会缓存，sidecar文件修改后自动失效
+    :param template_pic_full_path: 模板截图的完整路径
+    :return: 精度提示dict {'gray': 是否在灰度图上匹配, 'match_scale': 匹配时截图的缩小倍数, ...}，没有sidecar文件时返回None
+    '''
+
+    hint_path = get_template_match_hint_path(template_pic_full_path)
+    try:
+        mtime = os.stat(hint_path).st_mtime_ns
+    except OSError:
+        mtime = None
+    with template_match_hint_lock:
+        entry = template_match_hint_dict.get(hint_path)
+    if entry is not None and entry[0] == mtime:
+        return entry[1]
+
+    hint = None
+    if mtime is not None:
+        try:
+            with open(hint_path, 'r', encoding='utf-8') as f:
+                hint = json.load(f)
+        except (OSError, ValueError):
+            hint = None
+    with template_match_hint_lock:
+        template_match_hint_dict[hint_path] = (mtime, hint)
+    return hint
+
+def save_template_match_hint(template_pic_full_path, hint):
+    '''
+    写入模板截图的匹配精度提示（sidecar文件），并刷新内存缓存
+    :param template_pic_full_path: 模板截图的完整路径
+    :param hint: 精度提示dict，形如 {'gray': True, 'match_scale': 0.5}
+    :return: sidecar文件的完整路径
+    '''
+
+    hint_path = get_template_match_hint_path(template_pic_full_path)
+    os.makedirs(os.path.dirname(hint_path), exist_ok=True) # 模板截图来自模板包时，所在文件夹可能不存在
+    with open(hint_path, 'w', encoding='utf-8') as f:
+        json.dump(hint, f, ensure_ascii=False, indent=4)
+    with template_match_hint_lock:
+        template_match_hint_dict[hint_path] = (os.stat(hint_path).st_mtime_ns, hint)
+    return hint_path
+
+# 最近一帧截图灰度化/缩小后的截图，同一帧被多个模板截图匹配时只转换1次
+match_frame_cache = {'frame': None, 'frames': {}}
+match_frame_cache_lock = threading.Lock()
+
+def get_match_frame(img, gray=False, match_scale=1.0):
+    '''
+    SDK内部接口，外部不要使用，获取用于匹配的截图：灰度化、缩小match_scale倍后的截图，同一帧的同一种转换只做1次
+    :param img: 截图
+    :param gray: 是否灰度化
+    :param match_scale: 缩小倍数，为1时不缩小
+    :return: 转换后的截图，不需要转换时直接返回原截图
+    '''
+
+    gray = gray and img.ndim == 3
+    if not gray and match_scale >= 1:
+        return img
+    key = (gray, match_scale)
+    with match_frame_cache_lock:
+        if match_frame_cache['frame'] is not img:
+            match_frame_cache['frame'] = img
+            match_frame_cache['frames'] = {}
+        frame = match_frame_cache['frames'].get(key)
+    if frame is None:
+        frame = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if gray else img
+        if match_scale < 1:
+            size = (max(1, int(round(img.shape[1] * match_scale))), max(1, int(round(img.shape[0] * match_scale))))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        with match_frame_cache_lock:
+            if match_frame_cache['frame'] is img:
+                match_frame_cache['frames'][key] = frame
+    return frame
+
+def verify_match_candidates(img, template_img, xs, ys, threshold, radius=0, region=None):
+    '''
+    SDK内部接口，外部不要使用，在全分辨率、全通道的截图上对候选点重新打分，使降精度匹配的actual_threshold与全精度匹配的含义一致
+    :param img: 全分辨率的截图
+    :param template_img: 与截图同一颜色空间的全分辨率模板截图
+    :param xs: 候选点横坐标（全屏坐标）
+    :param ys: 候选点纵坐标（全屏坐标）
+    :param threshold: 相似度阈值
+    :param radius: 在候选点上下左右各radius个像素的范围内取相似度最高的位置，用于弥补缩小匹配丢失的坐标精度
+    :param region: 搜索区域(left, top, right, bottom)，重新打分不会越出该区域，默认为整张截图
+    :return: (xs, ys, scores)，按相似度倒序排列、去重后的命中点，均为numpy数组
+    '''
+
+    height, width = template_img.shape[:2]
+    left, top, right, bottom = (0, 0, img.shape[1], img.shape[0]) if region is None else region
+    max_x, max_y = right - width, bottom - height
+    hits = {}
+    for x, y in zip(np.asarray(xs).tolist(), np.asarray(ys).tolist()):
+        x0, y0 = max(left, x - radius), max(top, y - radius)
+        x1, y1 = min(max_x, x + radius), min(max_y, y + radius)
+        if x1 < x0 or y1 < y0:
+            continue
+        window = img[y0:y1 + height, x0:x1 + width]
+        min_value, max_value, min_loc, max_loc = cv2.minMaxLoc(cv2.matchTemplate(window, template_img, cv2.TM_CCOEFF_NORMED))
+        if max_value > threshold:
+            hits.setdefault((x0 + max_loc[0], y0 + max_loc[1]), max_value) # 多个候选点收敛到同一位置时只保留1个
+    hits = sorted(hits.items(), key=lambda item: -item[1])
+    xs = np.array([point[0] for point, score in hits], dtype=np.int64)
+    ys = np.array([point[1] for point, score in hits], dtype=np.int64)
+    scores = np.array([score for point, score in hits], dtype=np.float32)
+    return xs, ys, scores
 
 def custom_sort(item):
     '''
@@ -329,19 +1138,93 @@ def custom_sort(item):
     '''
 
     return (item[0][1], item[0][0])
-def exist_pic(name, pic_full_path, threshold=None, sub_path=None, subfolder='', preview=False, priority_index=0, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE):
+
+def find_match_peaks(res, threshold, width=1, height=1):
+    '''
+    向量化的非极大值抑制，从matchTemplate的结果矩阵中提取去重后的命中点：
+    同一个目标周围的一圈像素相似度都会偏高，所以只保留在横、纵坐标各±半个模板截图宽、高的邻域内相似度最高的点（局部极大值膨胀法），
+    相似度完全一样的相邻点（平台）只保留扫描顺序上的第一个
+    :param res: cv2.matchTemplate的结果矩阵
+    :param threshold: 相似度阈值
+    :param width: 模板截图的宽，决定邻域大小
+    :param height: 模板截图的高，决定邻域大小
+    :return: (xs, ys, scores)，按相似度倒序排列的命中点横坐标、纵坐标、相似度，均为numpy数组
+    '''
+
+    mask = res > threshold
+    if not mask.any():
+        ys, xs = np.nonzero(mask)
+        return xs, ys, res[ys, xs]
+    kernel = np.ones((max(3, height | 1), max(3, width | 1)), dtype=np.uint8) # 奇数边长，中心点向外各延伸半个模板截图
+    local_max = cv2.dilate(res, kernel)
+    peak_mask = (mask & (res >= local_max)).astype(np.uint8)
+    count, labels = cv2.connectedComponents(peak_mask, connectivity=8)
+    ys, xs = np.nonzero(peak_mask) # 先Y后X的扫描顺序
+    labels, first = np.unique(labels[ys, xs], return_index=True)
+    keep = np.sort(first)
+    xs, ys = xs[keep], ys[keep]
+    scores = res[ys, xs]
+    order = np.argsort(-scores, kind='stable') # 相似度倒序，相似度一样时保持扫描顺序
+    return xs[order], ys[order], scores[order]
+
+def match_template(img, template_img, threshold, pyramid_level=0):
+    '''
+    对截图进行模板匹配。pyramid_level大于0时为由粗到精的金字塔匹配：先在缩小2^pyramid_level倍的截图上粗匹配出候选点，再只在候选点附近做全分辨率精匹配
+    :param img: 截图
+    :param template_img: 模板截图
+    :param threshold: 相似度阈值，粗匹配时会放宽global_var.pyramid_threshold_margin
+    :param pyramid_level: 金字塔粗匹配的层数，0表示直接全分辨率匹配
+    :return: 与cv2.matchTemplate同尺寸的结果矩阵，金字塔匹配时未做精匹配的位置为-1；截图比模板截图还小时为空矩阵
+    '''
+
+    height, width = template_img.shape[:2]
+    if img.shape[0] < height or img.shape[1] < width: # 截图比模板截图还小，不可能命中
+        return np.zeros((0, 0), dtype=np.float32)
+    # 模板截图缩小后至少要保留8个像素，否则粗匹配没有意义
+    while pyramid_level > 0 and min(height, width) >> pyramid_level < 8:
+        pyramid_level -= 1
+    if pyramid_level <= 0:
+        return cv2.matchTemplate(img, template_img, cv2.TM_CCOEFF_NORMED)
+
+    # 粗匹配
+    factor = 2 ** pyramid_level
+    small_img = cv2.resize(img, (img.shape[1] // factor, img.shape[0] // factor), interpolation=cv2.INTER_AREA)
+    small_template_img = cv2.resize(template_img, (width // factor, height // factor), interpolation=cv2.INTER_AREA)
+    coarse_res = cv2.matchTemplate(small_img, small_template_img, cv2.TM_CCOEFF_NORMED)
+    xs, ys, scores = find_match_peaks(coarse_res, threshold - global_var.pyramid_threshold_margin, width=small_template_img.shape[1], height=small_template_img.shape[0])
+
+    # 只在候选点附近精匹配，粗匹配的1个像素对应全分辨率的factor个像素，再向外多留factor个像素的余量
+    res = np.full((img.shape[0] - height + 1, img.shape[1] - width + 1), -1, dtype=np.float32)
+    for x, y in zip(xs[:global_var.pyramid_max_candidates].tolist(), ys[:global_var.pyramid_max_candidates].tolist()):
+        x0 = max(x * factor - factor, 0)
+        y0 = max(y * factor - factor, 0)
+        x1 = min(x * factor + 2 * factor, res.shape[1])
+        y1 = min(y * factor + 2 * factor, res.shape[0])
+        window = img[y0:y1 + height - 1, x0:x1 + width - 1]
+        res[y0:y1, x0:x1] = cv2.matchTemplate(window, template_img, cv2.TM_CCOEFF_NORMED)
+    return res
+
+def exist_pic(name, pic_full_path, threshold=None, sub_path=None, subfolder='', preview=False, priority_index=0, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE, region=None, mode=None, max_results=None, pyramid_level=None, scale_range=None, gray=None, match_scale=None, verify=None):
     '''
     OpenCV识别一张图片中模板截图命中的所有区域
     :param name: 模板截图简称。模板截图全称 = 模板截图简称_system()_屏幕截图分辨率宽x屏幕截图分辨率高，模板截图全称 形如 {name}_mac_2880x1800，支持3种扩展类型（.png, .jpg, .jpeg）、选其一即可
-    :param pic_full_path: 图片的完整路径
+    :param pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧
     :param threshold: 图片模板匹配时的相似度阈值，范围为(0,1)，越接近1表示相似度要求越高，默认为global_var.threshold
     :param sub_path: 模板截图存放路径，默认为{global_var.root_path}/template_pic，如果subfolder为空串''的话，则模板截图的完整路径形如 {global_var.root_path}/template_pic/{name}_mac_2880x1800.png
     :param subfolder: 模板截图存放的子文件夹路径，默认为空串''，可用于将模板截图按开发者名字或所属业务模块进行分类管理、以实现模板截图之间的隔离。当不为空串''时，比如subfolder为'xincheng/im'时，则模板截图的完整路径形如 {global_var.root_path}/template_pic/xincheng/im/{name}_mac_2880x1800.png
     :param preview: 是否对模板截图的所有命中区域进行红色描边预览（用于开发脚本时的调试，实际脚本运行测试时要将preview改成False）
     :param priority_index: 在命中区域集合中选择要交互的那个命中区域下标，默认为0、表示默认交互第1个命中区域。但在这里的作用为：0表示用模板截图进行高性能的单目标匹配，非0表示用模板截图进行多目标匹配。
-    :param filter_same: OpenCV多目标匹配时，filter_same为True可过滤掉重复命中区域
+    :param filter_same: OpenCV多目标匹配时，filter_same为True可过滤掉重复命中区域：只保留在横、纵坐标各±半个模板截图宽、高的邻域内相似度最高的点（见find_match_peaks），所以中心点横、纵坐标都相距不超过半个模板截图宽、高的两个命中区域会合并为1个（旧版按外扩边界合并时可能保留2个），互不重叠的真实目标不受影响
     :param sort_rule: OpenCV多目标匹配时，命中区的排序规则
-    :return:
+    :param region: 搜索区域，默认为None表示全屏搜索。可传矩形(left, top, right, bottom)，单位为截图分辨率下的像素；也可传锚点dict {'anchor': 锚点模板截图简称, 'sub_path': ..., 'subfolder': ..., 'threshold': ..., 'expand': (向左, 向上, 向右, 向下扩展的像素)}，表示以锚点模板截图命中区域1向外扩展后的矩形作为搜索区域（锚点没命中时视为没有命中区域）。只对搜索区域内的截图进行匹配，返回的命中区域坐标仍为全屏坐标
+    :param mode: 模板匹配策略，默认为None：传了max_results时为MatchMode.TOP_K，否则为MatchMode.ALL。单目标查找建议传MatchMode.SINGLE、走cv2.minMaxLoc，详见MatchMode枚举
+    :param max_results: 最多返回的命中区域个数，默认为None不限制
+    :param pyramid_level: 金字塔粗匹配的层数，默认为global_var.pyramid_level；大于0时先在缩小2^pyramid_level倍的截图上粗匹配，再只在候选点附近做全分辨率精匹配
+    :param scale_range: 模板截图的缩放倍数范围，形如(0.8, 1.25)，默认为global_var.template_scale_range；传了之后会做多尺度匹配、取相似度最高的缩放倍数。另外开启global_var.template_scale_fallback后，缺失当前分辨率的模板截图时会按分辨率比例缩放使用同系统下其他分辨率的模板截图
+    :param gray: 是否在灰度图上匹配，默认为None：取模板截图匹配精度提示（sidecar文件，见calibrate_template_match_mode）中的颜色模式，没有时为False在BGR三通道上匹配；pic_full_path传入的是灰度截图帧时会自动在灰度图上匹配
+    :param match_scale: 匹配时截图与模板截图的缩小倍数，范围为(0,1]，如0.5表示在半分辨率上匹配、像素量约为1/4；默认为None：取模板截图匹配精度提示中的缩小倍数，没有时为global_var.match_scale
+    :param verify: 降精度（灰度或缩小）匹配时，是否在全分辨率、BGR三通道的截图上对候选点重新打分，默认为global_var.match_verify；重新打分后actual_threshold与全精度匹配的含义一致
+    :return: ExistRes，用法同list，meta中记录了本次匹配的策略strategy、搜索区域region、模板截图缩放倍数scale、颜色模式gray、缩小倍数match_scale、是否重新打分verified及耗时match_seconds；命中区域集合为MatchSet，只存外接矩形和相似度、点位按需计算，兼容以下list格式的下标访问；点位为MatchPoint，原地改写如exist_res[1][0][Position.CENTER.value][0] += dx 会记录到该命中区域上、对之后的访问和点击生效；MatchSet支持list的增删改及拼接，但不是list的子类，isinstance(exist_res[1], list)为False，json序列化前需改为exist_res[1].tolist()，如json.dumps([exist_res[0], exist_res[1].tolist()])
     [bool, # 模板截图是否有命中区域
         [ # 命中区域集合（命中区域会按实际相似度actual_threshold进行倒序排列，所以一般情况下建议使用命中区域1）
             [ # 命中区域1
@@ -390,129 +1273,254 @@ def exist_pic(name, pic_full_path, threshold=None, sub_path=None, subfolder='',
     if threshold is None:
         threshold = global_var.threshold
 
-    template_pic_full_path = ''
-
-    if sub_path is None:
-        sub_path = os.path.join(global_var.root_path, 'template_pic')
-    # 创建template_pic文件夹
-    os.makedirs(sub_path, exist_ok=True)
-    template_pic_full_path = sub_path
-
-    if len(subfolder) > 0:
-        subfolder_path = os.path.join(sub_path, subfolder)
-        # 创建subfolder文件夹
-        os.makedirs(subfolder_path, exist_ok=True)
-        template_pic_full_path = subfolder_path
-
-    for suffix in ['.png', '.jpg', '.jpeg']:
-        # 拼接模板截图的完整路径
-        temp_path = os.path.join(template_pic_full_path, template_pic_full_name(name) + suffix)
-        if os.path.exists(temp_path):
-            template_pic_full_path = temp_path
-            break
-
-    img = cv2.imread(pic_full_path)
-    template_img = cv2.imread(template_pic_full_path)
+    if pyramid_level is None:
+        pyramid_level = global_var.pyramid_level
+    if scale_range is None:
+        scale_range = global_var.template_scale_range
+
+    # 查找并解码模板截图（带缓存）
+    template_pic_full_path, template_img = load_template_pic(name, sub_path=sub_path, subfolder=subfolder)
+    base_scale = 1.0
+    if template_img is None and global_var.template_scale_fallback: # 缩放使用其他分辨率的模板截图
+        nearest_path, nearest_img, nearest_resolution = load_nearest_template_pic(name, sub_path=sub_path, subfolder=subfolder)
+        if nearest_img is not None:
+            template_pic_full_path, template_img = nearest_path, nearest_img
+            base_scale = get_screenshot_resolution()[0] / nearest_resolution[0]
     if template_img is None:
-        temp_path_prefix, temp_path_extension = os.path.splitext(temp_path)
+        temp_path_prefix, temp_path_extension = os.path.splitext(template_pic_full_path)
+        if temp_path_extension not in ['.png', '.jpg', '.jpeg']:
+            temp_path_prefix = template_pic_full_path
         assert False, f"缺失该分辨率下元素定位的模板素材：{temp_path_prefix}"
-    height, width, c = template_img.shape
-    res = cv2.matchTemplate(img, template_img, cv2.TM_CCOEFF_NORMED)
-    matched_points = []
-    # if priority_index == 0: # 单目标匹配，优化性能
-    #     minValue, maxValue, minLoc, maxLoc = cv2.minMaxLoc(res)
-    #     if maxValue > threshold:
-    #         matched_points.append((maxLoc, maxValue))
-    # else: # 多目标匹配
-    #     # 双重嵌套效率太低
-    #     for y in range(len(res)):
-    #         for x in range(len(res[y])):
-    #             if res[y][x] > threshold:
-    #                 matched_points.append(((x, y), res[y][x]))
-
-    # 向量化操作，匹配一次多目标耗时1秒内
-    indices = np.argwhere(res > threshold)
-    for idx in indices:
-        matched_points.append(((idx[1], idx[0]), res[idx[0]][idx[1]]))
-    sorted_points = sorted(matched_points, key=lambda z: z[1], reverse=True)
-
-    if filter_same:
-        filter_points = []
-        filter_index = 0
-        side_points = []
-        for point in sorted_points:
-            x = point[0][0]
-            y = point[0][1]
-            if filter_index == 0:
-                filter_points.append(point)
-                side_points.append({
-                    'x_max': x,
-                    'x_min': x,
-                    'y_max': y,
-                    'y_min': y
-                })
-            else:
-                new_point = True
-                for side in side_points:
-                    x_max = side['x_max']
-                    x_min = side['x_min']
-                    y_max = side['y_max']
-                    y_min = side['y_min']
-                    if x > x_max + 1 or x < x_min - 1 or y > y_max + 1 or y < y_min - 1:
-                        pass
-                    else:
-                        new_point = False
-                        if x > x_max:
-                            side['x_max'] = x
-                        if x < x_min:
-                            side['x_min'] = x
-                        if y > y_max:
-                            side['y_max'] = y
-                        if y < y_min:
-                            side['y_min'] = y
-                if new_point:
-                    filter_points.append(point)
-                    side_points.append({
-                        'x_max': x,
-                        'x_min': x,
-                        'y_max': y,
-                        'y_min': y
-                    })
-            filter_index += 1
-        sorted_points = filter_points
+
+    img = read_pic(pic_full_path)
+    start_time = time.time()
+    # 未指定的颜色模式与匹配缩小倍数，优先取模板截图的匹配精度提示
+    auto_mode = gray is None and match_scale is None
+    hint = get_template_match_hint(template_pic_full_path)
+    if gray is None:
+        gray = bool(hint.get('gray', False)) if hint else False
+    if match_scale is None:
+        match_scale = hint.get('match_scale', global_var.match_scale) if hint else global_var.match_scale
+    match_scale = min(1.0, float(match_scale))
+    if verify is None:
+        verify = global_var.match_verify
+    gray = gray or img.ndim == 2
+    # 降精度（灰度/缩小）匹配时，候选点要回到全分辨率、全通道的截图上重新打分
+    verify = verify and (match_scale < 1 or img.ndim == 3 and gray)
+    match_threshold = threshold - global_var.match_verify_threshold_margin if verify else threshold
+    match_img = get_match_frame(img, gray=gray, match_scale=match_scale) # 灰度化/缩小，已经转换过的同一帧不再重复转换
+    # 只对搜索区域内的截图进行匹配
+    region_left, region_top, region_right, region_bottom = resolve_region(region, img)
+    match_left, match_top = int(region_left * match_scale), int(region_top * match_scale)
+    match_right, match_bottom = int(math.ceil(region_right * match_scale)), int(math.ceil(region_bottom * match_scale))
+    search_img = match_img[match_top:match_bottom, match_left:match_right]
+    # 多尺度匹配时取相似度最高的缩放倍数
+    scales = get_template_scales(base_scale=base_scale, scale_range=scale_range)
+    res = None
+    max_width = max_height = 0 # 所有缩放倍数中最大的模板截图尺寸
+    for scale in scales:
+        scaled_template_img = scale_template_pic(template_img, scale)
+        match_template_img = get_template_variant(scaled_template_img, gray=gray, scale=match_scale) # 模板包中预编译的灰度/缩小变体
+        if match_template_img is None:
+            match_template_img = cv2.cvtColor(scaled_template_img, cv2.COLOR_BGR2GRAY) if gray and scaled_template_img.ndim == 3 else scaled_template_img
+            match_template_img = scale_template_pic(match_template_img, match_scale)
+        max_height, max_width = max(max_height, scaled_template_img.shape[0]), max(max_width, scaled_template_img.shape[1])
+        scaled_res = match_template(search_img, match_template_img, match_threshold, pyramid_level=pyramid_level)
+        scaled_score = float(scaled_res.max()) if len(scales) > 1 and scaled_res.size > 0 else -1.0
+        if res is None or scaled_score > best_score:
+            res, best_score, best_scale = scaled_res, scaled_score, scale
+            best_template_img = scaled_template_img
+            height, width = scaled_template_img.shape[:2]
+            match_height, match_width = match_template_img.shape[:2]
+    if mode is None:
+        mode = MatchMode.ALL if max_results is None else MatchMode.TOP_K
+
+    if res.size == 0:
+        strategy = 'empty'
+        xs = ys = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float32)
+    elif mode == MatchMode.SINGLE and verify:
+        # 降精度匹配的最高点不一定是全精度下的最高点，多取几个候选点重新打分
+        strategy = 'nms'
+        xs, ys, scores = find_match_peaks(res, match_threshold, width=match_width, height=match_height)
+        xs, ys, scores = xs[:global_var.match_verify_single_candidates], ys[:global_var.match_verify_single_candidates], scores[:global_var.match_verify_single_candidates]
+    elif mode == MatchMode.SINGLE: # 单目标匹配，优化性能
+        strategy = 'minMaxLoc'
+        min_value, max_value, min_loc, max_loc = cv2.minMaxLoc(res)
+        if max_value > threshold:
+            xs, ys, scores = np.array([max_loc[0]]), np.array([max_loc[1]]), np.array([max_value], dtype=np.float32)
+        else:
+            xs = ys = np.zeros(0, dtype=np.int64)
+            scores = np.zeros(0, dtype=np.float32)
+    elif filter_same:
+        # 向量化的非极大值抑制，过滤掉重复命中区域
+        strategy = 'nms'
+        xs, ys, scores = find_match_peaks(res, match_threshold, width=match_width, height=match_height)
+    elif mode == MatchMode.TOP_K:
+        # 只取相似度最高的max_results个点，无需物化和排序所有高于阈值的点
+        strategy = 'argpartition'
+        flat = res.ravel()
+        k = min(max(max_results, 1), flat.size)
+        indices = np.argpartition(flat, flat.size - k)[flat.size - k:]
+        indices = np.sort(indices[flat[indices] > match_threshold]) # 还原为扫描顺序
+        scores = flat[indices]
+        order = np.argsort(-scores, kind='stable')
+        indices, scores = indices[order], scores[order]
+        ys, xs = np.divmod(indices, res.shape[1])
+    else:
+        # 向量化操作，匹配一次多目标耗时1秒内
+        strategy = 'argwhere'
+        ys, xs = np.nonzero(res > match_threshold)
+        scores = res[ys, xs]
+        order = np.argsort(-scores, kind='stable') # 相似度倒序，相似度一样时保持先Y后X的扫描顺序
+        xs, ys, scores = xs[order], ys[order], scores[order]
+
+    # 从搜索区域坐标还原为全屏坐标，缩小匹配时再还原为全分辨率坐标
+    if match_scale < 1:
+        xs = np.rint((np.asarray(xs, dtype=np.float64) + match_left) / match_scale).astype(np.int64)
+        ys = np.rint((np.asarray(ys, dtype=np.float64) + match_top) / match_scale).astype(np.int64)
+    else:
+        xs = np.asarray(xs, dtype=np.int64) + region_left
+        ys = np.asarray(ys, dtype=np.int64) + region_top
+    if verify and len(xs) > 0:
+        # 在全分辨率、全通道的截图上重新打分，actual_threshold与全精度匹配的含义一致
+        verify_template_img = best_template_img if img.ndim == 3 or best_template_img.ndim == 2 else cv2.cvtColor(best_template_img, cv2.COLOR_BGR2GRAY)
+        radius = int(math.ceil(1 / match_scale)) if match_scale < 1 else 0
+        limit = global_var.match_verify_max_candidates
+        xs, ys, scores = verify_match_candidates(img, verify_template_img, xs[:limit], ys[:limit], threshold, radius=radius, region=(region_left, region_top, region_right, region_bottom))
+        if mode == MatchMode.SINGLE:
+            xs, ys, scores = xs[:1], ys[:1], scores[:1]
+    if max_results is not None:
+        xs, ys, scores = xs[:max_results], ys[:max_results], scores[:max_results]
 
     if sort_rule == SortRule.THRESHOLD_REVERSE:
         pass
     elif sort_rule == SortRule.Y_X:
-        sorted_points = sorted(sorted_points, key=custom_sort)
-
-    final_points = [] # [[[中心点X,中心点Y],[左上X,左上Y],[中上X,中上Y],……顺时针,实际相似度],[]]
-    for point in sorted_points:
-        x = point[0][0]
-        y = point[0][1]
-        final_point = [
-            [x + width / 2, y + height / 2], # [中心点X,中心点Y]
-            [x, y],                          # [左上X,左上Y]
-            [x + width / 2, y],              # [中上X,中上Y]
-            [x + width, y],                  # [右上X,右上Y]
-            [x + width, y + height / 2],     # [右中X,右中Y]
-            [x + width, y + height],         # [右下X,右下Y]
-            [x + width / 2, y + height],     # [中下X,中下Y]
-            [x, y + height],                 # [左下X,左下Y]
-            [x, y + height / 2],             # [左中X,左中Y]
-            point[1]
-        ]
-        final_points.append(final_point)
-
-        if preview:
-            cv2.rectangle(img, (int(final_point[1][0]), int(final_point[1][1])), (int(final_point[5][0]), int(final_point[5][1])), (0, 0, 255), 2)
+        order = np.lexsort((xs, ys)) # 同custom_sort，优先按y排序，y相同时按x排序
+        xs, ys, scores = xs[order], ys[order], scores[order]
+    # 命中区域只存外接矩形和相似度，9个点位在访问时才计算
+    final_points = MatchSet(boxes=np.stack([xs, ys, xs + width, ys + height], axis=1), scores=np.asarray(scores, dtype=np.float32))
 
     if preview:
+        img = img.copy() if img.ndim == 3 else cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) # 拷贝一份再描边，避免污染外部传入的截图帧
+        for left, top, right, bottom in final_points.boxes.tolist():
+            cv2.rectangle(img, (int(left), int(top)), (int(right), int(bottom)), (0, 0, 255), 2)
         cv2.imshow('img', img)
         cv2.waitKey()
         cv2.destroyAllWindows()
 
-    return [len(final_points) > 0, final_points]
+    meta = {
+        'mode': mode,
+        'strategy': strategy, # 实际使用的匹配策略：minMaxLoc / argpartition / nms / argwhere / empty（搜索区域比模板截图还小）
+        'region': (region_left, region_top, region_right, region_bottom),
+        'scale': best_scale,
+        'template_size': (max_width, max_height), # 模板截图尺寸(宽, 高)，多尺度匹配时为最大的那个
+        'template_path': template_pic_full_path,
+        'pyramid_level': pyramid_level,
+        'gray': gray,
+        'match_scale': match_scale,
+        'verified': verify,
+        'match_hint': hint,
+        'match_seconds': time.time() - start_time
+    }
+    if auto_mode and hint is None and global_var.template_match_auto_calibrate and len(final_points) > 0 and not gray and match_scale == 1 and img.ndim == 3:
+        # 全精度命中且还没有精度提示时，用这一帧校准出最省的匹配模式，之后的匹配直接使用
+        calibrate_template_match_mode(name, img, threshold=threshold, sub_path=sub_path, subfolder=subfolder, region=region)
+    return ExistRes([len(final_points) > 0, final_points], meta=meta)
+
+def calibrate_template_match_mode(name, pic_full_path, threshold=None, sub_path=None, subfolder='', region=None, scale_range=None, modes=None, save=True):
+    '''
+    校准模板截图的匹配精度提示：用一张包含目标的截图，按匹配开销从低到高依次尝试各匹配模式（颜色模式+缩小倍数），
+    取第一个与全精度匹配命中同一位置的模式，写入模板截图同目录下的sidecar文件（{模板截图全称}.match.json），
+    之后exist_pic等接口未指定gray和match_scale时会直接使用该模式。图标、按钮类的模板截图一般在半分辨率的灰度图上就能准确命中
+    :param name: 模板截图简称
+    :param pic_full_path: 包含目标的图片完整路径，或来自screenshot_frame()的截图帧
+    :param threshold: 图片模板匹配时的相似度阈值，默认为global_var.threshold
+    :param sub_path: 模板截图存放路径，同exist_pic
+    :param subfolder: 模板截图存放的子文件夹路径，同exist_pic
+    :param region: 搜索区域，同exist_pic
+    :param scale_range: 模板截图的缩放倍数范围，同exist_pic
+    :param modes: 待尝试的匹配模式列表，元素形如(gray, match_scale)，默认为global_var.match_calibration_modes，会按开销从低到高排序
+    :param save: 是否写入sidecar文件
+    :return: 精度提示dict {'gray': 是否在灰度图上匹配, 'match_scale': 缩小倍数, 'score': 校准时全精度匹配的相似度}
+    '''
+
+    if modes is None:
+        modes = global_var.match_calibration_modes
+    img = read_pic(pic_full_path)
+    kwargs = {'threshold': threshold, 'sub_path': sub_path, 'subfolder': subfolder, 'region': region, 'scale_range': scale_range}
+    reference = exist_pic(name, img, gray=False, match_scale=1.0, filter_same=True, **kwargs)
+    assert reference[0], f"校准匹配精度提示失败，图片中没有命中该模板截图：{name}"
+    # 全精度下相似度与最高者相当的命中区域都算准确（同一截图中可能有多个一模一样的目标）
+    best_score = float(reference[1].scores[0])
+    reference_boxes = [box for box, score in zip(reference[1].boxes.tolist(), reference[1].scores.tolist()) if score >= best_score - 1e-3]
+
+    hint = {'gray': False, 'match_scale': 1.0}
+    for gray, match_scale in sorted(modes, key=lambda mode: (1 if mode[0] else 3) * mode[1] ** 2): # 按像素量×通道数估算开销
+        if not gray and match_scale >= 1:
+            break
+        exist_res = exist_pic(name, img, gray=gray, match_scale=match_scale, verify=True, mode=MatchMode.SINGLE, **kwargs)
+        if exist_res[0] and any([max([abs(a - b) for a, b in zip(exist_res[1].boxes[0].tolist(), box)]) <= 1 for box in reference_boxes]):
+            hint = {'gray': bool(gray), 'match_scale': float(match_scale)}
+            break
+    hint['score'] = round(best_score, 4)
+    if save:
+        save_template_match_hint(reference.meta['template_path'], hint)
+    return hint
+
+# pic_config中可透传给exist_pic的key
+pic_config_keys = ['threshold', 'sub_path', 'subfolder', 'priority_index', 'filter_same', 'sort_rule', 'region', 'mode', 'max_results', 'pyramid_level', 'scale_range', 'gray', 'match_scale', 'verify']
+# 批量匹配用的线程池，key为线程数
+batch_match_executor_dict = {}
+batch_match_executor_lock = threading.Lock()
+
+def exist_pic_by_config(pic_config, pic_full_path):
+    '''
+    按pic_config调用exist_pic
+    :param pic_config: 模板截图素材，dict，key与exist_pic接口的同名参数一致，其中name必传
+    :param pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧
+    :return: exist_res，来自exist_pic的接口结果
+    '''
+
+    kwargs = {key: pic_config[key] for key in pic_config_keys if key in pic_config}
+    return exist_pic(name=pic_config['name'], pic_full_path=pic_full_path, preview=False, **kwargs)
+
+def get_batch_match_executor(max_workers):
+    executor = batch_match_executor_dict.get(max_workers)
+    if executor is None:
+        with batch_match_executor_lock:
+            executor = batch_match_executor_dict.get(max_workers)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='exist_pic_list')
+                batch_match_executor_dict[max_workers] = executor
+    return executor
+
+def exist_pic_list(pic_config_list: List[Dict], pic_full_path, max_workers=None, stop_at_first=False):
+    '''
+    多素材批量OpenCV识别：截图只解码1次、同一种灰度化/缩小最多1次，所有素材共享同一截图帧进行匹配，并可在线程池中并行匹配（OpenCV匹配时会释放GIL）
+    :param pic_config_list: 模板截图素材组，每个素材为一个dict，key与exist_pic接口的同名参数一致，其中name必传，可选threshold/sub_path/subfolder/priority_index/filter_same/sort_rule/region/mode/max_results/pyramid_level/scale_range/gray/match_scale/verify
+    :param pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧
+    :param max_workers: 并行匹配的线程数，默认为global_var.batch_match_workers，为1时按顺序匹配
+    :param stop_at_first: 是否在第一个命中的素材处停止（仅对按顺序匹配生效），停止后剩余素材的结果为None
+    :return: 与pic_config_list一一对应的exist_res列表
+    '''
+
+    if max_workers is None:
+        max_workers = global_var.batch_match_workers
+
+    img = read_pic(pic_full_path) # 灰度化/缩小后的截图由get_match_frame按帧缓存，所有素材共用
+
+    if max_workers <= 1 or len(pic_config_list) <= 1:
+        res_list = [None] * len(pic_config_list)
+        for index, pic_config in enumerate(pic_config_list):
+            res_list[index] = exist_pic_by_config(pic_config, img)
+            if stop_at_first and res_list[index][0]:
+                break
+        return res_list
+
+    executor = get_batch_match_executor(max_workers)
+    futures = [executor.submit(exist_pic_by_config, pic_config, img) for pic_config in pic_config_list]
+    return [future.result() for future in futures]
 
 def exist_res_offset(exist_res, offset_x=0, offset_y=0, priority_index=0, act_position=Position.CENTER):
     '''
@@ -522,12 +1530,16 @@ def exist_res_offset(exist_res, offset_x=0, offset_y=0, priority_index=0, act_po
     :param offset_y: 纵向偏移量，正为下，负为上，默认为0不偏移
     :param priority_index: 要篡改的命中区域下标，默认为0、表示默认篡改第1个命中区域
     :param act_position: 要篡改的交互点位，默认为中心点，其他点位详见Position枚举
-    :return: new_exist_res，对exist_res深拷贝后篡改的数据
+    :return: new_exist_res，篡改后的新数据，不影响原exist_res
     '''
 
-    new_exist_res = copy.deepcopy(exist_res)
-    point = new_exist_res[1][priority_index][act_position.value]
-    new_exist_res[1][priority_index][act_position.value] = [int(point[0]) + offset_x, int(point[1]) + offset_y]
+    point = exist_res[1][priority_index][act_position.value]
+    new_point = [int(point[0]) + offset_x, int(point[1]) + offset_y]
+    if isinstance(exist_res[1], MatchSet): # 只记录被改写的点位，无需深拷贝整个命中区域集合
+        new_exist_res = ExistRes([exist_res[0], exist_res[1].with_point(priority_index, act_position.value, new_point)] + list(exist_res[2:]), meta=dict(getattr(exist_res, 'meta', {})))
+    else: # 手动构造的list格式
+        new_exist_res = copy.deepcopy(exist_res)
+        new_exist_res[1][priority_index][act_position.value] = new_point
     return new_exist_res
 
 def exist_res_filter_by_region(exist_res, left_x = None, right_x = None, top_y = None, bottom_y = None):
@@ -541,15 +1553,20 @@ def exist_res_filter_by_region(exist_res, left_x = None, right_x = None, top_y =
     :return: 边界内的exist_res
     '''
 
-    width, height = get_screenshot_resolution()
+    # 不传的边界视为不限制，无需截图查询分辨率
     if left_x is None:
-        left_x = 0
+        left_x = -math.inf
     if right_x is None:
-        right_x = width
+        right_x = math.inf
     if top_y is None:
-        top_y = 0
+        top_y = -math.inf
     if bottom_y is None:
-        bottom_y = height
+        bottom_y = math.inf
+
+    if isinstance(exist_res[1], MatchSet):
+        centers = exist_res[1].centers()
+        points_list = exist_res[1].take((centers[:, 0] >= left_x) & (centers[:, 0] <= right_x) & (centers[:, 1] >= top_y) & (centers[:, 1] <= bottom_y))
+        return ExistRes([len(points_list) > 0, points_list], meta=dict(getattr(exist_res, 'meta', {})))
 
     points_list = []
     for points in exist_res[1]:
@@ -559,29 +1576,147 @@ def exist_res_filter_by_region(exist_res, left_x = None, right_x = None, top_y =
             points_list.append(points)
     return [len(points_list) > 0, points_list]
 
-def act_text(text, pic_full_path, equal_filter=False, act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK, filter_special_chars=False):
+def anchor_box(anchor, priority_index=0):
+    '''
+    SDK内部接口，外部不要使用，将各种形式的锚点统一为矩形
+    :param anchor: exist_res（取下标为priority_index的命中区域）/ MatchHit / 矩形(left, top, right, bottom) / 点[x, y]
+    :param priority_index: anchor为exist_res时取的命中区域下标
+    :return: np.array([left, top, right, bottom])
+    '''
+
+    if isinstance(anchor, list) and len(anchor) >= 2 and isinstance(anchor[0], bool): # exist_res
+        assert anchor[0], '锚点exist_res没有命中区域'
+        anchor = anchor[1][priority_index]
+    if hasattr(anchor, 'bbox'): # MatchHit
+        return np.array(anchor.bbox, dtype=np.float64)
+    if len(anchor) == 10: # 旧的list格式的命中区域
+        return np.array([anchor[1][0], anchor[1][1], anchor[5][0], anchor[5][1]], dtype=np.float64)
+    if len(anchor) == 2: # 点
+        return np.array([anchor[0], anchor[1], anchor[0], anchor[1]], dtype=np.float64)
+    return np.array(anchor, dtype=np.float64)
+
+def exist_res_shift(exist_res, offset_x=0, offset_y=0):
+    '''
+    将exist_res的所有命中区域整体平移，比如将局部截图上的识别结果还原为全屏坐标
+    :param exist_res: 来自exist_pic或exist_text的接口结果
+    :param offset_x: 横向偏移量，正为右，负为左
+    :param offset_y: 纵向偏移量，正为下，负为上
+    :return: 平移后的新exist_res
+    '''
+
+    points_list = MatchSet.from_list(exist_res[1]).shift(offset_x, offset_y)
+    return ExistRes([len(points_list) > 0, points_list], meta=dict(getattr(exist_res, 'meta', {})))
+
+def exist_res_nearest(exist_res, anchor, priority_index=0, max_distance=None):
+    '''
+    按命中区域中心点到锚点中心点的距离对命中区域正序排列，最近的排在第1个
+    :param exist_res: 来自exist_pic或exist_text的接口结果
+    :param anchor: 锚点，可传另一个exist_res（取下标为priority_index的命中区域）、MatchHit、矩形(left, top, right, bottom)或点[x, y]
+    :param priority_index: anchor为exist_res时取的命中区域下标
+    :param max_distance: 最大距离（像素），默认为None不限制
+    :return: 排序后的新exist_res
+    '''
+
+    points_list = MatchSet.from_list(exist_res[1])
+    box = anchor_box(anchor, priority_index=priority_index)
+    distances = np.hypot(*(points_list.centers() - [(box[0] + box[2]) / 2, (box[1] + box[3]) / 2]).T)
+    order = np.argsort(distances, kind='stable')
+    if max_distance is not None:
+        order = order[distances[order] <= max_distance]
+    points_list = points_list.take(order)
+    return ExistRes([len(points_list) > 0, points_list], meta=dict(getattr(exist_res, 'meta', {})))
+
+def exist_res_filter_by_direction(exist_res, anchor, direction, priority_index=0, aligned=True, max_gap=None):
+    '''
+    过滤出位于锚点某一侧的命中区域，并按与锚点的间距正序排列，比如"输入框右侧的发送按钮"：
+    exist_res_filter_by_direction(exist_pic('send_btn', frame), exist_pic('input_box', frame), Direction.RIGHT)
+    :param exist_res: 来自exist_pic或exist_text的接口结果
+    :param anchor: 锚点，可传另一个exist_res（取下标为priority_index的命中区域）、MatchHit、矩形(left, top, right, bottom)或点[x, y]
+    :param direction: 方位，详见Direction枚举；命中区域的中心点需越过锚点对应一侧的边
+    :param priority_index: anchor为exist_res时取的命中区域下标
+    :param aligned: 是否要求与锚点对齐，即左右方位时与锚点在纵向上有重叠、上下方位时在横向上有重叠，默认为True
+    :param max_gap: 与锚点的最大间距（像素），默认为None不限制
+    :return: 过滤并排序后的新exist_res
+    '''
+
+    points_list = MatchSet.from_list(exist_res[1])
+    box = anchor_box(anchor, priority_index=priority_index)
+    boxes = points_list.boxes
+    centers = points_list.centers()
+    if direction == Direction.LEFT:
+        mask, gaps = centers[:, 0] < box[0], box[0] - boxes[:, 2]
+    elif direction == Direction.RIGHT:
+        mask, gaps = centers[:, 0] > box[2], boxes[:, 0] - box[2]
+    elif direction == Direction.ABOVE:
+        mask, gaps = centers[:, 1] < box[1], box[1] - boxes[:, 3]
+    else:
+        mask, gaps = centers[:, 1] > box[3], boxes[:, 1] - box[3]
+
+    if direction in [Direction.LEFT, Direction.RIGHT]:
+        overlap = (boxes[:, 1] <= box[3]) & (boxes[:, 3] >= box[1])
+        off_axis = np.abs(centers[:, 1] - (box[1] + box[3]) / 2)
+    else:
+        overlap = (boxes[:, 0] <= box[2]) & (boxes[:, 2] >= box[0])
+        off_axis = np.abs(centers[:, 0] - (box[0] + box[2]) / 2)
+    if aligned:
+        mask &= overlap
+    if max_gap is not None:
+        mask &= gaps <= max_gap
+
+    indices = np.flatnonzero(mask)
+    indices = indices[np.lexsort((off_axis[indices], gaps[indices]))] # 优先按间距、再按偏离程度排序
+    points_list = points_list.take(indices)
+    return ExistRes([len(points_list) > 0, points_list], meta=dict(getattr(exist_res, 'meta', {})))
+
+def exist_res_intersect(exist_res, other_exist_res, min_overlap=0.0):
+    '''
+    过滤出与另一组命中区域相交的命中区域，比如"包含文字'发送'的按钮"：
+    exist_res_intersect(exist_pic('btn', frame, filter_same=True), exist_text('发送', frame))
+    :param exist_res: 来自exist_pic或exist_text的接口结果
+    :param other_exist_res: 另一个来自exist_pic或exist_text的接口结果
+    :param min_overlap: 相交面积占命中区域自身面积的最小比例，默认为0表示有相交即可
+    :return: 过滤后的新exist_res，保持原有顺序
+    '''
+
+    points_list = MatchSet.from_list(exist_res[1])
+    other_boxes = MatchSet.from_list(other_exist_res[1]).boxes
+    boxes = points_list.boxes
+    # (n, m)的相交面积矩阵
+    widths = np.minimum(boxes[:, None, 2], other_boxes[None, :, 2]) - np.maximum(boxes[:, None, 0], other_boxes[None, :, 0])
+    heights = np.minimum(boxes[:, None, 3], other_boxes[None, :, 3]) - np.maximum(boxes[:, None, 1], other_boxes[None, :, 1])
+    areas = np.clip(widths, 0, None) * np.clip(heights, 0, None)
+    self_areas = np.maximum((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]), 1e-6)
+    ratios = areas / self_areas[:, None]
+    mask = (ratios > min_overlap).any(axis=1) if min_overlap > 0 else (areas > 0).any(axis=1)
+    points_list = points_list.take(mask)
+    return ExistRes([len(points_list) > 0, points_list], meta=dict(getattr(exist_res, 'meta', {})))
+
+def act_text(text, pic_full_path, equal_filter=False, act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK, filter_special_chars=False, region=None, staged=None, use_angle_cls=None):
     '''
     基于接口exist_text的结果，对命中区域进行交互。因为是直接进行交互的接口，所以潜台词就是能命中区域，故如果没有命中区域的话、DTClientAutotest会直接assert断言失败
     :param text: 目标文字
-    :param pic_full_path: 图片的完整路径
+    :param pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧
     :param equal_filter: 是否过滤出与目标文字完全相等的命中区域。比如当OCR识别出的ocr_text集合为['12abc34','2abc3','abc34']，目标文字text为'2abc3': 当equal_filter为False时，可以命中['12abc34','2abc3']；当equal_filter为True时，只能命中['2abc3']
     :param act_position: 与命中区域进行交互的点位，默认为中心点，其他点位详见Position枚举
     :param priority_index: 在命中区域集合中选择要交互的那个命中区域下标，默认为0、表示默认交互第1个命中区域
     :param act_mode: 与命中区域进行交互的交互模式，默认为左单击，其他交互模式详见ActMode枚举
     :param filter_special_chars: 是否干掉 除了 "字母（大小写）、数字（阿拉伯）、汉字" 之外 的字符
+    :param region: 搜索区域，默认为None表示全屏搜索，可传矩形(left, top, right, bottom)或锚点dict，详见exist_pic接口的region参数
+    :param staged: 是否走分阶段OCR，默认为global_var.ocr_staged，详见exist_text接口的staged参数
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
     :return: [exist_res, act_res]，其中exist_res来自exist_text的接口结果，act_res来自act_point的接口结果
     '''
 
-    exist_res = exist_text(text=text, pic_full_path=pic_full_path, equal_filter=equal_filter, preview=False, filter_special_chars=filter_special_chars)
-    assert exist_res[0], 'OCR识别不到目标文字, text='+text+', pic_full_path='+pic_full_path+', equal_filter='+str(equal_filter)+', preview=False'
+    exist_res = exist_text(text=text, pic_full_path=pic_full_path, equal_filter=equal_filter, preview=False, filter_special_chars=filter_special_chars, region=region, staged=staged, use_angle_cls=use_angle_cls, stop_at_first=priority_index == 0)
+    assert exist_res[0], 'OCR识别不到目标文字, text='+text+', pic_full_path='+pic_desc(pic_full_path)+', equal_filter='+str(equal_filter)+', preview=False'
     act_res = act_point(exist_res=exist_res, act_position=act_position, priority_index=priority_index, act_mode=act_mode)
     return [exist_res, act_res]
 
-def act_pic(name, pic_full_path, threshold=None, sub_path=None, subfolder='', act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE):
+def act_pic(name, pic_full_path, threshold=None, sub_path=None, subfolder='', act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE, region=None, mode=None, max_results=None, pyramid_level=None, scale_range=None, gray=None, match_scale=None, verify=None):
     '''
     基于接口exist_pic的结果，对命中区域进行交互。因为是直接进行交互的接口，所以潜台词就是能命中区域，故如果没有命中区域的话、DTClientAutotest会直接assert断言失败
     :param name: 模板截图简称。模板截图全称 = 模板截图简称_system()_屏幕截图分辨率宽x屏幕截图分辨率高，模板截图全称 形如 {name}_mac_2880x1800，支持3种扩展类型（.png, .jpg, .jpeg）、选其一即可
-    :param pic_full_path: 图片的完整路径
+    :param pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧
     :param threshold: 图片模板匹配时的相似度阈值，范围为(0,1)，越接近1表示相似度要求越高，默认为global_var.threshold
     :param sub_path: 模板截图存放路径，默认为{global_var.root_path}/template_pic，如果subfolder为空串''的话，则模板截图的完整路径形如 {global_var.root_path}/template_pic/{name}_mac_2880x1800.png
     :param subfolder: 模板截图存放的子文件夹路径，默认为空串''，可用于将模板截图按开发者名字或所属业务模块进行分类管理、以实现模板截图之间的隔离。当不为空串''时，比如subfolder为'xincheng/im'时，则模板截图的完整路径形如 {global_var.root_path}/template_pic/xincheng/im/{name}_mac_2880x1800.png
@@ -590,6 +1725,14 @@ def act_pic(name, pic_full_path, threshold=None, sub_path=None, subfolder='', ac
     :param act_mode: 与命中区域进行交互的交互模式，默认为左单击，其他交互模式详见ActMode枚举
     :param filter_same: OpenCV多目标匹配时，filter_same为True可过滤掉重复命中区域
     :param sort_rule: OpenCV多目标匹配时，命中区的排序规则
+    :param region: 搜索区域，默认为None表示全屏搜索，可传矩形(left, top, right, bottom)或锚点dict，详见exist_pic接口的region参数
+    :param mode: 模板匹配策略，默认为None，详见exist_pic接口的mode参数及MatchMode枚举
+    :param max_results: 最多返回的命中区域个数，默认为None不限制
+    :param pyramid_level: 金字塔粗匹配的层数，默认为global_var.pyramid_level，详见exist_pic接口的pyramid_level参数
+    :param scale_range: 模板截图的缩放倍数范围，默认为global_var.template_scale_range，详见exist_pic接口的scale_range参数
+    :param gray: 是否在灰度图上匹配，默认为None取模板截图的匹配精度提示，同exist_pic
+    :param match_scale: 匹配时截图与模板截图的缩小倍数，同exist_pic
+    :param verify: 降精度匹配时是否在全精度截图上对候选点重新打分，同exist_pic
     :return: [exist_res, act_res]，其中exist_res来自exist_pic的接口结果，act_res来自act_point的接口结果
     '''
 
@@ -598,8 +1741,8 @@ def act_pic(name, pic_full_path, threshold=None, sub_path=None, subfolder='', ac
     if sub_path is None:
         sub_path = os.path.join(global_var.root_path, 'template_pic')
 
-    exist_res = exist_pic(name=name, pic_full_path=pic_full_path, threshold=threshold, sub_path=sub_path, subfolder=subfolder, preview=False, priority_index=priority_index, filter_same=filter_same, sort_rule=sort_rule)
-    assert exist_res[0], 'OpenCV识别不到目标区域, name='+name+', pic_full_path='+pic_full_path+', threshold='+str(threshold)+', sub_path='+sub_path+', subfolder='+subfolder+', preview=False'
+    exist_res = exist_pic(name=name, pic_full_path=pic_full_path, threshold=threshold, sub_path=sub_path, subfolder=subfolder, preview=False, priority_index=priority_index, filter_same=filter_same, sort_rule=sort_rule, region=region, mode=mode, max_results=max_results, pyramid_level=pyramid_level, scale_range=scale_range, gray=gray, match_scale=match_scale, verify=verify)
+    assert exist_res[0], 'OpenCV识别不到目标区域, name='+name+', pic_full_path='+pic_desc(pic_full_path)+', threshold='+str(threshold)+', sub_path='+sub_path+', subfolder='+subfolder+', preview=False'
     act_res = act_point(exist_res=exist_res, act_position=act_position, priority_index=priority_index, act_mode=act_mode)
     return [exist_res, act_res]
 
@@ -609,13 +1752,8 @@ def get_scale():
     :return: 转化后的像素比例
     '''
 
-    if 'win' == system():
-        scale = 1.0
-    elif 'mac' == system():
-        scale = 2.0
-    if get_uuid() in global_var.uuid_resolution_scale_dict: # 特殊设备
-        scale = global_var.uuid_resolution_scale_dict[get_uuid()]
-    return scale
+    return get_host_profile().scale
+
 
 def act_point(exist_res, act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK):
     '''
@@ -630,11 +1768,15 @@ def act_point(exist_res, act_position=Position.CENTER, priority_index=0, act_mod
     assert exist_res[0] and len(exist_res[1]) > 0, 'exist_res数据异常 或 可交互点位集合为空'
     assert priority_index >=0 and priority_index + 1 <= len(exist_res[1]), 'priority_index越界了, len(exist_res[1]) = ' + str(len(exist_res[1])) + ', priority_index = ' + str(priority_index)
 
+    import pyautogui
+    from pynput import mouse
+
     # 要交互的点，单位像素
     point = exist_res[1][priority_index][act_position.value]
 
-    x = point[0] / get_scale()
-    y = point[1] / get_scale()
+    scale = get_scale()
+    x = point[0] / scale
+    y = point[1] / scale
 
     # 按交互模式执行交互
     if act_mode == ActMode.LEFT_CLICK: # 左单击
@@ -654,11 +1796,122 @@ def act_point(exist_res, act_position=Position.CENTER, priority_index=0, act_mod
     elif act_mode == ActMode.MOVE_ON: # 移动到
         pyautogui.moveTo(x, y)
 
+    notify_ui_event('act') # 交互后界面大概率会变化，唤醒事件驱动等待中的轮询
     return [x, y]
 
-def loop_exist_pic(name, threshold=None, sub_path=None, subfolder='', before=None, timeout=None, interval=None, after=None, priority_index=0, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE):
+# 轮询变化门控的累计统计，所有轮询接口共用
+frame_change_gate_stats = {'polls': 0, 'skipped': 0, 'partial': 0, 'full': 0}
+frame_change_gate_stats_lock = threading.Lock()
+
+class FrameChangeGate():
+    '''
+    SDK内部接口，外部不要使用。轮询变化门控，由global_var.frame_change_gate开启，每次轮询内部各自创建1个
+
+    将每一帧截图与上一帧做差分求出脏矩形：
+    没有变化时跳过本次匹配、复用上一次未命中的结果；
+    有变化时只返回包含脏矩形的搜索区域，因为上一帧整屏都没命中，新的命中区域一定与脏矩形相交
+    '''
+
+    def __init__(self, tolerance=None):
+        '''
+        :param tolerance: 像素差分的容差，默认为global_var.frame_change_gate_tolerance
+        '''
+
+        self.tolerance = global_var.frame_change_gate_tolerance if tolerance is None else tolerance
+        self.last_frame = None
+        self.polls = 0   # 轮询次数
+        self.skipped = 0 # 屏幕没变化、跳过匹配的次数
+        self.partial = 0 # 只匹配了变化区域的次数
+        self.full = 0    # 整屏匹配的次数
+
+    def dirty_rect(self, frame):
+        '''
+        求出frame与上一帧之间的脏矩形
+        :param frame: 截图帧
+        :return: 脏矩形(left, top, right, bottom)；没有上一帧或尺寸变了时为整屏；没有变化时为None
+        '''
+
+        last_frame, self.last_frame = self.last_frame, frame
+        height, width = frame.shape[:2]
+        if last_frame is None or last_frame.shape != frame.shape:
+            return (0, 0, width, height)
+        if last_frame is frame: # 回放截图后端重复返回同一帧
+            return None
+
+        diff = cv2.absdiff(frame, last_frame).reshape(height, -1)
+        # 按行、按列取最大差值，无需对整张差分图做阈值化
+        rows = np.flatnonzero(cv2.reduce(diff, 1, cv2.REDUCE_MAX).ravel() > self.tolerance)
+        if rows.size == 0:
+            return None
+        cols = cv2.reduce(diff, 0, cv2.REDUCE_MAX).reshape(width, -1).max(axis=1)
+        cols = np.flatnonzero(cols > self.tolerance)
+        return (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+
+    def next_region(self, frame, region=None, pad_x=0, pad_y=0, full_width=False):
+        '''
+        计算本次轮询的搜索区域
+        :param frame: 截图帧
+        :param region: 轮询接口的region入参，锚点dict不做门控、只在屏幕没变化时跳过
+        :param pad_x: 脏矩形左右各扩展的像素数，模板匹配时为模板截图宽度
+        :param pad_y: 脏矩形上下各扩展的像素数，模板匹配时为模板截图高度
+        :param full_width: 是否将脏矩形左右扩展到整个搜索区域的宽度，OCR时为True
+        :return: 本次的搜索区域，为None时表示跳过本次匹配
+        '''
+
+        self.polls += 1
+        dirty = self.dirty_rect(frame)
+        if dirty is None:
+            self.skipped += 1
+            self.update_stats('skipped')
+            return None
+
+        height, width = frame.shape[:2]
+        if dirty == (0, 0, width, height) or isinstance(region, dict):
+            self.full += 1
+            self.update_stats('full')
+            return region if isinstance(region, dict) else resolve_region(region, frame)
+
+        left, top, right, bottom = resolve_region(region, frame)
+        if full_width:
+            dirty = (left, dirty[1] - pad_y, right, dirty[3] + pad_y)
+        else:
+            dirty = (dirty[0] - pad_x, dirty[1] - pad_y, dirty[2] + pad_x, dirty[3] + pad_y)
+        self.partial += 1
+        self.update_stats('partial')
+        return (max(left, dirty[0]), max(top, dirty[1]), min(right, max(left, dirty[2])), min(bottom, max(top, dirty[3])))
+
+    def update_stats(self, key):
+        with frame_change_gate_stats_lock:
+            frame_change_gate_stats['polls'] += 1
+            frame_change_gate_stats[key] += 1
+
+    def stats(self):
+        '''
+        :return: 本次轮询的门控统计 {'polls', 'skipped', 'partial', 'full'}
+        '''
+
+        return {'polls': self.polls, 'skipped': self.skipped, 'partial': self.partial, 'full': self.full}
+
+def create_frame_change_gate():
     '''
-    轮询OpenCV识别一张图片中模板截图命中的所有区域，内部自动完成PC端屏幕截图和删除、截图无需外部传入
+    SDK内部接口，外部不要使用，global_var.frame_change_gate开启时为本次轮询创建门控
+    :return: FrameChangeGate实例，未开启时为None
+    '''
+
+    return FrameChangeGate() if global_var.frame_change_gate else None
+
+def get_frame_change_gate_stats():
+    '''
+    获取轮询变化门控的累计统计
+    :return: {'polls': 轮询次数, 'skipped': 屏幕没变化而跳过匹配的次数, 'partial': 只匹配变化区域的次数, 'full': 整屏匹配的次数}
+    '''
+
+    with frame_change_gate_stats_lock:
+        return dict(frame_change_gate_stats)
+
+def loop_exist_pic(name, threshold=None, sub_path=None, subfolder='', before=None, timeout=None, interval=None, after=None, priority_index=0, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE, region=None, mode=None, max_results=None, pyramid_level=None, scale_range=None, gray=None, match_scale=None, verify=None):
+    '''
+    轮询OpenCV识别一张图片中模板截图命中的所有区域，内部自动完成PC端屏幕截图（截图帧只保留在内存中、不落盘）、截图无需外部传入
     :param name: 模板截图简称。模板截图全称 = 模板截图简称_system()_屏幕截图分辨率宽x屏幕截图分辨率高，模板截图全称 形如 {name}_mac_2880x1800，支持3种扩展类型（.png, .jpg, .jpeg）、选其一即可
     :param threshold: 图片模板匹配时的相似度阈值，范围为(0,1)，越接近1表示相似度要求越高，默认为global_var.threshold
     :param sub_path: 模板截图存放路径，默认为{global_var.root_path}/template_pic，如果subfolder为空串''的话，则模板截图的完整路径形如 {global_var.root_path}/template_pic/{name}_mac_2880x1800.png
@@ -670,6 +1923,14 @@ def loop_exist_pic(name, threshold=None, sub_path=None, subfolder='', before=Non
     :param priority_index: 在命中区域集合中选择要交互的那个命中区域下标，默认为0、表示默认交互第1个命中区域。但在这里的作用为：0表示用模板截图进行高性能的单目标匹配，非0表示用模板截图进行多目标匹配。
     :param filter_same: OpenCV多目标匹配时，filter_same为True可过滤掉重复命中区域
     :param sort_rule: OpenCV多目标匹配时，命中区的排序规则
+    :param region: 搜索区域，默认为None表示全屏搜索，可传矩形(left, top, right, bottom)或锚点dict，详见exist_pic接口的region参数
+    :param mode: 模板匹配策略，默认为None，详见exist_pic接口的mode参数及MatchMode枚举
+    :param max_results: 最多返回的命中区域个数，默认为None不限制
+    :param pyramid_level: 金字塔粗匹配的层数，默认为global_var.pyramid_level，详见exist_pic接口的pyramid_level参数
+    :param scale_range: 模板截图的缩放倍数范围，默认为global_var.template_scale_range，详见exist_pic接口的scale_range参数
+    :param gray: 是否在灰度图上匹配，默认为None取模板截图的匹配精度提示，同exist_pic
+    :param match_scale: 匹配时截图与模板截图的缩小倍数，同exist_pic
+    :param verify: 降精度匹配时是否在全精度截图上对候选点重新打分，同exist_pic
     :return: exist_res，来自exist_pic的接口结果
     '''
 
@@ -688,27 +1949,76 @@ def loop_exist_pic(name, threshold=None, sub_path=None, subfolder='', before=Non
 
     time.sleep(before) # 在轮询开始前等待before秒
 
-    start_time = time.time() # 开始轮询的时间戳
-    while True:
-        pic_full_path = screenshot() # 截图
-        exist_res = exist_pic(name=name, pic_full_path=pic_full_path, threshold=threshold, sub_path=sub_path, subfolder=subfolder, preview=False, priority_index=priority_index, filter_same=filter_same, sort_rule=sort_rule)
-        if os.path.exists(pic_full_path):
-            os.remove(pic_full_path) # 清理截图
-        end_time = time.time() # 轮询后的时间戳
-        duration = end_time - start_time # 耗时
-        if duration > timeout: # 已超时
-            return exist_res # 无论是否轮询到目标元素，直接结束
-        else: # 还未超时
-            if exist_res[0]: # 已轮询到目标元素
-                time.sleep(after) # 在轮询到目标元素后等待after秒
-                return exist_res # 轮询到目标元素，返回结果
-            else: # 未轮询到目标元素，继续轮询
-                time.sleep(interval) # 轮询间隔interval秒
+    gate = create_frame_change_gate()
+    wait = begin_wait(interval=interval, timeout=timeout)
+    try:
+        exist_res = None
+        start_time = time.time() # 开始轮询的时间戳
+        while True:
+            frame = wait.frame() # 截图，只保留在内存中
+            search_region = region
+            if gate is not None:
+                template_size = exist_res.meta['template_size'] if exist_res is not None else (0, 0)
+                search_region = gate.next_region(frame, region=region, pad_x=template_size[0], pad_y=template_size[1])
+            if search_region is not None or exist_res is None:
+                exist_res = exist_pic(name=name, pic_full_path=frame, threshold=threshold, sub_path=sub_path, subfolder=subfolder, preview=False, priority_index=priority_index, filter_same=filter_same, sort_rule=sort_rule, region=search_region, mode=mode, max_results=max_results, pyramid_level=pyramid_level, scale_range=scale_range, gray=gray, match_scale=match_scale, verify=verify)
+            if gate is not None:
+                exist_res.meta['frame_change_gate'] = gate.stats()
+            end_time = time.time() # 轮询后的时间戳
+            duration = end_time - start_time # 耗时
+            if duration > timeout: # 已超时
+                exist_res.meta['wait'] = wait.finish(exist_res[0])
+                return exist_res # 无论是否轮询到目标元素，直接结束
+            else: # 还未超时
+                if exist_res[0]: # 已轮询到目标元素
+                    exist_res.meta['wait'] = wait.finish(True)
+                    time.sleep(after) # 在轮询到目标元素后等待after秒
+                    return exist_res # 轮询到目标元素，返回结果
+                else: # 未轮询到目标元素，继续轮询
+                    wait.sleep() # 按等待策略等到下一次轮询
+    finally:
+        wait.finish(False) # 异常退出时也要结束本次等待，已结束的等待不会重复计入统计
+
+def gated_exist_pic_list(gate, pic_config_list, frame, last_res_list):
+    '''
+    SDK内部接口，外部不要使用，经由轮询变化门控的exist_pic_list：屏幕没变化的素材直接复用上一次未命中的结果，有变化的素材只在变化区域内匹配
+    :param gate: FrameChangeGate实例，为None时等同于exist_pic_list
+    :param pic_config_list: 模板截图素材组
+    :param frame: 截图帧
+    :param last_res_list: 上一次轮询的结果，第一次轮询时为None
+    :return: 与pic_config_list一一对应的exist_res列表
+    '''
+
+    if gate is None or last_res_list is None:
+        res_list = exist_pic_list(pic_config_list, frame, stop_at_first=True)
+        if gate is not None:
+            gate.next_region(frame) # 记录第一帧
+        return res_list
+
+    dirty_region = gate.next_region(frame)
+    if dirty_region is None:
+        return last_res_list
+    res_list = list(last_res_list)
+    indexes = []
+    gated_config_list = []
+    for index, pic_config in enumerate(pic_config_list):
+        last_res = last_res_list[index]
+        region = pic_config.get('region')
+        if last_res is not None and not isinstance(region, dict):
+            # 将整屏的脏矩形按该素材的模板截图尺寸扩展，再与素材自身的搜索区域求交
+            template_size = last_res.meta['template_size']
+            left, top, right, bottom = resolve_region(region, frame)
+            region = (max(left, dirty_region[0] - template_size[0]), max(top, dirty_region[1] - template_size[1]), min(right, dirty_region[2] + template_size[0]), min(bottom, dirty_region[3] + template_size[1]))
+        indexes.append(index)
+        gated_config_list.append(dict(pic_config, region=region))
+    for index, exist_res in zip(indexes, exist_pic_list(gated_config_list, frame, stop_at_first=True)):
+        res_list[index] = exist_res
+    return res_list
 
 def loop_exist_pic_list(pic_config_list: List[Dict], timeout=None):
     '''
     多素材交替式轮询查找命中区。命中一个素材即停止（建议这些素材的出现是互斥的）；或达到超时上限了也会停止。
-    :param pic_config_list: 模板截图素材组
+    :param pic_config_list: 模板截图素材组，每个素材为一个dict，key与exist_pic接口的同名参数一致，其中name必传，可选threshold/sub_path/subfolder/priority_index/filter_same/sort_rule/region/mode/max_results/pyramid_level/scale_range/gray/match_scale/verify
     :param timeout: 超时上限。当timeout为None时，有默认的超时上限（len(pic_config_list) * 3）；也可自定义透传进来。
     :return: 当命中一个素材时，返回{'index': index, 'exist_res': exist_res}，index为命中的素材在pic_config_list中的下标、从0开始；当超时了，固定返回{'index': -1, 'exist_res': None}
     '''
@@ -721,43 +2031,46 @@ def loop_exist_pic_list(pic_config_list: List[Dict], timeout=None):
         assert type(pic_config) == dict, 'pic_config必须为dict类型'
         assert 'name' in pic_config, 'name是pic_config中必传的key'
 
-    start_time = time.time()
-    while True:
-        pic_full_path = screenshot()
-
-        index = -1
-        for pic_config in pic_config_list:
-            index += 1
-            name = pic_config['name']
-            threshold = pic_config['threshold'] if 'threshold' in pic_config else None
-            sub_path = pic_config['sub_path'] if 'sub_path' in pic_config else None
-            subfolder = pic_config['subfolder'] if 'subfolder' in pic_config else ''
-            priority_index = pic_config['priority_index'] if 'priority_index' in pic_config else 0
-            filter_same = pic_config['filter_same'] if 'filter_same' in pic_config else False
-            sort_rule = pic_config['sort_rule'] if 'sort_rule' in pic_config else SortRule.THRESHOLD_REVERSE
-            exist_res = exist_pic(name=name, pic_full_path=pic_full_path, threshold=threshold, sub_path=sub_path, subfolder=subfolder, preview=False, priority_index=priority_index, filter_same=filter_same, sort_rule=sort_rule)
-            if exist_res[0]:
-                os.remove(pic_full_path)
-                return {'index': index, 'exist_res': exist_res}
-
-        os.remove(pic_full_path)
-        duration = time.time() - start_time
-        # 默认为预估所有素材循环3次左右，也可外部透传进来自定义超时时间（单位：秒）
-        real_timeout = len(pic_config_list) * 3 if timeout is None else timeout
-        if duration > real_timeout:
-            return {'index': -1, 'exist_res': None}
+    # 默认为预估所有素材循环3次左右，也可外部透传进来自定义超时时间（单位：秒）
+    real_timeout = len(pic_config_list) * 3 if timeout is None else timeout
+    gate = create_frame_change_gate()
+    wait = begin_wait(timeout=real_timeout)
+    try:
+        res_list = None
+        start_time = time.time()
+        while True:
+            frame = wait.frame()
+
+            # 所有素材共享同一截图帧批量匹配，取第一个命中的素材
+            res_list = gated_exist_pic_list(gate, pic_config_list, frame, res_list)
+            for index, exist_res in enumerate(res_list):
+                if exist_res is not None and exist_res[0]:
+                    exist_res.meta['wait'] = wait.finish(True)
+                    return {'index': index, 'exist_res': exist_res}
+
+            duration = time.time() - start_time
+            if duration > real_timeout:
+                wait.finish(False)
+                return {'index': -1, 'exist_res': None}
+            wait.sleep()
+    finally:
+        wait.finish(False) # 异常退出时也要结束本次等待，已结束的等待不会重复计入统计
 
-def loop_exist_text(text, equal_filter=False, before=None, timeout=None, interval=None, after=None, rm_screenshot=True, filter_special_chars=False):
+def loop_exist_text(text, equal_filter=False, before=None, timeout=None, interval=None, after=None, rm_screenshot=True, filter_special_chars=False, region=None, staged=None, use_angle_cls=None, stop_at_first=False):
     '''
-    轮询OCR识别一张图片中目标文字命中的所有区域，内部自动完成PC端屏幕截图和删除、截图无需外部传入
+    轮询OCR识别一张图片中目标文字命中的所有区域，内部自动完成PC端屏幕截图（截图帧只保留在内存中、不落盘）、截图无需外部传入
     :param text: 目标文字
     :param equal_filter: 是否过滤出与目标文字完全相等的命中区域。比如当OCR识别出的ocr_text集合为['12abc34','2abc3','abc34']，目标文字text为'2abc3': 当equal_filter为False时，可以命中['12abc34','2abc3']；当equal_filter为True时，只能命中['2abc3']
     :param before: 第一次轮询前等待的秒数，默认为{global_var.loop_exist_text_before}
     :param timeout: 轮询的最大超时秒数，默认为{global_var.loop_exist_text_timeout}
     :param interval: 在未轮询超时的情况下，且未轮询到目标区域时的轮询间隔秒数，默认为{global_var.loop_exist_text_interval}
     :param after: 在未轮询超时的情况下，且轮询到目标区域后等待的秒数，默认为{global_var.loop_exist_text_after}
-    :param rm_screenshot: 内部参数、外部不要使用、默认值为True
+    :param rm_screenshot: 内部参数、外部不要使用、默认值为True；为False时会将命中目标文字时的截图帧追加到exist_res末尾（即exist_res[2]），供生成文字缓存图使用
     :param filter_special_chars: 是否干掉 除了 "字母（大小写）、数字（阿拉伯）、汉字" 之外 的字符
+    :param region: 搜索区域，默认为None表示全屏搜索，可传矩形(left, top, right, bottom)或锚点dict，详见exist_pic接口的region参数
+    :param staged: 是否走分阶段OCR，默认为global_var.ocr_staged，详见exist_text接口的staged参数
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
+    :param stop_at_first: 分阶段OCR时是否在识别出第一个命中区域后就停止，详见exist_text接口的stop_at_first参数
     :return: exist_res，来自exist_text的接口结果
     '''
 
@@ -772,34 +2085,108 @@ def loop_exist_text(text, equal_filter=False, before=None, timeout=None, interva
 
     time.sleep(before)  # 在轮询开始前等待before秒
 
-    start_time = time.time()  # 开始轮询的时间戳
-    while True:
-        pic_full_path = screenshot()  # 截图
-        exist_res = exist_text(text=text, pic_full_path=pic_full_path, equal_filter=equal_filter, preview=False, filter_special_chars=filter_special_chars)
-        end_time = time.time()  # 轮询后的时间戳
-        duration = end_time - start_time # 耗时
-        if duration > timeout: # 已超时
-            if exist_res[0] and not rm_screenshot:
-                exist_res.append(pic_full_path)
-            else:
-                os.remove(pic_full_path)  # 清理截图
-            return exist_res  # 无论是否轮询到目标元素，直接结束
-        else: # 还未超时
-            if exist_res[0]: # 已轮询到目标元素
-                time.sleep(after)  # 在轮询到目标元素后等待after秒
-                if rm_screenshot:
-                    os.remove(pic_full_path)  # 清理截图
-                else:
-                    exist_res.append(pic_full_path)
-                return exist_res  # 轮询到目标元素，返回结果
-            else: # 未轮询到目标元素，继续轮询
-                os.remove(pic_full_path)  # 清理截图
-                time.sleep(interval) # 轮询间隔interval秒
+    gate = create_frame_change_gate()
+    wait = begin_wait(interval=interval, timeout=timeout)
+    try:
+        exist_res = None
+        start_time = time.time()  # 开始轮询的时间戳
+        while True:
+            frame = wait.frame()  # 截图，只保留在内存中
+            search_region = region
+            if gate is not None:
+                search_region = gate.next_region(frame, region=region, pad_y=global_var.frame_change_gate_text_margin, full_width=True)
+            if search_region is not None or exist_res is None:
+                exist_res = exist_text(text=text, pic_full_path=frame, equal_filter=equal_filter, preview=False, filter_special_chars=filter_special_chars, region=search_region, staged=staged, use_angle_cls=use_angle_cls, stop_at_first=stop_at_first)
+            if gate is not None:
+                exist_res.meta['frame_change_gate'] = gate.stats()
+            end_time = time.time()  # 轮询后的时间戳
+            duration = end_time - start_time # 耗时
+            if duration > timeout: # 已超时
+                exist_res.meta['wait'] = wait.finish(exist_res[0])
+                if exist_res[0] and not rm_screenshot:
+                    exist_res.append(frame)
+                return exist_res  # 无论是否轮询到目标元素，直接结束
+            else: # 还未超时
+                if exist_res[0]: # 已轮询到目标元素
+                    exist_res.meta['wait'] = wait.finish(True)
+                    time.sleep(after)  # 在轮询到目标元素后等待after秒
+                    if not rm_screenshot:
+                        exist_res.append(frame)
+                    return exist_res  # 轮询到目标元素，返回结果
+                else: # 未轮询到目标元素，继续轮询
+                    wait.sleep() # 按等待策略等到下一次轮询
+    finally:
+        wait.finish(False) # 异常退出时也要结束本次等待，已结束的等待不会重复计入统计
+
+def exist_text_list(text_config_list: List[Dict], pic_full_path, use_angle_cls=None):
+    '''
+    多目标文字OCR识别：同一截图（同一搜索区域）只OCR一次，所有目标文字都在同一份识别结果上匹配
+    :param text_config_list: 目标文字组，每个目标文字为一个dict，其中text必传，可选equal_filter/filter_special_chars/region/regex，含义与exist_text接口的同名参数一致
+    :param pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
+    :return: 与text_config_list一一对应的exist_res列表
+    '''
+
+    img = read_pic(pic_full_path)
+    lines_dict = {} # 搜索区域 -> OCR识别结果，同一帧内不依赖OCR识别结果缓存的开关
+    res_list = []
+    for text_config in text_config_list:
+        region = resolve_region(text_config.get('region'), img)
+        if region not in lines_dict:
+            lines_dict[region] = ocr_lines(img, region=region, use_angle_cls=use_angle_cls)
+        final_lines = match_ocr_lines(text_config['text'], lines_dict[region], equal_filter=text_config.get('equal_filter', False), filter_special_chars=text_config.get('filter_special_chars', False), offset_x=region[0], offset_y=region[1], regex=text_config.get('regex', False))
+        res_list.append(ExistRes([len(final_lines) > 0, final_lines], meta={'region': text_config.get('region')}))
+    return res_list
+
+def loop_exist_text_list(text_config_list: List[Dict], timeout=None, interval=None, use_angle_cls=None):
+    '''
+    多目标文字交替式轮询查找命中区，每一帧只OCR一次、所有目标文字在同一份识别结果上匹配。命中一个目标文字即停止；或达到超时上限了也会停止。
+    :param text_config_list: 目标文字组，每个目标文字为一个dict，其中text必传，可选equal_filter/filter_special_chars/region/regex，含义与exist_text接口的同名参数一致；regex为True时text为正则表达式
+    :param timeout: 超时上限，默认为global_var.loop_exist_text_timeout
+    :param interval: 未命中时的轮询间隔秒数，默认为global_var.loop_exist_text_interval
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
+    :return: 当命中一个目标文字时，返回{'index': index, 'exist_res': exist_res}，index为命中的目标文字在text_config_list中的下标、从0开始，同一帧命中多个时取下标最小的；当超时了，固定返回{'index': -1, 'exist_res': None}
+    '''
+
+    # 参数合法性检测
+    assert type(text_config_list) == list, 'text_config_list必须为list类型'
+    if len(text_config_list) == 0:
+        assert False, 'text_config_list不能为空数组[]'
+    for text_config in text_config_list:
+        assert type(text_config) == dict, 'text_config必须为dict类型'
+        assert 'text' in text_config, 'text是text_config中必传的key'
+
+    if timeout is None:
+        timeout = global_var.loop_exist_text_timeout
+    if interval is None:
+        interval = global_var.loop_exist_text_interval
+
+    gate = create_frame_change_gate()
+    wait = begin_wait(interval=interval, timeout=timeout)
+    try:
+        start_time = time.time()
+        while True:
+            frame = wait.frame()
+            # 屏幕没变化时上一帧的结果依然是未命中，跳过本次OCR
+            if gate is None or gate.next_region(frame) is not None:
+                res_list = exist_text_list(text_config_list, frame, use_angle_cls=use_angle_cls)
+                for index, exist_res in enumerate(res_list):
+                    if exist_res[0]:
+                        exist_res.meta['wait'] = wait.finish(True)
+                        return {'index': index, 'exist_res': exist_res}
+
+            duration = time.time() - start_time
+            if duration > timeout:
+                wait.finish(False)
+                return {'index': -1, 'exist_res': None}
+            wait.sleep()
+    finally:
+        wait.finish(False) # 异常退出时也要结束本次等待，已结束的等待不会重复计入统计
 
 def create_pic_cache_for_text(base_pic_full_path, left_top_point, right_bottom_point, pic_cache_full_path):
     '''
     对一张图片中的局部区域完成截图（内部接口，服务于loop_exist_text_by_pic_cache接口）
-    :param base_pic_full_path: 图片的完整路径
+    :param base_pic_full_path: 图片的完整路径，或来自screenshot_frame()的截图帧
     :param left_top_point: 想要截取的局部区域的左上角坐标 [left_topX, left_topY]
     :param right_bottom_point: 想要截取的局部区域的右下角坐标 [right_bottomX, right_bottomY]
     :param pic_cache_full_path: 存放局部区域截图的完整路径
@@ -809,7 +2196,7 @@ def create_pic_cache_for_text(base_pic_full_path, left_top_point, right_bottom_p
     pic_cache_sub_path = os.path.dirname(pic_cache_full_path)
     os.makedirs(pic_cache_sub_path, exist_ok=True) # 确保缓存图所在的文件夹均已创建
 
-    base_pic_img = cv2.imread(base_pic_full_path)
+    base_pic_img = read_pic(base_pic_full_path)
     pic_cache_img = base_pic_img[int(left_top_point[1]):int(right_bottom_point[1]), int(left_top_point[0]):int(right_bottom_point[0])]
     cv2.imwrite(pic_cache_full_path, pic_cache_img)
 
@@ -824,34 +2211,164 @@ def get_md5_of_str(string):
     hash_object.update(string.encode('utf-8'))
     return hash_object.hexdigest()
 
+# 缓存名的映射关系，key为(外部调用处的code对象, 行号)，每个调用处只读取1次源码
+pic_cache_name_dict = {}
+# 框架内core.py的路径特征，调用堆栈中第一个不含它的就是外部脚本
+core_py_marker = os.path.join('DTClientAutotest', 'pc', 'core.py')
+
 def create_default_pic_cache_name_from_inspect_stack(skip_stack_level_for_cache=0):
     '''
-    SDK内部接口，外部不要使用，利用切片获取本次调用堆栈，来定位并拼接外部调用ocr缓存式接口的唯一性信息、自动建立外部脚本中的ocr与缓存图的映射关系
+    SDK内部接口，外部不要使用，沿调用栈逐帧回溯，来定位并拼接外部调用ocr缓存式接口的唯一性信息、自动建立外部脚本中的ocr与缓存图的映射关系
+    （不使用inspect.stack()，它会读取整条调用栈上所有帧的源码；这里只读取目标帧的那1行源码，且按调用处缓存）
     :param skip_stack_level_for_cache: 函数封装时如果缓存接口入参传了变量，则需要对调用堆栈层级进行跳跃来生成正确的缓存名
     :return: 唯一性映射关系的md5值
     '''
 
-    inspect_stack = inspect.stack()
-    target_i = None
-    index = -1
-    for i in inspect_stack:
-        index = index + 1
-        if 'mac' == system():
-            if 'DTClientAutotest/pc/core.py' not in i[1]: # 第一个不含框架内的外部调用就是脚本中的py路径
-                target_i = i
-                break
-        elif 'win' == system():
-            if 'DTClientAutotest\\pc\\core.py' not in i[1]:
-                target_i = i
+    frame = sys._getframe(0)
+    while frame is not None and core_py_marker in frame.f_code.co_filename: # 第一个不含框架内的外部调用就是脚本中的py路径
+        frame = frame.f_back
+    for _ in range(skip_stack_level_for_cache):
+        frame = frame.f_back
+    assert frame is not None, f'skip_stack_level_for_cache超出了调用堆栈层级：{skip_stack_level_for_cache}'
+
+    key = (frame.f_code, frame.f_lineno)
+    pic_cache_name = pic_cache_name_dict.get(key)
+    if pic_cache_name is None:
+        frame_info = inspect.getframeinfo(frame, context=1)
+        # py路径::def函数名::调用code
+        pic_cache_name_info = frame_info.filename + '::' + frame_info.function + '::' + ''.join(frame_info.code_context or [])
+        pic_cache_name = get_md5_of_str(pic_cache_name_info)
+        pic_cache_name_dict[key] = pic_cache_name
+    return pic_cache_name
+
+def refresh_pic_cache_for_text(pic_cache_index, subfolder, pic_cache_full_name, text, exist_res, priority_index=0):
+    '''
+    SDK内部接口，外部不要使用，用OCR命中时的截图帧（exist_res[2]）生成或刷新文字缓存图，并记录索引；用完后从exist_res中移除截图帧，整屏截图不随结果返回给调用方，结果也与exist_text一致
+    :param pic_cache_index: PicCacheIndex实例
+    :param subfolder: 缓存截图存放的子文件夹路径
+    :param pic_cache_full_name: 缓存截图全称（不含扩展名）
+    :param text: 目标文字
+    :param exist_res: 来自loop_exist_text(rm_screenshot=False)的接口结果
+    :param priority_index: 要缓存的命中区域下标
+    :return:
+    '''
+
+    frame = exist_res.pop(2)
+    exist_res.meta['source'] = 'ocr'
+    left_top_point, right_bottom_point = exist_res[1][priority_index][Position.LEFT_TOP.value], exist_res[1][priority_index][Position.RIGHT_BOTTOM.value]
+    create_pic_cache_for_text(base_pic_full_path=frame, left_top_point=left_top_point, right_bottom_point=right_bottom_point, pic_cache_full_path=pic_cache_index.pic_full_path(subfolder, pic_cache_full_name))
+    pic_cache_index.put(subfolder, pic_cache_full_name, text, (left_top_point[0], left_top_point[1], right_bottom_point[0], right_bottom_point[1]))
+
+# 竞速模式下后台OCR用的线程池，OCR推理本身是串行的，1个线程即可
+speculative_ocr_executor = None
+speculative_ocr_executor_lock = threading.Lock()
+# 最近一次提交的后台OCR，它跑完前不再提交新的后台OCR，避免卡住的OCR后面排起长队
+speculative_ocr_future = None
+
+def get_speculative_ocr_executor():
+    global speculative_ocr_executor
+    if speculative_ocr_executor is None:
+        with speculative_ocr_executor_lock:
+            if speculative_ocr_executor is None:
+                speculative_ocr_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='speculative_ocr')
+    return speculative_ocr_executor
+
+def submit_speculative_ocr(**kwargs):
+    '''
+    SDK内部接口，外部不要使用，在后台线程中提交一次竞速模式的exist_text；后台OCR无法中断，之前提交的（包括之前的竞速调用已放弃的）还没跑完时不提交
+    :param kwargs: exist_text的参数
+    :return: concurrent.futures.Future，之前的后台OCR还没跑完时为None
+    '''
+
+    global speculative_ocr_future
+    executor = get_speculative_ocr_executor()
+    with speculative_ocr_executor_lock:
+        if speculative_ocr_future is not None and not speculative_ocr_future.done():
+            return None
+        speculative_ocr_future = executor.submit(exist_text, **kwargs)
+        return speculative_ocr_future
+
+def race_pic_cache_and_text(text, pic_cache_name, pic_cache_index, equal_filter, timeout_for_text, after_for_text, threshold, sub_path, subfolder, before_for_pic, timeout_for_pic, interval_for_pic, after_for_pic, priority_index, filter_special_chars, filter_same, sort_rule, region, near_region):
+    '''
+    SDK内部接口，外部不要使用，loop_exist_text_by_pic_cache的竞速模式：每帧都匹配缓存图，缓存图超过宽限期仍未命中时，用同一帧在后台进行OCR，谁先命中用谁
+    总超时为max(timeout_for_pic, timeout_for_text)，其余参数同loop_exist_text_by_pic_cache
+    :param pic_cache_index: PicCacheIndex实例
+    :param near_region: 生成缓存图时的命中区域附近，为None时缓存图在region内匹配
+    :return: exist_res，同loop_exist_text_by_pic_cache
+    '''
+
+    pic_cache_full_name = template_pic_full_name(pic_cache_name)
+    grace = global_var.pic_cache_speculative_grace
+    def handle_ocr_res(ocr_res, ocr_frame):
+        if not ocr_res[0]:
+            return None
+        ocr_res.append(ocr_frame) # 与loop_exist_text(rm_screenshot=False)的结果保持一致，生成缓存图后会移除
+        pic_cache_index.record_miss(subfolder, pic_cache_full_name)
+        refresh_pic_cache_for_text(pic_cache_index, subfolder, pic_cache_full_name, text, ocr_res, priority_index)
+        time.sleep(after_for_text)
+        return ocr_res
+
+    time.sleep(before_for_pic)
+
+    ocr_future = None
+    ocr_frame = None
+    ocr_start_time = None
+    exist_res = None
+    wait = begin_wait(interval=interval_for_pic, timeout=max(timeout_for_pic, timeout_for_text))
+    try:
+        start_time = time.time()
+        while True:
+            frame = wait.frame()
+            exist_res = exist_pic(name=pic_cache_name, pic_full_path=frame, threshold=threshold, sub_path=sub_path, subfolder=subfolder, preview=False, priority_index=0, filter_same=filter_same, sort_rule=sort_rule, region=region if near_region is None else near_region, mode=MatchMode.SINGLE)
+            if exist_res[0]: # 缓存图先命中，后台进行中的OCR不再等待、结果直接丢弃
+                if ocr_future is not None:
+                    ocr_future.cancel() # 还未开始时可取消；已在运行的无法中断，跑完前submit_speculative_ocr不会再提交
+                    ocr_future = None
+                point = exist_res[1][0]
+                pic_cache_index.record_hit(subfolder, pic_cache_full_name, text=text, bbox=(point[Position.LEFT_TOP.value][0], point[Position.LEFT_TOP.value][1], point[Position.RIGHT_BOTTOM.value][0], point[Position.RIGHT_BOTTOM.value][1]))
+                exist_res.meta['source'] = 'pic_cache'
+                exist_res.meta['wait'] = wait.finish(True)
+                time.sleep(after_for_pic)
+                return exist_res
+
+            if ocr_future is not None and ocr_future.done():
+                ocr_res = handle_ocr_res(ocr_future.result(), ocr_frame)
+                if ocr_res is not None: # OCR先命中
+                    ocr_res.meta['wait'] = wait.finish(True)
+                    return ocr_res
+                ocr_future = None # OCR也没命中，下一帧重新开始
+
+            duration = time.time() - start_time
+            if ocr_future is None and duration >= grace: # 用当前帧开始下一次后台OCR，之前的后台OCR还没跑完时等到下一帧再试
+                ocr_future = submit_speculative_ocr(text=text, pic_full_path=frame, equal_filter=equal_filter, preview=False, filter_special_chars=filter_special_chars, region=region)
+                if ocr_future is not None:
+                    ocr_frame = frame
+                    ocr_start_time = time.time()
+
+            if duration > max(timeout_for_pic, timeout_for_text): # 已超时，等进行中的OCR出结果，但最多等到这次OCR用完timeout_for_text
+                if ocr_future is not None:
+                    try:
+                        ocr_res = handle_ocr_res(ocr_future.result(timeout=max(0, ocr_start_time + timeout_for_text - time.time())), ocr_frame)
+                    except FutureTimeoutError: # OCR卡住了（如工作进程无响应），不再等待、视为未命中；它仍占着后台线程，跑完前不会提交新的后台OCR
+                        ocr_future = None
+                        ocr_res = None
+                    if ocr_res is not None:
+                        ocr_res.meta['wait'] = wait.finish(True)
+                        return ocr_res
                 break
-    target_i = inspect_stack[index + skip_stack_level_for_cache]
-    # py路径::def函数名::调用code
-    pic_cache_name_info = target_i[1] + '::' + target_i[3] + '::' + ''.join(target_i[4])
-    return get_md5_of_str(pic_cache_name_info)
+            wait.sleep()
+
+        exist_res.meta['wait'] = wait.finish(False)
+    finally:
+        wait.finish(False) # 异常退出时也要结束本次等待，已结束的等待不会重复计入统计
+
+    if pic_cache_index.record_miss(subfolder, pic_cache_full_name) >= global_var.pic_cache_max_consecutive_misses: # 连续未命中N次，则删除文字缓存图
+        pic_cache_index.remove(subfolder, pic_cache_full_name)
+    return exist_res
 
-def loop_exist_text_by_pic_cache(text, pic_cache_name=None, equal_filter=False, before_for_text=None, timeout_for_text=None, interval_for_text=None, after_for_text=None, threshold=None, sub_path=None, subfolder='default', before_for_pic=None, timeout_for_pic=None, interval_for_pic=None, after_for_pic=None, priority_index=0, skip_stack_level_for_cache=0, filter_special_chars=False, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE):
+def loop_exist_text_by_pic_cache(text, pic_cache_name=None, equal_filter=False, before_for_text=None, timeout_for_text=None, interval_for_text=None, after_for_text=None, threshold=None, sub_path=None, subfolder='default', before_for_pic=None, timeout_for_pic=None, interval_for_pic=None, after_for_pic=None, priority_index=0, skip_stack_level_for_cache=0, filter_special_chars=False, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE, region=None, speculative=None):
     '''
-    缓存式轮询OCR识别一张图片中目标文字命中的所有区域。有图片缓存则走loop_exist_pic，没图片缓存则走loop_exist_text且在目标文字命中区域后对第下标为priority_index的命中区域进行截图缓存
+    缓存式轮询OCR识别一张图片中目标文字命中的所有区域。有图片缓存则走loop_exist_pic，没图片缓存则走loop_exist_text且在目标文字命中区域后对第下标为priority_index的命中区域进行截图缓存。缓存图的目标文字、命中区域及命中统计记录在{sub_path}/pic_cache_index.sqlite3中，有索引时优先只在原命中区域附近匹配缓存图，连续未命中global_var.pic_cache_max_consecutive_misses次后删除缓存图
     :param text: 目标文字
     :param pic_cache_name: 缓存截图简称，与目标文字建立映射关系。缓存截图全称 = 缓存截图简称_system()_屏幕截图分辨率宽x屏幕截图分辨率高，缓存截图全称 形如 {pic_cache_name}_mac_2880x1800，扩展类型固定为 .png，这里ocr缓存映射的pic_cache_name默认值为'py路径::def函数名::调用code'的md5值，来自接口create_default_pic_cache_name_from_inspect_stack()的结果
     :param equal_filter: 是否过滤出与目标文字完全相等的命中区域。比如当OCR识别出的ocr_text集合为['12abc34','2abc3','abc34']，目标文字text为'2abc3': 当equal_filter为False时，可以命中['12abc34','2abc3']；当equal_filter为True时，只能命中['2abc3']
@@ -871,11 +2388,15 @@ def loop_exist_text_by_pic_cache(text, pic_cache_name=None, equal_filter=False,
     :param filter_special_chars: 是否干掉 除了 "字母（大小写）、数字（阿拉伯）、汉字" 之外 的字符
     :param filter_same: OpenCV多目标匹配时，filter_same为True可过滤掉重复命中区域
     :param sort_rule: OpenCV多目标匹配时，命中区的排序规则
-    :return: exist_res，走图片缓存时来自exist_pic的接口结果，不走图片缓存时来自exist_text的接口结果
+    :param region: 搜索区域，默认为None表示全屏搜索，同时作用于缓存图匹配与OCR，详见exist_pic接口的region参数
+    :param speculative: 是否走竞速模式，默认为global_var.pic_cache_speculative。为True时有缓存图则每帧都匹配缓存图，同时在global_var.pic_cache_speculative_grace秒后用同一帧在后台进行OCR，谁先命中用谁，OCR先命中时直接用该帧刷新缓存图；缓存图失效时无需再白等timeout_for_pic
+    :return: exist_res，缓存图命中时来自exist_pic的接口结果，meta['source']为'pic_cache'；OCR命中时来自exist_text的接口结果，meta['source']为'ocr'
     '''
 
     if pic_cache_name is None:
         pic_cache_name = create_default_pic_cache_name_from_inspect_stack(skip_stack_level_for_cache=skip_stack_level_for_cache)
+    if speculative is None:
+        speculative = global_var.pic_cache_speculative
 
     if before_for_text is None:
         before_for_text = global_var.loop_exist_text_before
@@ -900,25 +2421,41 @@ def loop_exist_text_by_pic_cache(text, pic_cache_name=None, equal_filter=False,
         after_for_pic = global_var.loop_exist_pic_after
 
     # 拼接缓存图完整路径
-    pic_cache_full_path = os.path.join(sub_path, subfolder, template_pic_full_name(pic_cache_name) + '.png')
+    pic_cache_index = get_pic_cache_index(sub_path)
+    pic_cache_full_name = template_pic_full_name(pic_cache_name)
+    pic_cache_full_path = os.path.join(sub_path, subfolder, pic_cache_full_name + '.png')
     if os.path.exists(pic_cache_full_path): # 有缓存
+        # 有索引时优先只在生成缓存图时的命中区域附近搜索
+        near_region = None
+        pic_cache_info = pic_cache_index.get(subfolder, pic_cache_full_name)
+        if pic_cache_info is not None and pic_cache_info['bbox'] is not None and not isinstance(region, dict):
+            margin = global_var.pic_cache_neighbourhood_margin
+            left, top, right, bottom = pic_cache_info['bbox']
+            near_region = (left - margin, top - margin, right + margin, bottom + margin)
+            if region is not None:
+                near_region = (max(near_region[0], region[0]), max(near_region[1], region[1]), min(near_region[2], region[2]), min(near_region[3], region[3]))
+        if speculative: # 竞速模式，缓存图匹配与OCR谁先命中用谁
+            return race_pic_cache_and_text(text=text, pic_cache_name=pic_cache_name, pic_cache_index=pic_cache_index, equal_filter=equal_filter, timeout_for_text=timeout_for_text, after_for_text=after_for_text, threshold=threshold, sub_path=sub_path, subfolder=subfolder, before_for_pic=before_for_pic, timeout_for_pic=timeout_for_pic, interval_for_pic=interval_for_pic, after_for_pic=after_for_pic, priority_index=priority_index, filter_special_chars=filter_special_chars, filter_same=filter_same, sort_rule=sort_rule, region=region, near_region=near_region)
         # 走缓存为的就是快，所以要priority_index写死为0，走图像的高性能单目标匹配
-        exist_res = loop_exist_pic(name=pic_cache_name, threshold=threshold, sub_path=sub_path, subfolder=subfolder, before=before_for_pic, timeout=timeout_for_pic, interval=interval_for_pic, after=after_for_pic, priority_index=0, filter_same=filter_same, sort_rule=sort_rule)
+        exist_res = loop_exist_pic(name=pic_cache_name, threshold=threshold, sub_path=sub_path, subfolder=subfolder, before=before_for_pic, timeout=timeout_for_pic, interval=interval_for_pic, after=after_for_pic, priority_index=0, filter_same=filter_same, sort_rule=sort_rule, region=region if near_region is None else near_region, mode=MatchMode.SINGLE)
+        if not exist_res[0] and near_region is not None: # 原命中区域附近没有，再在整个搜索区域确认1次元素是否换了位置
+            exist_res = exist_pic(name=pic_cache_name, pic_full_path=screenshot_frame(), threshold=threshold, sub_path=sub_path, subfolder=subfolder, preview=False, priority_index=0, filter_same=filter_same, sort_rule=sort_rule, region=region, mode=MatchMode.SINGLE)
         if exist_res[0]:
+            point = exist_res[1][0]
+            pic_cache_index.record_hit(subfolder, pic_cache_full_name, text=text, bbox=(point[Position.LEFT_TOP.value][0], point[Position.LEFT_TOP.value][1], point[Position.RIGHT_BOTTOM.value][0], point[Position.RIGHT_BOTTOM.value][1]))
+            exist_res.meta['source'] = 'pic_cache'
             return exist_res
-        else: # 如果文字缓存图匹配不到元素，则删除文字缓存图
-            os.remove(pic_cache_full_path)
+        elif pic_cache_index.record_miss(subfolder, pic_cache_full_name) >= global_var.pic_cache_max_consecutive_misses: # 连续未命中N次，则删除文字缓存图
+            pic_cache_index.remove(subfolder, pic_cache_full_name)
 
     # 没文字缓存图 或 有缓存但没匹配到则进行OCR重试
-    exist_res = loop_exist_text(text=text, equal_filter=equal_filter, before=before_for_text, timeout=timeout_for_text, interval=interval_for_text, after=after_for_text, rm_screenshot=False, filter_special_chars=filter_special_chars)
+    exist_res = loop_exist_text(text=text, equal_filter=equal_filter, before=before_for_text, timeout=timeout_for_text, interval=interval_for_text, after=after_for_text, rm_screenshot=False, filter_special_chars=filter_special_chars, region=region, stop_at_first=priority_index == 0)
     if exist_res[0]: # 匹配到了
-        # 生成文字缓存图（对应priority_index）
-        create_pic_cache_for_text(base_pic_full_path=exist_res[2], left_top_point=exist_res[1][priority_index][1], right_bottom_point=exist_res[1][priority_index][5], pic_cache_full_path=pic_cache_full_path)
-        # 删除残留截图
-        os.remove(exist_res[2])
+        # 生成文字缓存图（对应priority_index），并记录索引
+        refresh_pic_cache_for_text(pic_cache_index, subfolder, pic_cache_full_name, text, exist_res, priority_index)
     return exist_res
 
-def loop_act_pic(name, threshold=None, sub_path=None, subfolder='', before=None, timeout=None, interval=None, after=None, act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE):
+def loop_act_pic(name, threshold=None, sub_path=None, subfolder='', before=None, timeout=None, interval=None, after=None, act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE, region=None, mode=None, max_results=None, pyramid_level=None, scale_range=None, gray=None, match_scale=None, verify=None):
     '''
     在loop_exist_pic接口轮询结果的基础上，增加act_point进行交互，内部会断言存在命中区域
     :param name: 模板截图简称。模板截图全称 = 模板截图简称_system()_屏幕截图分辨率宽x屏幕截图分辨率高，模板截图全称 形如 {name}_mac_2880x1800，支持3种扩展类型（.png, .jpg, .jpeg）、选其一即可
@@ -934,6 +2471,14 @@ def loop_act_pic(name, threshold=None, sub_path=None, subfolder='', before=None,
     :param act_mode: 与命中区域进行交互的交互模式，默认为左单击，其他交互模式详见ActMode枚举
     :param filter_same: OpenCV多目标匹配时，filter_same为True可过滤掉重复命中区域
     :param sort_rule: OpenCV多目标匹配时，命中区的排序规则
+    :param region: 搜索区域，默认为None表示全屏搜索，可传矩形(left, top, right, bottom)或锚点dict，详见exist_pic接口的region参数
+    :param mode: 模板匹配策略，默认为None，详见exist_pic接口的mode参数及MatchMode枚举
+    :param max_results: 最多返回的命中区域个数，默认为None不限制
+    :param pyramid_level: 金字塔粗匹配的层数，默认为global_var.pyramid_level，详见exist_pic接口的pyramid_level参数
+    :param scale_range: 模板截图的缩放倍数范围，默认为global_var.template_scale_range，详见exist_pic接口的scale_range参数
+    :param gray: 是否在灰度图上匹配，默认为None取模板截图的匹配精度提示，同exist_pic
+    :param match_scale: 匹配时截图与模板截图的缩小倍数，同exist_pic
+    :param verify: 降精度匹配时是否在全精度截图上对候选点重新打分，同exist_pic
     :return: [exist_res, act_res]，其中exist_res来自exist_pic的接口结果，act_res来自act_point的接口结果
     '''
 
@@ -950,12 +2495,12 @@ def loop_act_pic(name, threshold=None, sub_path=None, subfolder='', before=None,
     if after is None:
         after = global_var.loop_exist_pic_after
 
-    exist_res = loop_exist_pic(name=name, threshold=threshold, sub_path=sub_path, subfolder=subfolder, before=before, timeout=timeout, interval=interval, after=after, priority_index=priority_index, filter_same=filter_same, sort_rule=sort_rule)
+    exist_res = loop_exist_pic(name=name, threshold=threshold, sub_path=sub_path, subfolder=subfolder, before=before, timeout=timeout, interval=interval, after=after, priority_index=priority_index, filter_same=filter_same, sort_rule=sort_rule, region=region, mode=mode, max_results=max_results, pyramid_level=pyramid_level, scale_range=scale_range, gray=gray, match_scale=match_scale, verify=verify)
     assert exist_res[0], '轮询OpenCV识别不到目标区域, name='+name+', threshold='+str(threshold)+', sub_path='+sub_path+', subfolder='+subfolder+', before='+str(before)+', timeout='+str(timeout)+', interval='+str(interval)+', after='+str(after)
     act_res = act_point(exist_res=exist_res, act_position=act_position, priority_index=priority_index, act_mode=act_mode)
     return [exist_res, act_res]
 
-def loop_act_text(text, equal_filter=False, before=None, timeout=None, interval=None, after=None, act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK, filter_special_chars=False):
+def loop_act_text(text, equal_filter=False, before=None, timeout=None, interval=None, after=None, act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK, filter_special_chars=False, region=None, staged=None, use_angle_cls=None):
     '''
     在loop_exist_text接口轮询结果的基础上，增加act_point进行交互，内部会断言存在命中区域
     :param text: 目标文字
@@ -968,6 +2513,9 @@ def loop_act_text(text, equal_filter=False, before=None, timeout=None, interval=
     :param priority_index: 在命中区域集合中选择要交互的那个命中区域下标，默认为0、表示默认交互第1个命中区域
     :param act_mode: 与命中区域进行交互的交互模式，默认为左单击，其他交互模式详见ActMode枚举
     :param filter_special_chars: 是否干掉 除了 "字母（大小写）、数字（阿拉伯）、汉字" 之外 的字符
+    :param region: 搜索区域，默认为None表示全屏搜索，可传矩形(left, top, right, bottom)或锚点dict，详见exist_pic接口的region参数
+    :param staged: 是否走分阶段OCR，默认为global_var.ocr_staged，详见exist_text接口的staged参数
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
     :return: [exist_res, act_res]，其中exist_res来自exist_text的接口结果，act_res来自act_point的接口结果
     '''
 
@@ -980,12 +2528,31 @@ def loop_act_text(text, equal_filter=False, before=None, timeout=None, interval=
     if after is None:
         after = global_var.loop_exist_text_after
 
-    exist_res = loop_exist_text(text=text, equal_filter=equal_filter, before=before, timeout=timeout, interval=interval, after=after, rm_screenshot=True, filter_special_chars=filter_special_chars)
+    exist_res = loop_exist_text(text=text, equal_filter=equal_filter, before=before, timeout=timeout, interval=interval, after=after, rm_screenshot=True, filter_special_chars=filter_special_chars, region=region, staged=staged, use_angle_cls=use_angle_cls, stop_at_first=priority_index == 0)
     assert exist_res[0], '轮询OCR识别不到目标文字, text='+text+', equal_filter='+str(equal_filter)+', before='+str(before)+', timeout='+str(timeout)+', interval='+str(interval)+', after='+str(after)+', rm_screenshot=True'
     act_res = act_point(exist_res=exist_res, act_position=act_position, priority_index=priority_index, act_mode=act_mode)
     return [exist_res, act_res]
 
-def loop_act_text_by_pic_cache(text, pic_cache_name=None, equal_filter=False, before_for_text=None, timeout_for_text=None, interval_for_text=None, after_for_text=None, threshold=None, sub_path=None, subfolder='default', before_for_pic=None, timeout_for_pic=None, interval_for_pic=None, after_for_pic=None, act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK, skip_stack_level_for_cache=0, filter_special_chars=False, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE):
+def loop_act_text_list(text_config_list: List[Dict], timeout=None, interval=None, use_angle_cls=None):
+    '''
+    在loop_exist_text_list接口轮询结果的基础上，对命中的目标文字增加act_point进行交互，内部会断言存在命中区域
+    :param text_config_list: 目标文字组，每个目标文字为一个dict，其中text必传，可选equal_filter/filter_special_chars/region/regex/act_position/priority_index/act_mode
+    :param timeout: 超时上限，默认为global_var.loop_exist_text_timeout
+    :param interval: 未命中时的轮询间隔秒数，默认为global_var.loop_exist_text_interval
+    :param use_angle_cls: 是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
+    :return: {'index': index, 'exist_res': exist_res, 'act_res': act_res}，act_res来自act_point的接口结果
+    '''
+
+    res = loop_exist_text_list(text_config_list, timeout=timeout, interval=interval, use_angle_cls=use_angle_cls)
+    assert res['index'] != -1, '轮询OCR识别不到任一目标文字, texts='+str([text_config['text'] for text_config in text_config_list])+', timeout='+str(timeout)
+    text_config = text_config_list[res['index']]
+    act_position = text_config['act_position'] if 'act_position' in text_config else Position.CENTER
+    priority_index = text_config['priority_index'] if 'priority_index' in text_config else 0
+    act_mode = text_config['act_mode'] if 'act_mode' in text_config else ActMode.LEFT_CLICK
+    act_res = act_point(exist_res=res['exist_res'], act_position=act_position, priority_index=priority_index, act_mode=act_mode)
+    return {'index': res['index'], 'exist_res': res['exist_res'], 'act_res': act_res}
+
+def loop_act_text_by_pic_cache(text, pic_cache_name=None, equal_filter=False, before_for_text=None, timeout_for_text=None, interval_for_text=None, after_for_text=None, threshold=None, sub_path=None, subfolder='default', before_for_pic=None, timeout_for_pic=None, interval_for_pic=None, after_for_pic=None, act_position=Position.CENTER, priority_index=0, act_mode=ActMode.LEFT_CLICK, skip_stack_level_for_cache=0, filter_special_chars=False, filter_same=False, sort_rule=SortRule.THRESHOLD_REVERSE, region=None, speculative=None):
     '''
     先使用loop_exist_text_by_pic_cache接口进行元素轮询，如果有命中区域、则使用act_point接口进行交互；如果没有命中区域且刚才没走缓存、则直接抛找不到目标文字的异常；如果没有命中区域且刚才走了缓存、则会不走缓存再重试且干掉缓存图
     :param text: 目标文字
@@ -1009,11 +2576,15 @@ def loop_act_text_by_pic_cache(text, pic_cache_name=None, equal_filter=False, be
     :param filter_special_chars: 是否干掉 除了 "字母（大小写）、数字（阿拉伯）、汉字" 之外 的字符
     :param filter_same: OpenCV多目标匹配时，filter_same为True可过滤掉重复命中区域
     :param sort_rule: OpenCV多目标匹配时，命中区的排序规则
+    :param region: 搜索区域，默认为None表示全屏搜索，同时作用于缓存图匹配与OCR，详见exist_pic接口的region参数
+    :param speculative: 是否走竞速模式，默认为global_var.pic_cache_speculative。为True时有缓存图则每帧都匹配缓存图，同时在global_var.pic_cache_speculative_grace秒后用同一帧在后台进行OCR，谁先命中用谁，OCR先命中时直接用该帧刷新缓存图；缓存图失效时无需再白等timeout_for_pic
     :return: [exist_res, act_res]. 其中exist_res走图片缓存时来自exist_pic的接口结果，不走图片缓存时来自exist_text的接口结果；act_res来自act_point的接口结果
     '''
 
     if pic_cache_name is None:
         pic_cache_name = create_default_pic_cache_name_from_inspect_stack(skip_stack_level_for_cache=skip_stack_level_for_cache)
+    if speculative is None:
+        speculative = global_var.pic_cache_speculative
 
     if before_for_text is None:
         before_for_text = global_var.loop_exist_text_before
@@ -1037,9 +2608,9 @@ def loop_act_text_by_pic_cache(text, pic_cache_name=None, equal_filter=False, be
     if after_for_pic is None:
         after_for_pic = global_var.loop_exist_pic_after
 
-    exist_res = loop_exist_text_by_pic_cache(text=text, pic_cache_name=pic_cache_name, equal_filter=equal_filter, before_for_text=before_for_text, timeout_for_text=timeout_for_text, interval_for_text=interval_for_text, after_for_text=after_for_text, threshold=threshold, sub_path=sub_path, subfolder=subfolder, before_for_pic=before_for_pic, timeout_for_pic=timeout_for_pic, interval_for_pic=interval_for_pic, after_for_pic=after_for_pic, priority_index=priority_index, filter_special_chars=filter_special_chars, filter_same=filter_same, sort_rule=sort_rule)
+    exist_res = loop_exist_text_by_pic_cache(text=text, pic_cache_name=pic_cache_name, equal_filter=equal_filter, before_for_text=before_for_text, timeout_for_text=timeout_for_text, interval_for_text=interval_for_text, after_for_text=after_for_text, threshold=threshold, sub_path=sub_path, subfolder=subfolder, before_for_pic=before_for_pic, timeout_for_pic=timeout_for_pic, interval_for_pic=interval_for_pic, after_for_pic=after_for_pic, priority_index=priority_index, filter_special_chars=filter_special_chars, filter_same=filter_same, sort_rule=sort_rule, region=region, speculative=speculative)
     assert exist_res[0], '缓存式轮询OCR识别不到目标文字, text='+text+', pic_cache_name='+pic_cache_name+', equal_filter='+str(equal_filter)+', before_for_text='+str(before_for_text)+', timeout_for_text='+str(timeout_for_text)+', interval_for_text='+str(interval_for_text)+', after_for_text='+str(after_for_text)+', threshold='+str(threshold)+', sub_path='+sub_path+', subfolder='+subfolder+', before_for_pic='+str(before_for_pic)+', timeout_for_pic='+str(timeout_for_pic)+', interval_for_pic='+str(interval_for_pic)+', after_for_pic='+str(after_for_pic)
-    if len(exist_res) == 2: # 刚才走的是缓存图，则只有一个高性能的命中区，避免越界
+    if exist_res.meta.get('source') == 'pic_cache': # 刚才走的是缓存图，则只有一个高性能的命中区，避免越界
         priority_index = 0
     act_res = act_point(exist_res=exist_res, act_position=act_position, priority_index=priority_index, act_mode=act_mode)
     return [exist_res, act_res]
@@ -1047,7 +2618,7 @@ def loop_act_text_by_pic_cache(text, pic_cache_name=None, equal_filter=False, be
 def loop_clear_alert(pic_config_list: List[Dict], timeout=None, repeat=None):
     '''
     多素材交替式轮询消除弹窗（以类似埋点的思路进行精准消窗）。
-    :param pic_config_list: 需要采集在特定操作路径上出现过的特定弹窗素材组。允许弹窗素材只取自一种系统，即框架会自动检测是否存在与当前测试机匹配的"系统_分辨率"素材，如果没有则跳过（比如你只采集了win的弹窗素材，但对应的mac并不会有这种弹窗；或者你还未触发出mac的弹窗、导致你目前只能采集到win的弹窗）。
+    :param pic_config_list: 需要采集在特定操作路径上出现过的特定弹窗素材组，每个素材为一个dict，其中name必传，可选threshold/sub_path/subfolder/act_position/priority_index/act_mode/filter_same/sort_rule/region/mode/max_results/pyramid_level/scale_range/gray/match_scale/verify。允许弹窗素材只取自一种系统，即框架会自动检测是否存在与当前测试机匹配的"系统_分辨率"素材，如果没有则跳过（比如你只采集了win的弹窗素材，但对应的mac并不会有这种弹窗；或者你还未触发出mac的弹窗、导致你目前只能采集到win的弹窗）。
     :param timeout: 用户可透传进来的最大超时，默认为10（单位 秒）；需要注意的是，无论这里的timeout是多少，框架都会确保对pic_config_list里的弹窗素材至少轮询2次。
     :param repeat: 表示最多需要连续点击消除几个弹窗，默认为1（单位 个）。解释：比如你可能会遇到点完一个弹窗后，立马又会出现第二个弹窗需要你进行连续点击消除；或者界面上会同时出现两个弹窗需要你进行连续两次点击才能消完。当遇到这些情况时，repeat就传2，如果数量更多就以此类推传3/4/…
     :return:
@@ -1075,23 +2646,11 @@ def loop_clear_alert(pic_config_list: List[Dict], timeout=None, repeat=None):
         sub_path = pic_config['sub_path'] if 'sub_path' in pic_config else None
         subfolder = pic_config['subfolder'] if 'subfolder' in pic_config else ''
 
-        # 拼接素材图完整路径
-        template_pic_full_path = ''
-        if sub_path is None:
-            sub_path = os.path.join(global_var.root_path, 'template_pic')
-        os.makedirs(sub_path, exist_ok=True)
-        template_pic_full_path = sub_path
-        if len(subfolder) > 0:
-            subfolder_path = os.path.join(sub_path, subfolder)
-            os.makedirs(subfolder_path, exist_ok=True)
-            template_pic_full_path = subfolder_path
-        exist_name = False # 标记是否存在与当前测试机匹配的"系统_分辨率"素材
-        for suffix in ['.png', '.jpg', '.jpeg']:
-            temp_path = os.path.join(template_pic_full_path, template_pic_full_name(name) + suffix)
-            if os.path.exists(temp_path):
-                exist_name = True
-                template_pic_full_path = temp_path
-                break
+        # 查找素材图（与exist_pic共用模板截图缓存）
+        template_pic_full_path, template_img = load_template_pic(name, sub_path=sub_path, subfolder=subfolder)
+        if template_img is None and global_var.template_scale_fallback: # 允许缩放使用同系统下其他分辨率的素材
+            template_pic_full_path, template_img, template_resolution = load_nearest_template_pic(name, sub_path=sub_path, subfolder=subfolder)
+        exist_name = template_img is not None # 标记是否存在与当前测试机匹配的"系统_分辨率"素材
         if exist_name:
             exist_pic_config_list.append(pic_config)
 
@@ -1103,29 +2662,32 @@ def loop_clear_alert(pic_config_list: List[Dict], timeout=None, repeat=None):
     def inner_loop_clear_alert(exist_pic_config_list, timeout):
         start_time = time.time() # 开始轮询的时间
         inner_loop_count = 0 # 内循环次数（即完整的遍历一次素材组的次数，兜底2次）
-        while True: # 开始轮询
-            pic_full_path = screenshot()
-
-            for i, pic_config in enumerate(exist_pic_config_list):
-                name = pic_config['name']
-                threshold = pic_config['threshold'] if 'threshold' in pic_config else None
-                sub_path = pic_config['sub_path'] if 'sub_path' in pic_config else None
-                subfolder = pic_config['subfolder'] if 'subfolder' in pic_config else ''
-                act_position = pic_config['act_position'] if 'act_position' in pic_config else Position.CENTER
-                priority_index = pic_config['priority_index'] if 'priority_index' in pic_config else 0
-                act_mode = pic_config['act_mode'] if 'act_mode' in pic_config else ActMode.LEFT_CLICK
-                filter_same = pic_config['filter_same'] if 'filter_same' in pic_config else False
-                sort_rule = pic_config['sort_rule'] if 'sort_rule' in pic_config else SortRule.THRESHOLD_REVERSE
-                exist_res = exist_pic(name=name, pic_full_path=pic_full_path, threshold=threshold, sub_path=sub_path, subfolder=subfolder, preview=False, priority_index=priority_index, filter_same=filter_same, sort_rule=sort_rule)
-                if exist_res[0]:
-                    os.remove(pic_full_path)
-                    return act_point(exist_res=exist_res, act_position=act_position, priority_index=priority_index, act_mode=act_mode)
-
-            inner_loop_count += 1
-            os.remove(pic_full_path)
-            duration = time.time() - start_time
-            if duration > timeout and inner_loop_count >= 2:
-                return None
+        gate = create_frame_change_gate()
+        wait = begin_wait(timeout=timeout)
+        try:
+            res_list = None
+            while True: # 开始轮询
+                frame = wait.frame()
+
+                # 所有弹窗素材共享同一截图帧批量匹配，点击第一个命中的弹窗
+                res_list = gated_exist_pic_list(gate, exist_pic_config_list, frame, res_list)
+                for i, exist_res in enumerate(res_list):
+                    if exist_res is not None and exist_res[0]:
+                        pic_config = exist_pic_config_list[i]
+                        act_position = pic_config['act_position'] if 'act_position' in pic_config else Position.CENTER
+                        priority_index = pic_config['priority_index'] if 'priority_index' in pic_config else 0
+                        act_mode = pic_config['act_mode'] if 'act_mode' in pic_config else ActMode.LEFT_CLICK
+                        wait.finish(True)
+                        return act_point(exist_res=exist_res, act_position=act_position, priority_index=priority_index, act_mode=act_mode)
+
+                inner_loop_count += 1
+                duration = time.time() - start_time
+                if duration > timeout and inner_loop_count >= 2:
+                    wait.finish(False)
+                    return None
+                wait.sleep()
+        finally:
+            wait.finish(False) # 异常退出时也要结束本次等待，已结束的等待不会重复计入统计
 
     find_alert = False # 只记录是否找到过弹窗
     # 连续消除可能存在的repeat个弹窗
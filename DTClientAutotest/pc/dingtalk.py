@@ -9,7 +9,7 @@ def launch_dingtalk(beta=False, open_cef_port=True):
     '''
     启动标准钉进程
     :param beta: beta仅对win生效，表示是否启动beta版的标准钉，默认为False、启动非beta版的标准钉
-    :param open_cef_port: 是否开启CEF(Chromium Embedded Framework)远程调试端口，默认开启；开启后可以对CEF pages进行web自动化测试，mac只支持x86架构的钉钉包
+    :param open_cef_port: 是否开启CEF(Chromium Embedded Framework)远程调试端口，默认开启；开启后可以对CEF pages进行web自动化测试、或经由loop_exist_cdp等接口直接从DOM中定位元素（替代OCR），mac只支持x86架构的钉钉包
     :return:
     '''
 
@@ -0,0 +1,176 @@
+import os
+import uuid
+import socket
+import platform
+import threading
+from .. import global_var
+from .capture import get_capture_backend
+
+class HostProfile():
+    '''
+    PC设备的环境信息（系统、芯片架构、uuid、像素比例、截图分辨率、本机ip），每项在第一次用到时才探测、之后进程内复用，
+    system()/get_uuid()/get_scale()/get_screenshot_resolution()等接口都从这里取值；切换显示器或修改分辨率后可调用refresh()重新探测
+    '''
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.facts = {} # 已探测的环境信息
+        self.resolution_backend = None # 探测分辨率时所用的截图后端，截图后端切换后需要重新探测
+
+    def get(self, name, probe):
+        value = self.facts.get(name)
+        if value is None:
+            with self.lock:
+                value = self.facts.get(name)
+                if value is None:
+                    value = probe()
+                    self.facts[name] = value
+        return value
+
+    def refresh(self, *names):
+        '''
+        清除已探测的环境信息，下次用到时重新探测
+        :param names: 要清除的环境信息名称（'platform' / 'uuid' / 'resolution' / 'local_ip'），不传表示全部清除
+        :return:
+        '''
+
+        with self.lock:
+            if len(names) == 0:
+                self.facts.clear()
+            for name in names:
+                self.facts.pop(name, None)
+
+    @property
+    def platform(self):
+        '''
+        :return: 小写的platform.platform()
+        '''
+
+        return self.get('platform', lambda: platform.platform().lower())
+
+    @property
+    def system(self):
+        '''
+        :return: win / mac / linux
+        '''
+
+        system = self.platform
+        if 'win' in system:
+            return 'win'
+        elif 'mac' in system:
+            return 'mac'
+        elif 'linux' in system: # 主要用于无显示器的CI环境（配合回放截图后端）
+            return 'linux'
+        assert 0, '新系统'
+
+    @property
+    def architecture(self):
+        '''
+        :return: mac芯片指令集架构 arm64 / x86
+        '''
+
+        system = self.platform
+        if 'mac' in system:
+            if 'arm64' in system:
+                return 'arm64'
+            elif 'x86' in system:
+                return 'x86'
+        assert False, 'architecture()只适用于mac'
+
+    @property
+    def uuid(self):
+        '''
+        :return: PC设备的唯一标识uuid，由框架生成，存储在用户根目录(~)下，名称为pc_uuid.txt
+        '''
+
+        return self.get('uuid', self.probe_uuid)
+
+    def probe_uuid(self):
+        user_root_path = os.path.expanduser('~')
+        pc_uuid_path = os.path.join(user_root_path, 'pc_uuid.txt')
+        if os.path.exists(pc_uuid_path):
+            with open(pc_uuid_path, 'r', encoding='utf-8') as file:
+                pc_uuid_str = file.read()
+        else:
+            pc_uuid_str = str(uuid.uuid4())
+            with open(pc_uuid_path, 'w', encoding='utf-8') as file:
+                file.write(pc_uuid_str)
+        return pc_uuid_str
+
+    @property
+    def scale(self):
+        '''
+        :return: 分辨率尺寸与绝对尺寸的换算比例，默认win为1、mac为2，特殊设备见global_var.uuid_resolution_scale_dict（每次都会重新查字典，运行时修改立即生效）
+        '''
+
+        pc_uuid = self.uuid
+        if pc_uuid in global_var.uuid_resolution_scale_dict: # 特殊设备
+            return global_var.uuid_resolution_scale_dict[pc_uuid]
+        return 2.0 if self.system == 'mac' else 1.0
+
+    @property
+    def resolution(self):
+        '''
+        :return: 屏幕截图的分辨率，形如 (2880, 1800)，由截图后端查询，无需截图落盘
+        '''
+
+        backend = get_capture_backend()
+        if self.resolution_backend is not backend: # 截图后端切换了
+            with self.lock:
+                self.facts.pop('resolution', None)
+                self.resolution_backend = backend
+        return self.get('resolution', lambda: tuple(backend.resolution()))
+
+    @property
+    def local_ip(self):
+        '''
+        :return: 本机ip
+        '''
+
+        return self.get('local_ip', self.probe_local_ip)
+
+    def probe_local_ip(self):
+        s = None
+        try:
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.connect(('8.8.8.8', 80))
+            ip = s.getsockname()[0]
+        except:
+            ip = '127.0.0.1'
+        finally:
+            if s is not None:
+                s.close()
+        return ip
+
+    def as_dict(self):
+        '''
+        :return: 所有环境信息，用于打印到测试报告中
+        '''
+
+        return {
+            'system': self.system,
+            'architecture': self.architecture if self.system == 'mac' else platform.machine(),
+            'uuid': self.uuid,
+            'scale': self.scale,
+            'resolution': self.resolution,
+            'local_ip': self.local_ip
+        }
+
+host_profile = HostProfile()
+
+def get_host_profile():
+    '''
+    获取当前PC设备的环境信息
+    :return: HostProfile实例，进程内唯一
+    '''
+
+    return host_profile
+
+def refresh_host_profile(*names):
+    '''
+    重新探测PC设备的环境信息，比如切换了显示器或修改了分辨率之后
+    :param names: 要重新探测的环境信息名称（'platform' / 'uuid' / 'resolution' / 'local_ip'），不传表示全部
+    :return:
+    '''
+
+    host_profile.refresh(*names)
@@ -0,0 +1,58 @@
+import importlib
+import threading
+
+class LazyModule():
+    '''
+    SDK内部接口，外部不要使用。延迟导入的模块代理，第一次访问其属性时才真正import
+
+    cv2/numpy等重量级依赖都经由LazyModule导入，使import DTClientAutotest.pc只加载框架自身的代码，
+    只用模板匹配的脚本不会加载paddle，只打印uuid的脚本连OpenCV也不会加载
+    '''
+
+    def __init__(self, name):
+        '''
+        :param name: 模块名，如'cv2'、'numpy'
+        '''
+
+        self.__dict__['name'] = name
+        self.__dict__['module'] = None
+        self.__dict__['lock'] = threading.Lock()
+
+    def load(self):
+        '''
+        :return: 真正的模块，第一次调用时才import
+        '''
+
+        module = self.__dict__['module']
+        if module is None:
+            with self.__dict__['lock']:
+                module = self.__dict__['module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['name'])
+                    self.__dict__['module'] = module
+        return module
+
+    @property
+    def loaded(self):
+        '''
+        :return: 是否已经真正import过
+        '''
+
+        return self.__dict__['module'] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.load(), attr, value)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self):
+        if self.loaded:
+            return repr(self.__dict__['module'])
+        return f"<lazy module '{self.__dict__['name']}'>"
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
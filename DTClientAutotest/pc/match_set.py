@@ -0,0 +1,408 @@
+from .lazy_module import np
+
+class MatchPoint(list):
+    '''
+    命中区域的1个点位[x, y]，是普通的list，但改写x或y时会同步记录到所属MatchSet的改写点位中，
+    所以 exist_res[1][0][Position.CENTER.value][0] += 10 这类旧写法照旧生效，之后再访问该点位、点击该命中区域都会用改写后的坐标
+    '''
+
+    __slots__ = ('match_set', 'index', 'position')
+
+    def __init__(self, point=(), match_set=None, index=None, position=None):
+        super().__init__(point)
+        self.match_set = match_set
+        self.index = index
+        self.position = position
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if self.match_set is not None:
+            self.match_set.overrides[(self.index, self.position)] = [self[0], self[1]]
+
+class MatchHit():
+    '''
+    命中区域集合中的1个命中区域，是MatchSet的轻量视图，按需计算9个点位，兼容旧的10元素list格式：
+    hit[Position.CENTER.value] 为 [中心点X,中心点Y]，……，hit[9] 为OCR识别出的ocr_text 或 模板匹配的实际相似度
+    '''
+
+    __slots__ = ('match_set', 'index')
+
+    def __init__(self, match_set, index):
+        self.match_set = match_set
+        self.index = index
+
+    def __len__(self):
+        return 10
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[i] for i in range(10)[key]]
+        if key < 0:
+            key += 10
+        if key == 9:
+            return self.match_set.value(self.index)
+        if key < 0 or key > 9:
+            raise IndexError('MatchHit index out of range')
+        return self.match_set.point(self.index, key)
+
+    def __setitem__(self, key, value):
+        if key < 0:
+            key += 10
+        assert 0 <= key < 9, '只能改写命中区域的9个点位'
+        self.match_set.overrides[(self.index, key)] = [value[0], value[1]]
+
+    def __iter__(self):
+        for i in range(10):
+            yield self[i]
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, MatchHit)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def tolist(self):
+        '''
+        :return: 旧的10元素list格式 [[中心点X,中心点Y],[左上X,左上Y],……顺时针,ocr_text或实际相似度]，点位为与MatchSet脱钩的普通list
+        '''
+
+        return [list(self[i]) for i in range(9)] + [self[9]]
+
+    @property
+    def bbox(self):
+        '''
+        :return: 命中区域的外接矩形(left, top, right, bottom)
+        '''
+
+        return tuple(self.match_set.boxes[self.index].tolist())
+
+    @property
+    def score(self):
+        '''
+        :return: 模板匹配的实际相似度，OCR命中区域为None
+        '''
+
+        return None if self.match_set.scores is None else self.match_set.scores[self.index].item()
+
+    @property
+    def text(self):
+        '''
+        :return: OCR识别出的ocr_text，模板匹配命中区域为None
+        '''
+
+        return None if self.match_set.texts is None else self.match_set.texts[self.index]
+
+class MatchSet():
+    '''
+    exist_pic/exist_text的命中区域集合（即exist_res[1]），每个命中区域只在连续的NumPy数组中存外接矩形和相似度（或ocr_text），
+    Position的9个点位在被访问时才计算，避免密集多目标匹配时构造海量的小list。
+
+    兼容旧的list格式：len(exist_res[1])、exist_res[1][0][Position.CENTER.value]、for hit in exist_res[1] 等写法照旧可用；
+    需要真正的list时可调用tolist()。点位是按需计算出的MatchPoint，整体赋值 exist_res[1][0][Position.CENTER.value] = [x, y]
+    或原地改写 exist_res[1][0][Position.CENTER.value][0] += dx 都会记录到overrides中、对之后的访问生效。
+
+    也支持list的增删改及拼接：append/extend/insert/pop/remove/clear/reverse/sort/copy/index/count、exist_res[1][i] = 命中区域、del exist_res[1][i]、
+    exist_res[1] + 另一个命中区域集合（或list）、+=，命中区域可以是MatchHit，也可以是旧的10元素list。与list不兼容之处：
+    1. MatchSet不是list的子类，isinstance(exist_res[1], list)为False
+    2. json不能直接序列化MatchSet，json.dumps(exist_res)需改为 json.dumps([exist_res[0], exist_res[1].tolist()])
+    3. 命中区域是MatchSet的视图，原地增删后，之前取出的命中区域会随下标变化、指向新的命中区域；需要保留时先调用hit.tolist()
+    '''
+
+    __slots__ = ('boxes', 'scores', 'texts', 'overrides')
+
+    def __init__(self, boxes=None, scores=None, texts=None, overrides=None):
+        '''
+        :param boxes: 外接矩形数组，shape=(n, 4)，每行为(left, top, right, bottom)
+        :param scores: 模板匹配的实际相似度数组，shape=(n,)，OCR命中区域为None
+        :param texts: OCR识别出的ocr_text列表，模板匹配命中区域为None
+        :param overrides: 被改写过的点位，key为(命中区域下标, 点位下标)，value为[x, y]
+        '''
+
+        self.boxes = np.zeros((0, 4), dtype=np.int64) if boxes is None else boxes
+        self.scores = scores
+        self.texts = texts
+        self.overrides = {} if overrides is None else overrides
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __bool__(self):
+        return len(self.boxes) > 0
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.take(range(len(self))[key])
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError('MatchSet index out of range')
+        return MatchHit(self, key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield MatchHit(self, i)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, MatchSet)):
+            return self.tolist() == [list(hit) for hit in other]
+        return NotImplemented
+
+    def __setitem__(self, key, value):
+        parts = [self.take([i]) for i in range(len(self))]
+        if isinstance(key, slice):
+            parts[key] = [MatchSet.from_hit(hit) for hit in value]
+        else:
+            parts[key] = MatchSet.from_hit(value)
+        self.assign(MatchSet.concat(parts))
+
+    def __delitem__(self, key):
+        indices = list(range(len(self)))
+        del indices[key]
+        self.assign(self.take(indices))
+
+    def __add__(self, other):
+        return MatchSet.concat([self, MatchSet.from_hits(other)])
+
+    def __radd__(self, other):
+        return MatchSet.concat([MatchSet.from_hits(other), self])
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def point(self, index, position):
+        '''
+        计算1个命中区域的1个点位
+        :param index: 命中区域下标
+        :param position: 点位下标，即Position枚举的value
+        :return: MatchPoint [x, y]，原地改写x或y会记录到overrides中
+        '''
+
+        override = self.overrides.get((index, position))
+        if override is not None:
+            return MatchPoint(override, self, index, position)
+        left, top, right, bottom = self.boxes[index].tolist()
+        if position == 0:   # 中心
+            point = [(left + right) / 2, (top + bottom) / 2]
+        elif position == 1: # 左上
+            point = [left, top]
+        elif position == 2: # 中上
+            point = [(left + right) / 2, top]
+        elif position == 3: # 右上
+            point = [right, top]
+        elif position == 4: # 右中
+            point = [right, (top + bottom) / 2]
+        elif position == 5: # 右下
+            point = [right, bottom]
+        elif position == 6: # 中下
+            point = [(left + right) / 2, bottom]
+        elif position == 7: # 左下
+            point = [left, bottom]
+        elif position == 8: # 左中
+            point = [left, (top + bottom) / 2]
+        else:
+            raise IndexError('position out of range')
+        return MatchPoint(point, self, index, position)
+
+    def value(self, index):
+        '''
+        :param index: 命中区域下标
+        :return: OCR命中区域为ocr_text，模板匹配命中区域为实际相似度
+        '''
+
+        if self.texts is not None:
+            return self.texts[index]
+        return self.scores[index].item()
+
+    def centers(self):
+        '''
+        :return: 所有命中区域中心点的数组，shape=(n, 2)
+        '''
+
+        return np.stack([(self.boxes[:, 0] + self.boxes[:, 2]) / 2, (self.boxes[:, 1] + self.boxes[:, 3]) / 2], axis=1)
+
+    def assign(self, other):
+        '''
+        SDK内部接口，外部不要使用，原地替换为other的内容
+        '''
+
+        self.boxes, self.scores, self.texts, self.overrides = other.boxes, other.scores, other.texts, other.overrides
+
+    def append(self, hit):
+        self.assign(MatchSet.concat([self, MatchSet.from_hit(hit)]))
+
+    def extend(self, hits):
+        self.assign(MatchSet.concat([self, MatchSet.from_hits(hits)]))
+
+    def insert(self, index, hit):
+        parts = [self.take([i]) for i in range(len(self))]
+        parts.insert(index, MatchSet.from_hit(hit))
+        self.assign(MatchSet.concat(parts))
+
+    def pop(self, index=-1):
+        '''
+        :return: 被移除的命中区域，为旧的10元素list格式
+        '''
+
+        hit = self[index].tolist()
+        del self[index]
+        return hit
+
+    def index(self, hit):
+        for i, item in enumerate(self):
+            if item == hit:
+                return i
+        raise ValueError('hit is not in MatchSet')
+
+    def count(self, hit):
+        return len([item for item in self if item == hit])
+
+    def remove(self, hit):
+        del self[self.index(hit)]
+
+    def clear(self):
+        self.assign(self.take([]))
+
+    def reverse(self):
+        self.assign(self.take(list(range(len(self)))[::-1]))
+
+    def sort(self, key=None, reverse=False):
+        '''
+        同list.sort，key的入参为MatchHit，默认按旧的10元素list格式比较
+        '''
+
+        if key is None:
+            key = MatchHit.tolist
+        order = sorted(range(len(self)), key=lambda i: key(MatchHit(self, i)), reverse=reverse)
+        self.assign(self.take(order))
+
+    def copy(self):
+        return self.take(list(range(len(self))))
+
+    def take(self, indices):
+        '''
+        按下标取出部分命中区域，组成新的MatchSet
+        :param indices: 命中区域下标的序列或bool数组
+        :return: 新的MatchSet
+        '''
+
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        indices = indices.astype(np.int64).reshape(-1)
+        index_map = {old: new for new, old in enumerate(indices.tolist())}
+        overrides = {(index_map[i], position): point for (i, position), point in self.overrides.items() if i in index_map}
+        return MatchSet(
+            boxes=self.boxes[indices],
+            scores=None if self.scores is None else self.scores[indices],
+            texts=None if self.texts is None else [self.texts[i] for i in indices.tolist()],
+            overrides=overrides
+        )
+
+    def shift(self, offset_x=0, offset_y=0):
+        '''
+        将所有命中区域整体平移，返回新的MatchSet
+        :param offset_x: 横向偏移量，正为右，负为左
+        :param offset_y: 纵向偏移量，正为下，负为上
+        :return: 新的MatchSet
+        '''
+
+        overrides = {key: [point[0] + offset_x, point[1] + offset_y] for key, point in self.overrides.items()}
+        boxes = self.boxes + np.array([offset_x, offset_y, offset_x, offset_y]) # 整数偏移时保持整数坐标
+        return MatchSet(boxes=boxes, scores=self.scores, texts=self.texts, overrides=overrides)
+
+    @classmethod
+    def from_list(cls, points_list):
+        '''
+        将旧的list格式的命中区域集合（比如手动构造的）转为MatchSet，外接矩形取自左上和右下点位
+        :param points_list: [[[中心点X,中心点Y],[左上X,左上Y],……顺时针,ocr_text或实际相似度], ……]
+        :return: MatchSet
+        '''
+
+        if isinstance(points_list, MatchSet):
+            return points_list
+        boxes = np.array([[points[1][0], points[1][1], points[5][0], points[5][1]] for points in points_list], dtype=np.float64).reshape(-1, 4)
+        values = [points[9] if len(points) > 9 else None for points in points_list]
+        if len(values) > 0 and all([isinstance(value, str) for value in values]):
+            match_set = cls(boxes=boxes, texts=values)
+        else:
+            match_set = cls(boxes=boxes, scores=np.array([0.0 if value is None else value for value in values], dtype=np.float64))
+        # 与外接矩形推算结果不一致的点位（比如被改写过的）记为改写点位，转换不丢信息
+        for i, points in enumerate(points_list):
+            for position in range(9):
+                point = [points[position][0], points[position][1]]
+                if match_set.point(i, position) != point:
+                    match_set.overrides[(i, position)] = point
+        return match_set
+
+    @classmethod
+    def from_hit(cls, hit):
+        '''
+        SDK内部接口，外部不要使用，将1个命中区域（MatchHit或旧的10元素list）转为只含1个命中区域的MatchSet
+        '''
+
+        if isinstance(hit, MatchHit):
+            return hit.match_set.take([hit.index])
+        return cls.from_list([hit])
+
+    @classmethod
+    def from_hits(cls, hits):
+        '''
+        SDK内部接口，外部不要使用，将命中区域集合（MatchSet，或由MatchHit/旧的10元素list组成的list）转为MatchSet
+        '''
+
+        if isinstance(hits, MatchSet):
+            return hits
+        return cls.concat([cls.from_hit(hit) for hit in hits])
+
+    @classmethod
+    def concat(cls, match_sets):
+        '''
+        按顺序拼接多个MatchSet，返回新的MatchSet；模板匹配与OCR的命中区域混在一起时，实际相似度与ocr_text统一存为texts
+        :param match_sets: MatchSet列表
+        :return: 新的MatchSet
+        '''
+
+        parts = [match_set for match_set in match_sets if len(match_set) > 0]
+        if len(parts) == 0:
+            return match_sets[0].take([]) if len(match_sets) > 0 else cls(scores=np.zeros(0, dtype=np.float64))
+        if len(parts) == 1:
+            return parts[0].copy()
+        boxes = np.concatenate([part.boxes for part in parts])
+        overrides = {}
+        offset = 0
+        for part in parts:
+            overrides.update({(i + offset, position): point for (i, position), point in part.overrides.items()})
+            offset += len(part)
+        if all([part.scores is not None for part in parts]):
+            return cls(boxes=boxes, scores=np.concatenate([part.scores for part in parts]), overrides=overrides)
+        return cls(boxes=boxes, texts=[part.value(i) for part in parts for i in range(len(part))], overrides=overrides)
+
+    def with_point(self, index, position, point):
+        '''
+        改写1个点位，返回新的MatchSet，共享底层数组、不拷贝
+        :param index: 命中区域下标
+        :param position: 点位下标，即Position枚举的value
+        :param point: 新的[x, y]
+        :return: 新的MatchSet
+        '''
+
+        overrides = dict(self.overrides)
+        overrides[(index, position)] = [point[0], point[1]]
+        return MatchSet(boxes=self.boxes, scores=self.scores, texts=self.texts, overrides=overrides)
+
+    def tolist(self):
+        '''
+        :return: 旧的list格式 [[[中心点X,中心点Y],[左上X,左上Y],……顺时针,ocr_text或实际相似度], ……]
+        '''
+
+        return [MatchHit(self, i).tolist() for i in range(len(self))]
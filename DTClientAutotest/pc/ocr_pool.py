@@ -0,0 +1,588 @@
+'''
+进程外OCR服务：N个常驻的OCR工作进程，各自预热好模型，截图帧经共享内存传递、不做pickle拷贝
+
+用法：
+1. 单进程内：设置global_var.ocr_pool_workers = N，exist_text/loop_exist_text等所有OCR接口自动改走工作进程池
+2. 多显示器/多执行器共用一个模型池：先在本机启动OCR服务 python -m DTClientAutotest.pc.ocr_server --workers N，
+   再在各执行器中设置global_var.ocr_pool_address为同一地址
+'''
+
+import os
+import queue
+import itertools
+import threading
+import traceback
+import signal
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from multiprocessing.connection import Listener, Client
+from concurrent.futures import Future, ThreadPoolExecutor
+from .. import global_var
+from .lazy_module import np
+
+# 小于该字节数的图片（如分阶段OCR的文字框小图）直接随任务pickle，不值得单独开共享内存
+shared_memory_min_bytes = 256 * 1024
+
+def encode_ocr_input(img):
+    '''
+    SDK内部接口，外部不要使用，将OCR的输入图片编码为可跨进程传递的任务载荷，大图放入共享内存
+    :param img: 图片的完整路径，或BGR格式的numpy数组，或多张小图组成的list
+    :return: (载荷, 本进程创建的共享内存列表)，共享内存需在OCR结束后由调用方释放
+    '''
+
+    if isinstance(img, str):
+        return ('path', img), []
+    if isinstance(img, list):
+        payloads = []
+        shms = []
+        for item in img:
+            payload, item_shms = encode_ocr_input(item)
+            payloads.append(payload)
+            shms += item_shms
+        return ('list', payloads), shms
+    img = np.ascontiguousarray(img)
+    if img.nbytes < shared_memory_min_bytes:
+        return ('array', img), []
+    shm = shared_memory.SharedMemory(create=True, size=img.nbytes)
+    np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)[...] = img
+    return ('shm', (shm.name, img.shape, img.dtype.str, os.getpid())), [shm]
+
+def decode_ocr_input(payload):
+    '''
+    SDK内部接口，外部不要使用，在工作进程中将任务载荷还原为OCR的输入图片，共享内存中的截图帧不做拷贝
+    :param payload: encode_ocr_input返回的载荷
+    :return: (输入图片, 本进程打开的共享内存列表)，共享内存需在OCR结束后close
+    '''
+
+    kind, value = payload
+    if kind in ('path', 'array'):
+        return value, []
+    if kind == 'list':
+        imgs = []
+        shms = []
+        for item in value:
+            img, item_shms = decode_ocr_input(item)
+            imgs.append(img)
+            shms += item_shms
+        return imgs, shms
+    name, shape, dtype, creator_pid = value
+    shm = shared_memory.SharedMemory(name=name)
+    if creator_pid != os.getppid() and os.name != 'nt':
+        # 共享内存由其他执行器创建和释放，不能登记到OCR服务的resource_tracker，否则会被当作泄漏重复删除；
+        # 本进程池的提交方与工作进程共用同一个resource_tracker，登记是幂等的、不用处理
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf), [shm]
+
+def release_shared_memory(shms, unlink=False):
+    '''
+    SDK内部接口，外部不要使用，关闭（并删除）共享内存
+    :param shms: 共享内存列表
+    :param unlink: 是否删除，只有创建方才删除
+    :return:
+    '''
+
+    for shm in shms:
+        try:
+            shm.close()
+        except BufferError: # 仍有数组引用着这块内存，交给垃圾回收
+            pass
+        if unlink:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+def finish_future(future, result=None, exception=None):
+    '''
+    SDK内部接口，外部不要使用，先释放提交方为该任务创建的共享内存，再设置Future的结果，确保调用方拿到结果时共享内存已经释放
+    :param future: 提交时创建的Future，future.shms为提交方创建的共享内存列表
+    :param result: OCR识别结果
+    :param exception: 异常，不为None时设置为Future的异常
+    :return:
+    '''
+
+    release_shared_memory(getattr(future, 'shms', []), unlink=True)
+    if exception is None:
+        future.set_result(result)
+    else:
+        future.set_exception(exception)
+
+def ocr_worker_main(task_queue, result_queue, engine_key):
+    '''
+    SDK内部接口，外部不要使用，OCR工作进程的入口：预热模型后循环处理任务，收到None时退出
+    :param task_queue: 本工作进程的任务队列，任务形如(task_id, 载荷, run_ocr的参数dict)
+    :param result_queue: 所有工作进程共用的结果队列，结果形如(task_id, OCR识别结果, 错误信息)
+    :param engine_key: 默认OCR引擎的(lang, use_angle_cls, use_gpu)，同提交方的global_var配置
+    :return:
+    '''
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # Ctrl+C由提交方统一处理，工作进程随进程池关闭
+    # 工作进程内直接在本进程OCR，不能再转发给工作进程池
+    global_var.ocr_pool_workers = 0
+    global_var.ocr_pool_address = None
+    global_var.ocr_lang, global_var.ocr_use_angle_cls, global_var.ocr_use_gpu = engine_key
+    from .core import run_ocr, warm_up_ocr_engine
+    warm_up_ocr_engine()
+    result_queue.put(('ready', os.getpid(), None))
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            task = task_queue.get(timeout=1)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive(): # 提交方已退出（如被强杀），工作进程随之退出
+                break
+            continue
+        if task is None:
+            break
+        task_id, payload, kwargs = task
+        try:
+            img, shms = decode_ocr_input(payload)
+            try:
+                all_lines = run_ocr(img, **kwargs)
+            finally:
+                del img
+                release_shared_memory(shms)
+            result_queue.put((task_id, all_lines, None))
+        except Exception:
+            result_queue.put((task_id, None, traceback.format_exc()))
+
+class OcrPool():
+    '''
+    OCR工作进程池：N个常驻的工作进程各自加载1份模型，任务分给进行中任务最少的工作进程；
+    工作进程崩溃（如paddle段错误）时自动重启，并将它手上的任务重新分配，测试进程本身不受影响
+    '''
+
+    def __init__(self, workers=None, lang=None, use_angle_cls=None, use_gpu=None, max_retries=None):
+        '''
+        :param workers: 工作进程数，默认为global_var.ocr_pool_workers
+        :param lang: 工作进程默认OCR引擎的识别语言，默认为global_var.ocr_lang
+        :param use_angle_cls: 工作进程默认OCR引擎是否启用文字方向分类器，默认为global_var.ocr_use_angle_cls
+        :param use_gpu: 工作进程默认OCR引擎是否使用GPU推理，默认为global_var.ocr_use_gpu
+        :param max_retries: 工作进程崩溃时其任务最多重新分配的次数，默认为global_var.ocr_pool_max_retries；再次崩溃说明是这张图片导致的，直接报错
+        '''
+
+        self.worker_count = max(1, global_var.ocr_pool_workers if workers is None else workers)
+        self.engine_key = (
+            global_var.ocr_lang if lang is None else lang,
+            global_var.ocr_use_angle_cls if use_angle_cls is None else use_angle_cls,
+            global_var.ocr_use_gpu if use_gpu is None else use_gpu
+        )
+        self.max_retries = global_var.ocr_pool_max_retries if max_retries is None else max_retries
+        self.context = multiprocessing.get_context('spawn') # paddle不支持fork
+        self.result_queue = self.context.Queue()
+        self.lock = threading.Lock()
+        self.ready_condition = threading.Condition(self.lock)
+        self.ready_pids = set() # 已预热好模型的工作进程pid
+        self.task_ids = itertools.count()
+        self.rotation = itertools.count()
+        self.tasks = {}   # task_id -> {'future', 'payload', 'kwargs', 'worker', 'retries'}
+        self.workers = [] # [{'process', 'task_queue', 'inflight'}]
+        self.closed = False
+        self.stats_dict = {'submitted': 0, 'completed': 0, 'failed': 0, 'restarts': 0}
+        for i in range(self.worker_count):
+            self.workers.append(self.start_worker())
+        self.collector = threading.Thread(target=self.collect, name='DTClientAutotest-ocr-pool', daemon=True)
+        self.collector.start()
+
+    def start_worker(self):
+        task_queue = self.context.Queue()
+        process = self.context.Process(target=ocr_worker_main, args=(task_queue, self.result_queue, self.engine_key), daemon=True)
+        process.start()
+        return {'process': process, 'task_queue': task_queue, 'inflight': set()}
+
+    def dispatch(self, task_id):
+        '''
+        SDK内部接口，外部不要使用，将任务分给进行中任务最少的工作进程，调用方需持有self.lock
+        '''
+
+        task = self.tasks[task_id]
+        start = next(self.rotation) % len(self.workers) # 进行中任务数相同时轮流分配
+        index = min([(start + i) % len(self.workers) for i in range(len(self.workers))], key=lambda i: len(self.workers[i]['inflight']))
+        task['worker'] = index
+        self.workers[index]['inflight'].add(task_id)
+        self.workers[index]['task_queue'].put((task_id, task['payload'], task['kwargs']))
+
+    def submit_payload(self, payload, kwargs, shms=None):
+        '''
+        提交已编码好的OCR任务，供OcrPoolServer转发其他进程的任务使用
+        :param payload: encode_ocr_input返回的载荷
+        :param kwargs: run_ocr的参数dict（lang/use_angle_cls/use_gpu/det/rec）
+        :param shms: 本进程为该任务创建的共享内存列表，任务结束时释放
+        :return: concurrent.futures.Future，结果同run_ocr
+        '''
+
+        future = Future()
+        future.shms = [] if shms is None else shms
+        with self.lock:
+            assert not self.closed, 'OCR工作进程池已关闭'
+            task_id = next(self.task_ids)
+            self.tasks[task_id] = {'future': future, 'payload': payload, 'kwargs': kwargs, 'worker': None, 'retries': 0}
+            self.stats_dict['submitted'] += 1
+            self.dispatch(task_id)
+        return future
+
+    def submit(self, img, lang=None, use_angle_cls=None, use_gpu=None, det=True, rec=True):
+        '''
+        异步提交一次OCR，截图帧放入共享内存传给工作进程
+        :param img: 图片的完整路径，或BGR格式的numpy数组；det为False时可传多张小图组成的list
+        其余参数同run_ocr
+        :return: concurrent.futures.Future，结果同run_ocr；可用future.result()等待，或在协程中await asyncio.wrap_future(future)
+        '''
+
+        payload, shms = encode_ocr_input(img)
+        return self.submit_payload(payload, {'lang': lang, 'use_angle_cls': use_angle_cls, 'use_gpu': use_gpu, 'det': det, 'rec': rec}, shms=shms)
+
+    async def ocr_async(self, img, lang=None, use_angle_cls=None, use_gpu=None, det=True, rec=True):
+        '''
+        协程版的OCR，参数同submit
+        :return: 同run_ocr
+        '''
+
+        import asyncio
+        return await asyncio.wrap_future(self.submit(img, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu, det=det, rec=rec))
+
+    def collect(self):
+        '''
+        SDK内部接口，外部不要使用，后台线程：接收工作进程的结果，并检测、重启崩溃的工作进程
+        '''
+
+        while not self.closed:
+            try:
+                task_id, all_lines, error = self.result_queue.get(timeout=0.5)
+            except queue.Empty:
+                task_id = None
+            except (EOFError, OSError):
+                break
+            if task_id == 'ready': # 工作进程预热完成，此时all_lines为其pid
+                with self.lock:
+                    self.ready_pids.add(all_lines)
+                    self.ready_condition.notify_all()
+            elif task_id is not None:
+                with self.lock:
+                    task = self.tasks.pop(task_id, None)
+                    if task is not None:
+                        self.workers[task['worker']]['inflight'].discard(task_id)
+                        self.stats_dict['completed' if error is None else 'failed'] += 1
+                if task is not None:
+                    finish_future(task['future'], result=all_lines, exception=None if error is None else RuntimeError('OCR工作进程识别失败：\n' + error))
+            self.restart_dead_workers()
+
+    def restart_dead_workers(self):
+        failed = []
+        with self.lock:
+            if self.closed:
+                return
+            for index, worker in enumerate(self.workers):
+                if worker['process'].is_alive():
+                    continue
+                exitcode = worker['process'].exitcode
+                worker['task_queue'].cancel_join_thread()
+                worker['task_queue'].close()
+                self.workers[index] = self.start_worker()
+                self.stats_dict['restarts'] += 1
+                for task_id in worker['inflight']:
+                    task = self.tasks[task_id]
+                    if task['retries'] < self.max_retries: # 重新分配给其他工作进程
+                        task['retries'] += 1
+                        self.dispatch(task_id)
+                    else:
+                        self.tasks.pop(task_id)
+                        self.stats_dict['failed'] += 1
+                        failed.append((task['future'], exitcode))
+        for future, exitcode in failed:
+            finish_future(future, exception=RuntimeError(f'OCR工作进程崩溃，exitcode={exitcode}'))
+
+    def warm_up(self, timeout=None):
+        '''
+        等待所有工作进程预热好模型
+        :param timeout: 最多等待的秒数，为None时一直等待
+        :return:
+        '''
+
+        with self.lock:
+            ready = self.ready_condition.wait_for(lambda: self.closed or all([worker['process'].pid in self.ready_pids for worker in self.workers]), timeout=timeout)
+        assert ready, f'OCR工作进程{timeout}秒内未预热完成'
+
+    def stats(self):
+        '''
+        :return: {'workers': 工作进程数, 'alive': 存活的工作进程数, 'inflight': 进行中的任务数, 'submitted': 提交的任务数, 'completed': 完成的任务数, 'failed': 失败的任务数, 'restarts': 工作进程重启次数}
+        '''
+
+        with self.lock:
+            stats = dict(self.stats_dict)
+            stats['workers'] = len(self.workers)
+            stats['alive'] = len([worker for worker in self.workers if worker['process'].is_alive()])
+            stats['inflight'] = len(self.tasks)
+        return stats
+
+    def close(self, timeout=5):
+        '''
+        关闭工作进程池，进行中的任务会报错
+        :param timeout: 等待工作进程退出的秒数，超时则强杀
+        :return:
+        '''
+
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            tasks = list(self.tasks.values())
+            self.tasks.clear()
+        for worker in self.workers:
+            worker['task_queue'].put(None)
+        for worker in self.workers:
+            worker['process'].join(timeout)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+        for task in tasks:
+            finish_future(task['future'], exception=RuntimeError('OCR工作进程池已关闭'))
+
+class RemoteOcrPool():
+    '''
+    OCR服务的客户端，接口同OcrPool；截图帧同样经共享内存传递，只有任务描述走socket，因此OCR服务必须在本机
+    '''
+
+    def __init__(self, address=None, authkey=None):
+        '''
+        :param address: OCR服务的地址，默认为global_var.ocr_pool_address
+        :param authkey: OCR服务的认证密钥，默认为global_var.ocr_pool_authkey
+        '''
+
+        self.address = global_var.ocr_pool_address if address is None else address
+        self.authkey = global_var.ocr_pool_authkey if authkey is None else authkey
+        self.lock = threading.Lock()
+        self.task_ids = itertools.count()
+        self.futures = {}
+        self.conn = None
+
+    def connect(self):
+        '''
+        SDK内部接口，外部不要使用，连接OCR服务（断线后下次提交时自动重连），调用方需持有self.lock
+        '''
+
+        if self.conn is None:
+            self.conn = Client(self.address, authkey=self.authkey)
+            threading.Thread(target=self.receive, args=(self.conn,), name='DTClientAutotest-ocr-client', daemon=True).start()
+        return self.conn
+
+    def receive(self, conn):
+        while True:
+            try:
+                task_id, all_lines, error = conn.recv()
+            except (EOFError, OSError): # OCR服务断开，进行中的任务全部报错
+                with self.lock:
+                    if self.conn is conn:
+                        self.conn = None
+                    futures = list(self.futures.values())
+                    self.futures.clear()
+                for future in futures:
+                    finish_future(future, exception=RuntimeError('与OCR服务的连接已断开'))
+                return
+            with self.lock:
+                future = self.futures.pop(task_id, None)
+            if future is None:
+                continue
+            finish_future(future, result=all_lines, exception=None if error is None else RuntimeError('OCR服务识别失败：\n' + error))
+
+    def submit(self, img, lang=None, use_angle_cls=None, use_gpu=None, det=True, rec=True):
+        '''
+        异步提交一次OCR，参数及返回值同OcrPool.submit
+        '''
+
+        payload, shms = encode_ocr_input(img)
+        future = Future()
+        future.shms = shms
+        task_id = None
+        try:
+            with self.lock:
+                task_id = next(self.task_ids)
+                self.futures[task_id] = future
+                self.connect().send((task_id, payload, {'lang': lang, 'use_angle_cls': use_angle_cls, 'use_gpu': use_gpu, 'det': det, 'rec': rec}))
+        except Exception as e:
+            with self.lock:
+                self.futures.pop(task_id, None)
+                self.conn = None
+            finish_future(future, exception=e)
+        return future
+
+    async def ocr_async(self, img, lang=None, use_angle_cls=None, use_gpu=None, det=True, rec=True):
+        '''
+        协程版的OCR，参数同submit
+        :return: 同run_ocr
+        '''
+
+        import asyncio
+        return await asyncio.wrap_future(self.submit(img, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu, det=det, rec=rec))
+
+    def warm_up(self, timeout=None):
+        '''
+        向OCR服务提交一帧很小的空白图并等待结果，确认服务已连通、模型已预热
+        :param timeout: 最多等待的秒数，为None时一直等待
+        :return:
+        '''
+
+        self.submit(np.zeros((32, 32, 3), dtype=np.uint8)).result(timeout=timeout)
+
+    def close(self):
+        with self.lock:
+            conn, self.conn = self.conn, None
+        if conn is not None:
+            conn.close()
+
+class OcrPoolServer():
+    '''
+    OCR服务：在本机监听global_var.ocr_pool_address，将各执行器（RemoteOcrPool）提交的任务转给同一个OcrPool，
+    用于多显示器/多执行器共用一个模型池
+    '''
+
+    def __init__(self, address=None, authkey=None, pool=None):
+        '''
+        :param address: 监听地址，默认为global_var.ocr_pool_address，形如('127.0.0.1', 50077)
+        :param authkey: 认证密钥，默认为global_var.ocr_pool_authkey
+        :param pool: OcrPool实例，默认按global_var配置新建
+        '''
+
+        self.address = global_var.ocr_pool_address if address is None else address
+        assert self.address is not None, 'OCR服务需要设置监听地址global_var.ocr_pool_address'
+        self.authkey = global_var.ocr_pool_authkey if authkey is None else authkey
+        self.pool = OcrPool() if pool is None else pool
+        self.listener = None
+
+    def serve_forever(self):
+        '''
+        阻塞监听，每个客户端连接一个线程
+        :return:
+        '''
+
+        self.listener = Listener(self.address, authkey=self.authkey)
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError: # 监听已关闭
+                break
+            except Exception: # 认证失败等，忽略该连接
+                continue
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        send_lock = threading.Lock()
+
+        def reply(task_id, future):
+            error = None
+            all_lines = None
+            if future.exception() is None:
+                all_lines = future.result()
+            else:
+                error = str(future.exception())
+            try:
+                with send_lock:
+                    conn.send((task_id, all_lines, error))
+            except (EOFError, OSError): # 客户端已断开
+                pass
+
+        while True:
+            try:
+                task_id, payload, kwargs = conn.recv()
+            except (EOFError, OSError):
+                break
+            future = self.pool.submit_payload(payload, kwargs)
+            future.add_done_callback(lambda f, task_id=task_id: reply(task_id, f))
+        conn.close()
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.close()
+        self.pool.close()
+
+# 当前进程使用的OCR工作进程池（或OCR服务客户端），及创建它时对应的global_var配置
+ocr_pool = None
+ocr_pool_config = None
+ocr_pool_lock = threading.Lock()
+
+def get_ocr_pool():
+    '''
+    获取当前进程使用的OCR工作进程池，由global_var.ocr_pool_address和global_var.ocr_pool_workers选择，global_var配置变化后会自动重建
+    :return: RemoteOcrPool实例（设置了ocr_pool_address时）或OcrPool实例（ocr_pool_workers大于0时），都未设置时为None、表示在本进程内OCR
+    '''
+
+    global ocr_pool, ocr_pool_config
+    config = (global_var.ocr_pool_address, global_var.ocr_pool_workers, global_var.ocr_lang, global_var.ocr_use_angle_cls, global_var.ocr_use_gpu)
+    if ocr_pool_config != config:
+        with ocr_pool_lock:
+            if ocr_pool_config != config:
+                if ocr_pool is not None:
+                    ocr_pool.close()
+                if global_var.ocr_pool_address is not None:
+                    ocr_pool = RemoteOcrPool()
+                elif global_var.ocr_pool_workers > 0:
+                    ocr_pool = OcrPool()
+                else:
+                    ocr_pool = None
+                ocr_pool_config = config
+    return ocr_pool
+
+# 未配置OCR工作进程池时submit_ocr用的线程池，与竞速模式的后台OCR互不占用
+local_ocr_executor = None
+local_ocr_executor_lock = threading.Lock()
+
+def get_local_ocr_executor():
+    '''
+    SDK内部接口，外部不要使用
+    :return: 本进程内异步OCR用的线程池，OCR推理本身是串行的，1个线程即可
+    '''
+
+    global local_ocr_executor
+    if local_ocr_executor is None:
+        with local_ocr_executor_lock:
+            if local_ocr_executor is None:
+                local_ocr_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='local_ocr')
+    return local_ocr_executor
+
+def submit_ocr(img, lang=None, use_angle_cls=None, use_gpu=None, det=True, rec=True):
+    '''
+    异步提交一次OCR，global_var未配置OCR工作进程池时在后台线程中于本进程内OCR
+    :param img: 图片的完整路径，或BGR格式的numpy数组；det为False时可传多张小图组成的list
+    其余参数同run_ocr
+    :return: concurrent.futures.Future，结果同run_ocr
+    '''
+
+    pool = get_ocr_pool()
+    if pool is not None:
+        return pool.submit(img, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu, det=det, rec=rec)
+    from .core import run_ocr
+    return get_local_ocr_executor().submit(run_ocr, img, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu, det=det, rec=rec)
+
+async def ocr_async(img, lang=None, use_angle_cls=None, use_gpu=None, det=True, rec=True):
+    '''
+    协程版的OCR，参数同submit_ocr，多个显示器/多个目标可用asyncio.gather并发识别
+    :return: 同run_ocr
+    '''
+
+    import asyncio
+    return await asyncio.wrap_future(submit_ocr(img, lang=lang, use_angle_cls=use_angle_cls, use_gpu=use_gpu, det=det, rec=rec))
+
+def get_ocr_pool_stats():
+    '''
+    获取OCR工作进程池的统计
+    :return: 同OcrPool.stats()，未使用本进程的OCR工作进程池时为None
+    '''
+
+    pool = get_ocr_pool()
+    return pool.stats() if isinstance(pool, OcrPool) else None
+
+def start_ocr_pool_server(address=None, workers=None, authkey=None):
+    '''
+    在本机启动OCR服务并阻塞监听，供多显示器/多执行器共用一个模型池
+    :param address: 监听地址，默认为global_var.ocr_pool_address
+    :param workers: 工作进程数，默认为global_var.ocr_pool_workers
+    :param authkey: 认证密钥，默认为global_var.ocr_pool_authkey
+    :return:
+    '''
+
+    server = OcrPoolServer(address=address, authkey=authkey, pool=OcrPool(workers=workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,16 @@
+'''
+本机OCR服务的启动入口，多显示器/多执行器共用一个模型池，各执行器设置global_var.ocr_pool_address为同一地址即可
+
+用法：python -m DTClientAutotest.pc.ocr_server --host 127.0.0.1 --port 50077 --workers 2
+'''
+
+import argparse
+from .ocr_pool import start_ocr_pool_server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='DTClientAutotest OCR服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=50077, help='监听端口')
+    parser.add_argument('--workers', type=int, default=2, help='OCR工作进程数')
+    args = parser.parse_args()
+    start_ocr_pool_server(address=(args.host, args.port), workers=args.workers)
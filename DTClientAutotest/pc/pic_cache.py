@@ -0,0 +1,219 @@
+import os
+import time
+import sqlite3
+import threading
+from .. import global_var
+
+class PicCacheIndex():
+    '''
+    OCR文字缓存图的索引，以SQLite文件的形式与缓存图存放在一起（{sub_path}/pic_cache_index.sqlite3），
+    记录每张缓存图对应的目标文字、生成时的命中区域、创建时间及命中统计，用于：
+    1. 缓存图匹配时优先只在原命中区域附近搜索
+    2. 连续未命中N次后主动失效
+    3. 按容量和存活时间淘汰缓存图
+    '''
+
+    def __init__(self, sub_path):
+        '''
+        :param sub_path: 缓存截图存放路径，同loop_exist_text_by_pic_cache接口的sub_path参数
+        '''
+
+        os.makedirs(sub_path, exist_ok=True)
+        self.sub_path = sub_path
+        self.index_full_path = os.path.join(sub_path, 'pic_cache_index.sqlite3')
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.index_full_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS pic_cache (
+                subfolder TEXT NOT NULL,
+                name TEXT NOT NULL,
+                text TEXT,
+                left INTEGER,
+                top INTEGER,
+                right INTEGER,
+                bottom INTEGER,
+                created REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0,
+                consecutive_misses INTEGER NOT NULL DEFAULT 0,
+                last_hit REAL,
+                PRIMARY KEY (subfolder, name)
+            )
+        ''')
+
+    def pic_full_path(self, subfolder, name):
+        '''
+        :param subfolder: 缓存截图存放的子文件夹路径
+        :param name: 缓存截图全称（不含扩展名），形如 {pic_cache_name}_mac_2880x1800
+        :return: 缓存图的完整路径
+        '''
+
+        return os.path.join(self.sub_path, subfolder, name + '.png')
+
+    def get(self, subfolder, name):
+        '''
+        查询一张缓存图的索引信息
+        :param subfolder: 缓存截图存放的子文件夹路径
+        :param name: 缓存截图全称（不含扩展名）
+        :return: {'text', 'bbox', 'created', 'hits', 'misses', 'consecutive_misses', 'last_hit'}，没有索引时为None
+        '''
+
+        with self.lock:
+            row = self.conn.execute('SELECT text, left, top, right, bottom, created, hits, misses, consecutive_misses, last_hit FROM pic_cache WHERE subfolder = ? AND name = ?', (subfolder, name)).fetchone()
+        if row is None:
+            return None
+        return {
+            'text': row[0],
+            'bbox': None if row[1] is None else (row[1], row[2], row[3], row[4]), # 生成缓存图时的命中区域(left, top, right, bottom)
+            'created': row[5],
+            'hits': row[6],
+            'misses': row[7],
+            'consecutive_misses': row[8],
+            'last_hit': row[9]
+        }
+
+    def put(self, subfolder, name, text, bbox):
+        '''
+        新建或刷新一张缓存图的索引，保留历史命中统计、清零连续未命中次数，并顺带按容量和存活时间淘汰
+        :param subfolder: 缓存截图存放的子文件夹路径
+        :param name: 缓存截图全称（不含扩展名）
+        :param text: 目标文字
+        :param bbox: 生成缓存图时的命中区域(left, top, right, bottom)
+        :return:
+        '''
+
+        left, top, right, bottom = [int(round(i)) for i in bbox]
+        now = time.time()
+        with self.lock:
+            self.conn.execute('''
+                INSERT INTO pic_cache (subfolder, name, text, left, top, right, bottom, created, last_hit) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (subfolder, name) DO UPDATE SET text = excluded.text, left = excluded.left, top = excluded.top, right = excluded.right, bottom = excluded.bottom, created = excluded.created, consecutive_misses = 0
+            ''', (subfolder, name, text, left, top, right, bottom, now, now))
+        self.evict()
+
+    def record_hit(self, subfolder, name, text=None, bbox=None):
+        '''
+        记录缓存图命中1次，bbox不为None时同时更新命中区域（比如元素换了位置）
+        :param subfolder: 缓存截图存放的子文件夹路径
+        :param name: 缓存截图全称（不含扩展名）
+        :param text: 目标文字，为旧版本没有索引的缓存图补录索引时使用
+        :param bbox: 本次的命中区域(left, top, right, bottom)
+        :return:
+        '''
+
+        now = time.time()
+        with self.lock:
+            if bbox is None:
+                self.conn.execute('UPDATE pic_cache SET hits = hits + 1, consecutive_misses = 0, last_hit = ? WHERE subfolder = ? AND name = ?', (now, subfolder, name))
+                return
+            left, top, right, bottom = [int(round(i)) for i in bbox]
+            self.conn.execute('''
+                INSERT INTO pic_cache (subfolder, name, text, left, top, right, bottom, created, hits, last_hit) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
+                ON CONFLICT (subfolder, name) DO UPDATE SET left = excluded.left, top = excluded.top, right = excluded.right, bottom = excluded.bottom, hits = hits + 1, consecutive_misses = 0, last_hit = excluded.last_hit
+            ''', (subfolder, name, text, left, top, right, bottom, now, now))
+
+    def record_miss(self, subfolder, name):
+        '''
+        记录缓存图未命中1次
+        :param subfolder: 缓存截图存放的子文件夹路径
+        :param name: 缓存截图全称（不含扩展名）
+        :return: 连续未命中次数，没有索引时为1
+        '''
+
+        with self.lock:
+            self.conn.execute('UPDATE pic_cache SET misses = misses + 1, consecutive_misses = consecutive_misses + 1 WHERE subfolder = ? AND name = ?', (subfolder, name))
+            row = self.conn.execute('SELECT consecutive_misses FROM pic_cache WHERE subfolder = ? AND name = ?', (subfolder, name)).fetchone()
+        return 1 if row is None else row[0]
+
+    def remove(self, subfolder, name):
+        '''
+        删除一张缓存图及其索引
+        :param subfolder: 缓存截图存放的子文件夹路径
+        :param name: 缓存截图全称（不含扩展名）
+        :return:
+        '''
+
+        with self.lock:
+            self.conn.execute('DELETE FROM pic_cache WHERE subfolder = ? AND name = ?', (subfolder, name))
+        pic_full_path = self.pic_full_path(subfolder, name)
+        if os.path.exists(pic_full_path):
+            os.remove(pic_full_path)
+
+    def evict(self, max_entries=None, max_age=None):
+        '''
+        按存活时间和容量淘汰缓存图：先删除超过max_age秒未命中过的，再按最近命中时间删除超出max_entries的最久未用的
+        :param max_entries: 最多保留的缓存图张数，默认为global_var.pic_cache_max_entries，为None时不限制
+        :param max_age: 缓存图最近一次命中（或创建）后最多保留的秒数，默认为global_var.pic_cache_max_age，为None时不限制
+        :return: 淘汰的缓存图张数
+        '''
+
+        if max_entries is None:
+            max_entries = global_var.pic_cache_max_entries
+        if max_age is None:
+            max_age = global_var.pic_cache_max_age
+
+        evicted = []
+        with self.lock:
+            if max_age is not None:
+                evicted += self.conn.execute('SELECT subfolder, name FROM pic_cache WHERE MAX(created, COALESCE(last_hit, created)) < ?', (time.time() - max_age,)).fetchall()
+            if max_entries is not None:
+                evicted += self.conn.execute('SELECT subfolder, name FROM pic_cache ORDER BY MAX(created, COALESCE(last_hit, created)) DESC LIMIT -1 OFFSET ?', (max_entries,)).fetchall()
+        for subfolder, name in set(evicted):
+            self.remove(subfolder, name)
+        return len(set(evicted))
+
+    def stats(self):
+        '''
+        :return: {'entries': 缓存图张数, 'hits': 累计命中次数, 'misses': 累计未命中次数}
+        '''
+
+        with self.lock:
+            row = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(misses), 0) FROM pic_cache').fetchone()
+        return {'entries': row[0], 'hits': row[1], 'misses': row[2]}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+# 已打开的缓存图索引，key为sub_path
+pic_cache_index_dict = {}
+pic_cache_index_lock = threading.Lock()
+
+def get_pic_cache_index(sub_path=None):
+    '''
+    获取缓存图索引，同一sub_path在进程内只打开1次
+    :param sub_path: 缓存截图存放路径，默认为{global_var.root_path}/pic_cache_for_text
+    :return: PicCacheIndex实例
+    '''
+
+    if sub_path is None:
+        sub_path = os.path.join(global_var.root_path, 'pic_cache_for_text')
+    sub_path = os.path.abspath(sub_path)
+    index = pic_cache_index_dict.get(sub_path)
+    if index is None:
+        with pic_cache_index_lock:
+            index = pic_cache_index_dict.get(sub_path)
+            if index is None:
+                index = PicCacheIndex(sub_path)
+                pic_cache_index_dict[sub_path] = index
+    return index
+
+def get_pic_cache_stats(sub_path=None):
+    '''
+    获取OCR文字缓存图的命中统计
+    :param sub_path: 缓存截图存放路径，默认为{global_var.root_path}/pic_cache_for_text
+    :return: {'entries': 缓存图张数, 'hits': 累计命中次数, 'misses': 累计未命中次数}
+    '''
+
+    return get_pic_cache_index(sub_path).stats()
+
+def evict_pic_cache(sub_path=None, max_entries=None, max_age=None):
+    '''
+    按容量和存活时间淘汰OCR文字缓存图
+    :param sub_path: 缓存截图存放路径，默认为{global_var.root_path}/pic_cache_for_text
+    :param max_entries: 最多保留的缓存图张数，默认为global_var.pic_cache_max_entries
+    :param max_age: 缓存图最近一次命中后最多保留的秒数，默认为global_var.pic_cache_max_age
+    :return: 淘汰的缓存图张数
+    '''
+
+    return get_pic_cache_index(sub_path).evict(max_entries=max_entries, max_age=max_age)
@@ -0,0 +1,284 @@
+import os
+import re
+import math
+import json
+import mmap
+import time
+import struct
+import threading
+from .lazy_module import cv2, np
+from .. import global_var
+from .host_profile import get_host_profile
+
+# 模板包文件头：魔数 + 索引JSON的字节数，索引之后按64字节对齐依次存放各模板截图解码后的像素数据
+template_pack_magic = b'DTTPACK1'
+template_pack_header = struct.Struct('<8sQ')
+template_pack_alignment = 64
+template_pic_pattern = re.compile(r'^(.+)_(win|mac|linux)_(\d+)x(\d+)\.(png|jpg|jpeg)$')
+
+def get_template_pack_path(sub_path, system, resolution):
+    '''
+    获取模板包的完整路径，每个"系统_分辨率"各1个模板包，与模板截图存放在同一sub_path下
+    :param sub_path: 模板截图存放路径
+    :param system: win / mac / linux
+    :param resolution: 分辨率，形如 (2880, 1800)
+    :return: 模板包的完整路径，形如 {sub_path}/template_pack_mac_2880x1800.dtpack
+    '''
+
+    return os.path.join(sub_path, f"template_pack_{system}_{resolution[0]}x{resolution[1]}.dtpack")
+
+def get_template_pack_key(subfolder, name):
+    '''
+    SDK内部接口，外部不要使用，模板包索引的key
+    :param subfolder: 模板截图存放的子文件夹路径
+    :param name: 模板截图简称
+    :return: 形如 xincheng/im/{name}，subfolder为空串时即为name
+    '''
+
+    subfolder = subfolder.replace('\\', '/').strip('/')
+    return subfolder + '/' + name if len(subfolder) > 0 else name
+
+def build_template_pack(sub_path=None, system=None, resolution=None, gray=None, scales=None):
+    '''
+    预编译模板包：将sub_path下（含所有子文件夹）的模板截图按"系统_分辨率"分组，解码后连同索引打包成可mmap的单个文件，
+    新的执行机上只需打开1个文件、无需逐个查找和解码模板截图；可在CI的构建步骤中调用，模板截图修改后需重新打包
+    :param sub_path: 模板截图存放路径，默认为{global_var.root_path}/template_pic
+    :param system: 只打包该系统的模板截图，默认为None打包所有系统
+    :param resolution: 只打包该分辨率的模板截图，形如 (2880, 1800)，默认为None打包所有分辨率
+    :param gray: 是否同时打包灰度变体，供exist_pic灰度匹配时直接使用，默认为global_var.template_pack_gray
+    :param scales: 同时打包的缩小变体的倍数，供exist_pic缩小匹配（match_scale）时直接使用，如(0.5, 0.25)，默认为global_var.template_pack_scales
+    :return: 生成的模板包完整路径列表
+    '''
+
+    if sub_path is None:
+        sub_path = os.path.join(global_var.root_path, 'template_pic')
+    if gray is None:
+        gray = global_var.template_pack_gray
+    if scales is None:
+        scales = global_var.template_pack_scales
+
+    # 按"系统_分辨率"分组，同一模板截图有多种扩展类型时与load_template_pic一样按.png/.jpg/.jpeg的顺序取第一个
+    suffix_order = {'png': 0, 'jpg': 1, 'jpeg': 2}
+    group_dict = {}
+    for dir_path, dir_names, file_names in os.walk(sub_path):
+        dir_names.sort()
+        subfolder = os.path.relpath(dir_path, sub_path)
+        subfolder = '' if subfolder == '.' else subfolder
+        for file_name in sorted(file_names):
+            match = template_pic_pattern.match(file_name)
+            if not match:
+                continue
+            pic_system, pic_resolution = match.group(2), (int(match.group(3)), int(match.group(4)))
+            if (system is not None and pic_system != system) or (resolution is not None and pic_resolution != tuple(resolution)):
+                continue
+            group = group_dict.setdefault((pic_system, pic_resolution), {})
+            key = get_template_pack_key(subfolder, match.group(1))
+            if key not in group or suffix_order[match.group(5)] < suffix_order[group[key][1]]:
+                group[key] = (os.path.join(dir_path, file_name), match.group(5))
+
+    pack_paths = []
+    for (pic_system, pic_resolution), group in sorted(group_dict.items()):
+        entries = {}
+        arrays = []
+        offset = 0
+        for key, (pic_full_path, suffix) in sorted(group.items()):
+            img = cv2.imread(pic_full_path)
+            if img is None:
+                continue
+            # 变体的计算方式与exist_pic一致：先灰度化、再缩小
+            variant_list = [(False, 1.0, img)]
+            if gray:
+                variant_list.append((True, 1.0, cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)))
+            for scale in scales:
+                size = (max(1, int(round(img.shape[1] * scale))), max(1, int(round(img.shape[0] * scale))))
+                for variant_gray, variant_scale, variant_img in list(variant_list):
+                    if variant_scale == 1.0:
+                        variant_list.append((variant_gray, float(scale), cv2.resize(variant_img, size, interpolation=cv2.INTER_AREA)))
+            variants = []
+            for variant_gray, variant_scale, variant_img in variant_list:
+                variant_img = np.ascontiguousarray(variant_img)
+                variants.append({'gray': variant_gray, 'scale': variant_scale, 'offset': offset, 'shape': list(variant_img.shape), 'dtype': variant_img.dtype.str})
+                arrays.append((offset, variant_img))
+                offset += (variant_img.nbytes + template_pack_alignment - 1) // template_pack_alignment * template_pack_alignment
+            hint = None
+            hint_path = os.path.splitext(pic_full_path)[0] + '.match.json' # 模板截图的匹配精度提示（sidecar文件）也一起打包
+            if os.path.exists(hint_path):
+                with open(hint_path, 'r', encoding='utf-8') as f:
+                    hint = json.load(f)
+            entries[key] = {
+                'file': os.path.relpath(pic_full_path, sub_path).replace('\\', '/'),
+                'mtime': os.stat(pic_full_path).st_mtime_ns,
+                'hint': hint,
+                'variants': variants
+            }
+
+        index = json.dumps({'system': pic_system, 'resolution': list(pic_resolution), 'created': time.time(), 'entries': entries}, ensure_ascii=False).encode('utf-8')
+        data_start = (template_pack_header.size + len(index) + template_pack_alignment - 1) // template_pack_alignment * template_pack_alignment
+        pack_path = get_template_pack_path(sub_path, pic_system, pic_resolution)
+        temp_path = pack_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(template_pack_header.pack(template_pack_magic, len(index)))
+            f.write(index)
+            for array_offset, array in arrays:
+                f.seek(data_start + array_offset)
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(temp_path, pack_path) # 原子替换，正在mmap旧模板包的进程不受影响
+        pack_paths.append(pack_path)
+    clear_template_packs()
+    return pack_paths
+
+class TemplatePack():
+    '''
+    预编译模板包，由build_template_pack()生成。打开时只读入索引，模板截图以mmap零拷贝的方式按需映射为只读的numpy数组，
+    同一模板截图在进程内只映射1次，多个执行进程打开同一模板包时共享操作系统的页缓存
+    '''
+
+    def __init__(self, pack_path):
+        '''
+        :param pack_path: 模板包的完整路径
+        '''
+
+        self.pack_path = pack_path
+        self.sub_path = os.path.dirname(pack_path)
+        with open(pack_path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_size = template_pack_header.unpack_from(self.mm, 0)
+        assert magic == template_pack_magic, f"不是有效的模板包：{pack_path}"
+        index = json.loads(self.mm[template_pack_header.size:template_pack_header.size + index_size].decode('utf-8'))
+        self.data_start = (template_pack_header.size + index_size + template_pack_alignment - 1) // template_pack_alignment * template_pack_alignment
+        self.system = index['system']
+        self.resolution = tuple(index['resolution'])
+        self.entry_dict = index['entries']
+        self.lock = threading.Lock()
+        self.loaded_dict = {}  # key -> {'path', 'img', 'hint'}
+        self.stale_keys = set() # 打包后模板截图文件被修改过的key
+        self.variant_dict = {} # id(模板截图) -> (模板截图, {(gray, scale): 变体或其索引})
+        self.hits = 0
+
+    def view(self, variant):
+        '''
+        SDK内部接口，外部不要使用，将模板包中的一个变体零拷贝地映射为只读的numpy数组
+        '''
+
+        return np.frombuffer(self.mm, dtype=variant['dtype'], count=math.prod(variant['shape']), offset=self.data_start + variant['offset']).reshape(variant['shape'])
+
+    def get(self, subfolder, name):
+        '''
+        查找模板截图
+        :param subfolder: 模板截图存放的子文件夹路径
+        :param name: 模板截图简称
+        :return: {'path': 打包前模板截图的完整路径, 'img': BGR模板截图（只读）, 'hint': 匹配精度提示}，模板包中没有、或打包后模板截图文件被修改过时返回None
+        '''
+
+        key = get_template_pack_key(subfolder, name)
+        loaded = self.loaded_dict.get(key)
+        if loaded is None:
+            entry = self.entry_dict.get(key)
+            if entry is None or key in self.stale_keys:
+                return None
+            with self.lock:
+                loaded = self.loaded_dict.get(key)
+                if loaded is None:
+                    # 每个模板截图第一次用到时核对1次文件的修改时间，只分发了模板包、没有模板截图文件时直接用模板包
+                    pic_full_path = os.path.join(self.sub_path, *entry['file'].split('/'))
+                    try:
+                        mtime = os.stat(pic_full_path).st_mtime_ns
+                    except OSError:
+                        mtime = entry['mtime']
+                    if mtime != entry['mtime']: # 模板包中的像素已过期，改用模板截图文件
+                        self.stale_keys.add(key)
+                        return None
+                    variants = {(variant['gray'], variant['scale']): variant for variant in entry['variants']}
+                    img = self.view(variants.pop((False, 1.0)))
+                    self.variant_dict[id(img)] = (img, variants) # 灰度/缩小变体在用到时才映射
+                    loaded = {'path': pic_full_path, 'img': img, 'hint': entry['hint']}
+                    self.loaded_dict[key] = loaded
+        self.hits += 1
+        return loaded
+
+    def variant(self, template_img, gray, scale):
+        '''
+        获取模板截图预编译的灰度/缩小变体
+        :param template_img: get()返回的BGR模板截图
+        :param gray: 是否灰度
+        :param scale: 缩小倍数
+        :return: 变体，模板包中没有该变体时返回None
+        '''
+
+        item = self.variant_dict.get(id(template_img))
+        if item is None or item[0] is not template_img:
+            return None
+        variant = item[1].get((bool(gray), float(scale)))
+        if isinstance(variant, dict):
+            variant = self.view(variant)
+            item[1][(bool(gray), float(scale))] = variant
+        return variant
+
+    def stats(self):
+        return {
+            'path': self.pack_path,
+            'entries': len(self.entry_dict),
+            'loaded': len(self.loaded_dict),
+            'stale': len(self.stale_keys),
+            'hits': self.hits,
+            'bytes': len(self.mm)
+        }
+
+# 已打开的模板包，key为(sub_path, system, resolution)，value为TemplatePack实例，没有模板包时为None（避免重复查找）
+template_pack_dict = {}
+template_pack_lock = threading.Lock()
+
+def get_template_pack(sub_path=None):
+    '''
+    获取与当前测试机"系统_分辨率"匹配的模板包，同一模板包在进程内只打开1次
+    :param sub_path: 模板截图存放路径，默认为{global_var.root_path}/template_pic
+    :return: TemplatePack实例，global_var.template_pack为False或没有模板包时返回None
+    '''
+
+    if not global_var.template_pack:
+        return None
+    if sub_path is None:
+        sub_path = os.path.join(global_var.root_path, 'template_pic')
+    host_profile = get_host_profile()
+    key = (sub_path, host_profile.system, host_profile.resolution)
+    if key in template_pack_dict:
+        return template_pack_dict[key]
+    with template_pack_lock:
+        if key not in template_pack_dict:
+            pack_path = get_template_pack_path(sub_path, key[1], key[2])
+            template_pack_dict[key] = TemplatePack(pack_path) if os.path.exists(pack_path) else None
+        return template_pack_dict[key]
+
+def get_template_variant(template_img, gray=False, scale=1.0):
+    '''
+    SDK内部接口，外部不要使用，获取模板截图预编译的灰度/缩小变体
+    :param template_img: 模板截图
+    :param gray: 是否灰度
+    :param scale: 缩小倍数
+    :return: 变体，模板截图不是来自模板包或模板包中没有该变体时返回None
+    '''
+
+    for pack in list(template_pack_dict.values()):
+        if pack is not None:
+            variant = pack.variant(template_img, gray, scale)
+            if variant is not None:
+                return variant
+    return None
+
+def get_template_pack_stats():
+    '''
+    获取已打开的模板包的统计
+    :return: 列表，每个元素为 {'path': 模板包的完整路径, 'entries': 模板截图数, 'loaded': 已映射的模板截图数, 'stale': 打包后文件被修改过、改用模板截图文件的模板截图数, 'hits': 命中次数, 'bytes': 模板包字节数}
+    '''
+
+    return [pack.stats() for pack in list(template_pack_dict.values()) if pack is not None]
+
+def clear_template_packs():
+    '''
+    关闭已打开的模板包，下次查找模板截图时重新打开（重新打包后调用）
+    :return:
+    '''
+
+    with template_pack_lock:
+        template_pack_dict.clear()
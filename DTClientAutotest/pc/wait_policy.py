@@ -0,0 +1,323 @@
+import time
+import random
+import threading
+from .lazy_module import cv2, np
+from .. import global_var
+from .capture import get_capture_backend
+
+class WaitPolicy():
+    '''
+    轮询等待策略基类，决定各loop_*接口在两次轮询之间等多久、什么时候醒来重新匹配
+
+    DTClientAutotest内所有轮询（loop_exist_pic/loop_exist_pic_list/loop_exist_text/loop_exist_text_list/loop_clear_alert及缓存图竞速）都经由global_var.wait_policy选中的等待策略完成，
+    自定义等待策略时继承WaitPolicy并重写delay()即可，再通过set_wait_policy()或global_var.wait_policy设置
+    '''
+
+    name = ''
+
+    def begin(self, interval=0, timeout=None):
+        '''
+        开始一次轮询等待
+        :param interval: 轮询接口的interval参数，即未命中时的轮询间隔秒数
+        :param timeout: 轮询的最大超时秒数，等待不会越过该超时；为None时不限制
+        :return: Wait实例，每次轮询内部各自创建1个
+        '''
+
+        return Wait(self, interval=interval, timeout=timeout)
+
+    def delay(self, wait):
+        '''
+        计算下一次轮询前要等待的秒数
+        :param wait: Wait实例，可读取wait.interval、wait.polls等
+        :return: 等待秒数
+        '''
+
+        return wait.interval
+
+    def sleep(self, wait, delay):
+        '''
+        等待delay秒，子类可重写为提前醒来
+        :param wait: Wait实例
+        :param delay: 等待秒数，已按超时截断
+        :return:
+        '''
+
+        time.sleep(delay)
+
+class FixedWaitPolicy(WaitPolicy):
+    '''
+    固定间隔等待，每次都等interval秒，为默认等待策略、与旧版本的行为一致；interval为0时就是忙轮询
+    '''
+
+    name = 'fixed'
+
+class BackoffWaitPolicy(WaitPolicy):
+    '''
+    指数退避等待：第n次未命中后等待 initial * factor^n 秒（不超过max_interval），并加上±jitter比例的随机抖动，
+    避免同一台机器上的多个执行器同时醒来抢CPU；interval不为0时作为等待秒数的下限
+    '''
+
+    name = 'backoff'
+
+    def __init__(self, initial=None, factor=None, max_interval=None, jitter=None):
+        '''
+        :param initial: 第一次等待的秒数，默认为global_var.wait_backoff_initial
+        :param factor: 每次未命中后等待秒数的放大倍数，默认为global_var.wait_backoff_factor
+        :param max_interval: 等待秒数的上限，默认为global_var.wait_backoff_max
+        :param jitter: 随机抖动的比例，范围为[0,1)，默认为global_var.wait_backoff_jitter
+        '''
+
+        self.initial = initial
+        self.factor = factor
+        self.max_interval = max_interval
+        self.jitter = jitter
+
+    def delay(self, wait):
+        initial = global_var.wait_backoff_initial if self.initial is None else self.initial
+        factor = global_var.wait_backoff_factor if self.factor is None else self.factor
+        max_interval = global_var.wait_backoff_max if self.max_interval is None else self.max_interval
+        jitter = global_var.wait_backoff_jitter if self.jitter is None else self.jitter
+        delay = min(max_interval, initial * factor ** wait.backoff_step)
+        delay *= 1 + random.uniform(-jitter, jitter)
+        return max(wait.interval, delay)
+
+class EventWaitPolicy(BackoffWaitPolicy):
+    '''
+    事件驱动等待：两次轮询之间只有发生了可能影响结果的事情才醒来重新匹配，否则最多等到退避的等待秒数（兜底心跳）
+    1. UI事件：外部的系统事件钩子（如win的窗口创建、焦点变化）或脚本自身调用notify_ui_event()，DTClientAutotest的交互接口完成鼠标键盘操作后也会自动通知
+    2. 画面变化：每隔probe_interval秒截一帧缩略图与上一次匹配所用的帧比较，有变化才醒来，且直接用这一帧去匹配
+    醒来后退避重新从initial开始计算
+    '''
+
+    name = 'event'
+
+    def __init__(self, initial=None, factor=None, max_interval=None, jitter=None, probe_interval=None, change_tolerance=None):
+        '''
+        :param probe_interval: 画面变化检测的间隔秒数，默认为None表示取global_var.wait_event_probe_interval；传0或False时不检测画面变化、只响应UI事件
+        :param change_tolerance: 缩略图像素值之差超过该值才视为画面有变化，默认为global_var.wait_event_change_tolerance
+        其余参数同BackoffWaitPolicy
+        '''
+
+        super().__init__(initial=initial, factor=factor, max_interval=max_interval, jitter=jitter)
+        self.probe_interval = probe_interval
+        self.change_tolerance = change_tolerance
+
+    def begin(self, interval=0, timeout=None):
+        wait = super().begin(interval=interval, timeout=timeout)
+        with ui_event_lock: # 登记为进行中的轮询，notify_ui_event()才能唤醒它，调用方须在finally中调用wait.finish()注销
+            active_waits.add(wait)
+        return wait
+
+    def sleep(self, wait, delay):
+        probe_interval = global_var.wait_event_probe_interval if self.probe_interval is None else self.probe_interval
+        if not probe_interval: # 0、False或None都表示不检测画面变化
+            probe_interval = None
+        change_tolerance = global_var.wait_event_change_tolerance if self.change_tolerance is None else self.change_tolerance
+        wake_time = time.time() + delay
+        while True:
+            remaining = wake_time - time.time()
+            if remaining <= 0:
+                return
+            if wait.event.wait(remaining if probe_interval is None else min(remaining, probe_interval)): # 匹配期间发生的UI事件也会立即唤醒
+                wait.event.clear()
+                wait.wake()
+                return
+            if probe_interval is not None and wait.thumbnail is not None:
+                frame = get_capture_backend().grab()
+                thumbnail = make_thumbnail(frame)
+                if thumbnail.shape != wait.thumbnail.shape or np.max(cv2.absdiff(thumbnail, wait.thumbnail)) > change_tolerance:
+                    wait.pending_frame = frame # 直接用这一帧去匹配，不必再截图
+                    wait.wake()
+                    return
+
+def make_thumbnail(frame):
+    '''
+    SDK内部接口，外部不要使用，将截图帧缩小为1/8的灰度缩略图，用于低成本的画面变化检测
+    :param frame: 截图帧
+    :return: 缩略图
+    '''
+
+    height, width = frame.shape[:2]
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    return cv2.resize(gray, (max(1, width // 8), max(1, height // 8)), interpolation=cv2.INTER_AREA)
+
+# 等待策略的累计统计，所有轮询接口共用
+wait_stats = {'waits': 0, 'hits': 0, 'polls': 0, 'woken': 0, 'cpu_seconds': 0.0, 'wall_seconds': 0.0}
+wait_stats_lock = threading.Lock()
+
+# 进行中的事件驱动轮询，notify_ui_event()会唤醒它们
+active_waits = set()
+ui_event_lock = threading.Lock()
+
+class Wait():
+    '''
+    SDK内部接口，外部不要使用。一次轮询的等待状态，由WaitPolicy.begin()创建，每次轮询内部各自创建1个；
+    轮询结束时必须调用finish()，轮询中途抛异常时也要在finally中调用，否则事件驱动等待的Wait会一直留在active_waits中
+    '''
+
+    def __init__(self, policy, interval=0, timeout=None):
+        self.policy = policy
+        self.interval = interval
+        self.deadline = None if timeout is None else time.time() + timeout
+        self.event = threading.Event()
+        self.polls = 0        # 轮询（匹配）次数
+        self.woken = 0        # 被UI事件或画面变化提前唤醒的次数
+        self.backoff_step = 0 # 退避的次数，被唤醒后清零
+        self.pending_frame = None
+        self.thumbnail = None
+        self.start_time = time.time()
+        self.start_cpu = time.process_time()
+        self.finish_stats = None # finish()后的统计，非None表示已结束
+
+    def frame(self):
+        '''
+        获取本次轮询要匹配的截图帧：画面变化检测时截到的那一帧，或重新截图
+        :return: 截图帧
+        '''
+
+        frame, self.pending_frame = self.pending_frame, None
+        if frame is None:
+            frame = get_capture_backend().grab()
+        self.poll()
+        if isinstance(self.policy, EventWaitPolicy):
+            self.thumbnail = make_thumbnail(frame)
+        return frame
+
+    def poll(self):
+        '''
+        记录1次不需要截图的轮询（如经由CDP查询页面元素），此时事件驱动等待只响应UI事件、不检测画面变化
+        :return:
+        '''
+
+        self.polls += 1
+
+    def sleep(self):
+        '''
+        未命中时，按等待策略等到下一次轮询，等待不会越过超时
+        :return:
+        '''
+
+        delay = self.policy.delay(self)
+        self.backoff_step += 1
+        if self.deadline is not None:
+            delay = min(delay, max(0.0, self.deadline - time.time()) + 0.01) # 超时前后至少还会再轮询1次
+        if delay > 0:
+            self.policy.sleep(self, delay)
+
+    def notify(self):
+        self.event.set()
+
+    def wake(self):
+        self.woken += 1
+        self.backoff_step = 0
+
+    def stats(self):
+        '''
+        :return: {'policy': 等待策略名称, 'polls': 轮询次数, 'woken': 被提前唤醒的次数, 'cpu_seconds': 本进程消耗的CPU秒数, 'wall_seconds': 耗时秒数}
+        '''
+
+        return {
+            'policy': self.policy.name,
+            'polls': self.polls,
+            'woken': self.woken,
+            'cpu_seconds': time.process_time() - self.start_cpu,
+            'wall_seconds': time.time() - self.start_time
+        }
+
+    def finish(self, hit):
+        '''
+        结束本次轮询等待，并计入累计统计；重复调用时直接返回第一次结束时的统计、不会重复计入
+        :param hit: 是否轮询到了目标
+        :return: 本次轮询的统计，同stats()
+        '''
+
+        if self.finish_stats is not None:
+            return self.finish_stats
+        with ui_event_lock:
+            active_waits.discard(self)
+        stats = self.finish_stats = self.stats()
+        with wait_stats_lock:
+            wait_stats['waits'] += 1
+            wait_stats['hits'] += 1 if hit else 0
+            wait_stats['polls'] += stats['polls']
+            wait_stats['woken'] += stats['woken']
+            wait_stats['cpu_seconds'] += stats['cpu_seconds']
+            wait_stats['wall_seconds'] += stats['wall_seconds']
+        return stats
+
+def create_wait_policy(policy):
+    '''
+    按名称创建等待策略
+    :param policy: 等待策略名称，'fixed' / 'backoff' / 'event'
+    :return: 等待策略实例
+    '''
+
+    if policy == 'fixed':
+        return FixedWaitPolicy()
+    elif policy == 'backoff':
+        return BackoffWaitPolicy()
+    elif policy == 'event':
+        return EventWaitPolicy()
+    assert False, f"未知的等待策略：{policy}"
+
+# 按名称创建的等待策略，参数都在使用时从global_var读取，可以复用
+wait_policy_dict = {}
+
+def get_wait_policy():
+    '''
+    获取当前的等待策略，由global_var.wait_policy选择
+    :return: 等待策略实例
+    '''
+
+    policy = global_var.wait_policy
+    if isinstance(policy, WaitPolicy):
+        return policy
+    if policy not in wait_policy_dict:
+        wait_policy_dict[policy] = create_wait_policy(policy)
+    return wait_policy_dict[policy]
+
+def set_wait_policy(policy):
+    '''
+    设置等待策略
+    :param policy: 等待策略名称（'fixed' / 'backoff' / 'event'）或WaitPolicy实例
+    :return:
+    '''
+
+    global_var.wait_policy = policy
+
+def begin_wait(interval=0, timeout=None):
+    '''
+    SDK内部接口，外部不要使用，按当前的等待策略开始一次轮询等待
+    :param interval: 未命中时的轮询间隔秒数
+    :param timeout: 轮询的最大超时秒数
+    :return: Wait实例
+    '''
+
+    return get_wait_policy().begin(interval=interval, timeout=timeout)
+
+def notify_ui_event(kind=None):
+    '''
+    通知发生了UI事件（如窗口创建、焦点变化、点击了按钮），唤醒所有正在事件驱动等待中的轮询立即重新匹配，
+    可在系统事件钩子的回调里调用；对global_var.wait_policy为'event'以外的等待策略无影响
+    :param kind: 事件类型，仅用于标识，如'window_created' / 'focus_changed'
+    :return:
+    '''
+
+    with ui_event_lock:
+        waits = list(active_waits)
+    for wait in waits:
+        wait.notify()
+
+def get_wait_stats():
+    '''
+    获取轮询等待的累计统计
+    :return: {'waits': 轮询接口调用次数, 'hits': 其中轮询到目标的次数, 'polls': 总轮询（匹配）次数, 'woken': 被提前唤醒的次数, 'cpu_seconds': 轮询期间本进程消耗的CPU秒数, 'wall_seconds': 轮询总耗时,
+              'polls_per_wait': 平均每次轮询接口的匹配次数, 'cpu_seconds_per_wait': 平均每次轮询接口消耗的CPU秒数}
+    '''
+
+    with wait_stats_lock:
+        stats = dict(wait_stats)
+    waits = max(1, stats['waits'])
+    stats['polls_per_wait'] = stats['polls'] / waits
+    stats['cpu_seconds_per_wait'] = stats['cpu_seconds'] / waits
+    return stats
@@ -27,6 +27,9 @@ def setup_module():
     '''
 
     init_dtclientautotest()
+    # 按需预热OCR引擎，避免第一次OCR轮询时才加载模型；配置了OCR工作进程池时由工作进程各自预热
+    if global_var.ocr_warm_up and global_var.ocr_pool_address is None and global_var.ocr_pool_workers <= 0:
+        pc.warm_up_ocr_engine()
     if 'win' == pc.system(): # 关闭win的防火墙
         os.system('netsh advfirewall set allprofiles state off')
 
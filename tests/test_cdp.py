@@ -0,0 +1,91 @@
+'''
+CDP定位的单元测试，回放tests/fixtures/cdp_page.json，无需钉钉客户端
+'''
+
+import os
+import pytest
+from DTClientAutotest import global_var
+from DTClientAutotest.pc import cdp
+from DTClientAutotest.pc.core import ExistRes, Position
+from DTClientAutotest.pc.match_set import MatchSet
+
+fixture_full_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'cdp_page.json')
+
+@pytest.fixture
+def cdp_fixture(monkeypatch):
+    monkeypatch.setattr(global_var, 'cdp_fixture', fixture_full_path)
+    monkeypatch.setattr(global_var, 'cdp_device_pixel_ratio', None)
+    monkeypatch.setattr(global_var, 'cdp_viewport_offset', None)
+    yield
+    cdp.close_cdp_sessions()
+    cdp.cdp_fixture_dict.clear()
+
+def bbox(hit):
+    return hit[Position.LEFT_TOP.value] + hit[Position.RIGHT_BOTTOM.value]
+
+def test_locate_maps_viewport_to_screen(cdp_fixture):
+    # 左右边框各5像素、标题栏加下边框35像素，devicePixelRatio为2
+    hits, viewport = cdp.get_cdp_session().locate('发送', by=cdp.CdpBy.TEXT)
+    assert viewport['devicePixelRatio'] == 2
+    assert [hit[:4] for hit in hits] == [[230, 210, 430, 270], [610, 210, 730, 270], [230, 370, 390, 430]]
+
+def test_locate_respects_global_overrides(cdp_fixture, monkeypatch):
+    monkeypatch.setattr(global_var, 'cdp_viewport_offset', (0, 0))
+    monkeypatch.setattr(global_var, 'cdp_device_pixel_ratio', 1)
+    hits, viewport = cdp.get_cdp_session().locate('发送')
+    assert hits[0][:4] == [110, 70, 210, 100]
+
+def test_exist_cdp_by_text(cdp_fixture):
+    exist_res = cdp.exist_cdp('发送')
+    assert exist_res[0]
+    assert exist_res.meta['source'] == 'cdp'
+    assert exist_res.meta['target']['id'] == 'page-1'
+    assert len(exist_res[1]) == 1
+    assert exist_res[1][0][9] == '发送 消息'
+    assert bbox(exist_res[1][0]) == [230, 210, 430, 270]
+    assert exist_res[1][0][Position.CENTER.value] == [330, 240]
+
+    assert not cdp.exist_cdp('发送', equal_filter=True)[0]
+    assert cdp.exist_cdp('取消', equal_filter=True)[1][0][9] == '取消'
+
+def test_exist_cdp_by_css(cdp_fixture):
+    exist_res = cdp.exist_cdp('span.title', by=cdp.CdpBy.CSS)
+    assert exist_res[0]
+    assert [hit[9] for hit in exist_res[1]] == ['发送 消息', '取消', '消息123']
+
+    exist_res = cdp.exist_cdp('span.title', by=cdp.CdpBy.CSS, region=(0, 0, 500, 300))
+    assert [hit[9] for hit in exist_res[1]] == ['发送 消息']
+
+def test_exist_cdp_by_regex(cdp_fixture):
+    exist_res = cdp.exist_cdp(r'消息\d+', regex=True)
+    assert [hit[9] for hit in exist_res[1]] == ['消息123']
+    assert bbox(exist_res[1][0]) == [230, 370, 390, 430]
+
+    assert not cdp.exist_cdp(r'^消息$', regex=True)[0]
+
+def test_loop_exist_cdp(cdp_fixture):
+    exist_res = cdp.loop_exist_cdp('取消', before=0, timeout=1, interval=0, after=0)
+    assert exist_res[0]
+    assert exist_res.meta['source'] == 'cdp'
+    assert exist_res.meta['wait']['polls'] == 1
+
+def test_loop_exist_cdp_falls_back_to_ocr(monkeypatch):
+    def unavailable(target=None, port=None, host=None):
+        raise OSError('远程调试端口未开启')
+
+    calls = []
+    def fake_loop_exist_text(**kwargs):
+        calls.append(kwargs)
+        return ExistRes([True, MatchSet.from_list([[[5, 5], [0, 0], [5, 0], [10, 0], [10, 5], [10, 10], [5, 10], [0, 10], [0, 5], '发送']])])
+
+    monkeypatch.setattr(cdp, 'get_cdp_session', unavailable)
+    monkeypatch.setattr(cdp, 'loop_exist_text', fake_loop_exist_text)
+    exist_res = cdp.loop_exist_cdp('发送', before=0, timeout=1, interval=0, after=0)
+    assert exist_res[0]
+    assert exist_res.meta['source'] == 'ocr'
+    assert calls[0]['text'] == '发送' and calls[0]['timeout'] == 1
+
+    with pytest.raises(AssertionError):
+        cdp.loop_exist_cdp('发送', before=0, timeout=1, interval=0, after=0, ocr_fallback=False)
+    with pytest.raises(AssertionError): # 只有按文字定位才能回退到OCR
+        cdp.loop_exist_cdp('span.title', by=cdp.CdpBy.CSS, before=0, timeout=1, interval=0, after=0)
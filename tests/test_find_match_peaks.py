@@ -0,0 +1,76 @@
+'''
+filter_same去重（find_match_peaks）与旧版实现的一致性测试
+'''
+
+import numpy as np
+from DTClientAutotest.pc.core import find_match_peaks
+from DTClientAutotest.pc.benchmark import filter_same_legacy, make_dense_match_res
+
+def make_grid_match_res(spacing=40, template_size=24, peak_radius=6, seed=0):
+    '''
+    构造峰与峰之间至少相距spacing像素的结果矩阵，模拟互不重叠的真实目标
+    '''
+
+    rng = np.random.default_rng(seed)
+    res = rng.uniform(0, 0.3, (300, 500)).astype(np.float32)
+    offsets = np.arange(-peak_radius, peak_radius + 1)
+    cone = 1 - np.hypot(offsets[:, None], offsets[None, :]) / (peak_radius + 1)
+    for y in range(spacing // 2, res.shape[0] - peak_radius, spacing):
+        for x in range(spacing // 2, res.shape[1] - peak_radius, spacing):
+            patch = res[y - peak_radius:y + peak_radius + 1, x - peak_radius:x + peak_radius + 1]
+            np.maximum(patch, (rng.uniform(0.8, 1.0) * cone).astype(np.float32), out=patch)
+    return res
+
+def test_separated_peaks_match_legacy():
+    res = make_grid_match_res()
+    legacy_points = filter_same_legacy(res, 0.5)
+    xs, ys, scores = find_match_peaks(res, 0.5, width=24, height=24)
+    assert [(int(point[0][0]), int(point[0][1])) for point in legacy_points] == list(zip(xs.tolist(), ys.tolist()))
+    assert np.allclose([point[1] for point in legacy_points], scores)
+
+def make_pair_match_res(distance, template_size=24):
+    '''
+    构造横向相距distance像素的两个峰，左边的峰相似度更高
+    '''
+
+    res = np.zeros((60, 120), dtype=np.float32)
+    res[30, 40] = 0.95
+    res[30, 40 + distance] = 0.9
+    return res
+
+def test_peaks_within_half_template_merge():
+    template_size = 24
+    for distance in [1, 9, template_size // 2]:
+        xs, ys, scores = find_match_peaks(make_pair_match_res(distance), 0.5, width=template_size, height=template_size)
+        assert list(zip(xs.tolist(), ys.tolist())) == [(40, 30)], distance
+
+def test_peaks_beyond_half_template_kept():
+    template_size = 24
+    for distance in [template_size // 2 + 1, template_size]:
+        xs, ys, scores = find_match_peaks(make_pair_match_res(distance), 0.5, width=template_size, height=template_size)
+        assert list(zip(xs.tolist(), ys.tolist())) == [(40, 30), (40 + distance, 30)], distance
+
+def test_dense_peaks_merge_within_half_template():
+    # 与benchmark_filter_same的默认输入一致：随机分布的峰之间可能相距不到半个模板截图
+    template_size = 24
+    half = template_size // 2
+    res = make_dense_match_res()
+    legacy_points = filter_same_legacy(res, 0.5)
+    xs, ys, scores = find_match_peaks(res, 0.5, width=template_size, height=template_size)
+    legacy_set = {(int(point[0][0]), int(point[0][1])): point[1] for point in legacy_points}
+    peaks = list(zip(xs.tolist(), ys.tolist(), scores.tolist()))
+
+    # 新实现只会合并、不会多出或挪动命中点
+    assert all((x, y) in legacy_set for x, y, score in peaks)
+    # 保留下来的命中点两两之间横、纵坐标不会都在半个模板截图以内
+    for i, (x, y, score) in enumerate(peaks):
+        assert not any(abs(x - px) <= half and abs(y - py) <= half for px, py, other_score in peaks[i + 1:])
+    # 保留下来的命中点是横、纵坐标各半个模板截图以内相似度最高的点，被合并掉的旧命中点则不是
+    def window_max(x, y):
+        return res[max(0, y - half):y + half + 1, max(0, x - half):x + half + 1].max()
+    kept = {(x, y) for x, y, score in peaks}
+    for (x, y), legacy_score in legacy_set.items():
+        if (x, y) in kept:
+            assert window_max(x, y) == legacy_score
+        else:
+            assert window_max(x, y) > legacy_score
@@ -0,0 +1,41 @@
+'''
+import DTClientAutotest.pc的导入耗时预算，防止延迟导入被后续改动破坏
+'''
+
+import os
+import sys
+import subprocess
+
+# 导入耗时的预算毫秒数
+import_budget_ms = 200
+# import DTClientAutotest.pc时不允许加载的重量级依赖，它们都应在第一次用到时才导入
+heavy_modules = ('paddleocr', 'paddle', 'cv2', 'numpy', 'pyautogui', 'pynput', 'pyperclip', 'mss')
+
+def run_import(module='DTClientAutotest.pc'):
+    '''
+    用python -X importtime在子进程中导入module
+    :return: (导入耗时毫秒数, 被加载的重量级依赖)
+    '''
+
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = package_root + os.pathsep + env.get('PYTHONPATH', '')
+    code = f"import sys, {module}; print(','.join([m for m in {heavy_modules!r} if m in sys.modules]))"
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env, capture_output=True, text=True)
+    assert res.returncode == 0, f"import {module}失败：{res.stderr[-2000:]}"
+
+    import_ms = None
+    for line in res.stderr.splitlines(): # 形如 import time:       312 |      59647 | DTClientAutotest.pc
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            import_ms = int(parts[1]) / 1000
+    return import_ms, [m for m in res.stdout.strip().split(',') if m]
+
+def test_import_skips_heavy_modules():
+    import_ms, loaded_heavy_modules = run_import()
+    assert loaded_heavy_modules == [], f"import DTClientAutotest.pc时加载了重量级依赖：{loaded_heavy_modules}，请改为在第一次用到时才导入"
+
+def test_import_time_budget():
+    # 取3次中的最小耗时，第一次可能包含.pyc编译等冷启动开销
+    import_ms = min([run_import()[0] for i in range(3)])
+    assert import_ms <= import_budget_ms, f"import DTClientAutotest.pc耗时{import_ms}ms，超出预算{import_budget_ms}ms"